@@ -0,0 +1 @@
+# wastewater_dr_twin/benchmarks/__init__.py
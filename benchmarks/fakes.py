@@ -0,0 +1,247 @@
+# wastewater_dr_twin/benchmarks/fakes.py
+"""In-process stand-ins for Mosquitto, Orion, the IoT Agent and the dashboard.
+
+They speak just enough of each protocol for the twin's clients to run against
+them unchanged, and record what they receive so benchmarks can check delivery.
+"""
+import json
+import socket
+import socketserver
+import struct
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# MQTT 3.1.1 control packet types
+CONNECT, CONNACK, PUBLISH, PUBACK, PUBREC, PUBREL, PUBCOMP = 1, 2, 3, 4, 5, 6, 7
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 10, 11, 12, 13, 14
+
+def _encode_length(length):
+    encoded = bytearray()
+    while True:
+        byte, length = length % 128, length // 128
+        encoded.append(byte | (0x80 if length else 0))
+        if not length:
+            return bytes(encoded)
+
+def _packet(packet_type, flags, body):
+    return bytes([(packet_type << 4) | flags]) + _encode_length(len(body)) + body
+
+def topic_matches(topic_filter, topic):
+    filter_parts = topic_filter.split('/')
+    topic_parts = topic.split('/')
+    for i, part in enumerate(filter_parts):
+        if part == '#':
+            return True
+        if i >= len(topic_parts) or (part != '+' and part != topic_parts[i]):
+            return False
+    return len(filter_parts) == len(topic_parts)
+
+class _MQTTHandler(socketserver.BaseRequestHandler):
+    def _read_exact(self, n):
+        data = bytearray()
+        while len(data) < n:
+            chunk = self.request.recv(n - len(data))
+            if not chunk:
+                raise ConnectionError("client closed the connection")
+            data.extend(chunk)
+        return bytes(data)
+
+    def _read_packet(self):
+        header = self._read_exact(1)[0]
+        length, multiplier = 0, 1
+        while True:
+            byte = self._read_exact(1)[0]
+            length += (byte & 0x7F) * multiplier
+            multiplier *= 128
+            if not byte & 0x80:
+                break
+        return header >> 4, header & 0x0F, self._read_exact(length)
+
+    def send(self, data):
+        with self.send_lock:
+            self.request.sendall(data)
+
+    def handle(self):
+        broker = self.server.broker
+        self.send_lock = threading.Lock()
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            while True:
+                packet_type, flags, body = self._read_packet()
+                if packet_type == CONNECT:
+                    self.send(_packet(CONNACK, 0, b'\x00\x00'))
+                elif packet_type == PUBLISH:
+                    qos = (flags >> 1) & 0x03
+                    topic_length = struct.unpack('!H', body[:2])[0]
+                    topic = body[2:2 + topic_length].decode()
+                    offset = 2 + topic_length
+                    if qos:
+                        packet_id = body[offset:offset + 2]
+                        offset += 2
+                    broker.record(topic, body[offset:])
+                    if qos == 1:
+                        self.send(_packet(PUBACK, 0, packet_id))
+                    elif qos == 2:
+                        self.send(_packet(PUBREC, 0, packet_id))
+                elif packet_type == PUBREL:
+                    self.send(_packet(PUBCOMP, 0, body[:2]))
+                elif packet_type == SUBSCRIBE:
+                    granted = bytearray()
+                    offset = 2
+                    while offset < len(body):
+                        filter_length = struct.unpack('!H', body[offset:offset + 2])[0]
+                        broker.subscribe(body[offset + 2:offset + 2 + filter_length].decode(), self)
+                        granted.append(0)  # subscriptions are delivered at QoS 0
+                        offset += 2 + filter_length + 1
+                    self.send(_packet(SUBACK, 0, body[:2] + bytes(granted)))
+                elif packet_type == UNSUBSCRIBE:
+                    self.send(_packet(UNSUBACK, 0, body[:2]))
+                elif packet_type == PINGREQ:
+                    self.send(_packet(PINGRESP, 0, b''))
+                elif packet_type == DISCONNECT:
+                    break
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            broker.unsubscribe_all(self)
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class FakeMQTTBroker:
+    """Minimal MQTT 3.1.1 broker: QoS 0/1/2 publishes, wildcard subscriptions, keep-alive."""
+
+    def __init__(self, host='127.0.0.1', port=0, keep_messages=False):
+        self.keep_messages = keep_messages
+        self.messages = []
+        self.topic_counts = Counter()
+        self.message_count = 0
+        self.byte_count = 0
+        self._lock = threading.Lock()
+        self._subscriptions = []
+        self._server = _ThreadingTCPServer((host, port), _MQTTHandler)
+        self._server.broker = self
+        self.host, self.port = self._server.server_address
+
+    def record(self, topic, payload):
+        with self._lock:
+            self.message_count += 1
+            self.byte_count += len(payload)
+            self.topic_counts[topic] += 1
+            if self.keep_messages:
+                self.messages.append((topic, payload))
+            subscribers = [handler for topic_filter, handler in self._subscriptions if topic_matches(topic_filter, topic)]
+        encoded_topic = topic.encode()
+        packet = _packet(PUBLISH, 0, struct.pack('!H', len(encoded_topic)) + encoded_topic + payload)
+        for handler in subscribers:
+            try:
+                handler.send(packet)
+            except OSError:
+                pass
+
+    def subscribe(self, topic_filter, handler):
+        with self._lock:
+            self._subscriptions.append((topic_filter, handler))
+
+    def unsubscribe_all(self, handler):
+        with self._lock:
+            self._subscriptions = [(f, h) for f, h in self._subscriptions if h is not handler]
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+class _RecordingHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self):
+        server = self.server.stand_in
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        path = self.path.split('?', 1)[0]
+        status, response = server.respond(self.command, path, body)
+        server.record(self.command, path, body, self.headers.get('fiware-service'),
+                      self.headers.get('fiware-servicepath'))
+        payload = json.dumps(response).encode() if response is not None else b''
+        self.send_response(status)
+        if payload:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = _handle
+
+class RecordingHTTPServer:
+    """HTTP stand-in answering from a route table {(method, path_prefix): (status, json_body)}."""
+
+    def __init__(self, routes, host='127.0.0.1', port=0, keep_bodies=False):
+        self.routes = routes
+        self.keep_bodies = keep_bodies
+        self.requests = Counter()
+        self.tenant_requests = Counter()  # (method, path, fiware-service, fiware-servicepath)
+        self.bodies = []
+        self.byte_count = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _RecordingHandler)
+        self._server.daemon_threads = True
+        self._server.stand_in = self
+        self.host, self.port = self._server.server_address
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def respond(self, method, path, body):
+        for (route_method, prefix), response in self.routes.items():
+            if route_method == method and path.startswith(prefix):
+                return response
+        return 404, {'error': 'NotFound'}
+
+    def record(self, method, path, body, service=None, servicepath=None):
+        with self._lock:
+            self.requests[(method, path)] += 1
+            self.tenant_requests[(method, path, service, servicepath)] += 1
+            self.byte_count += len(body)
+            if self.keep_bodies:
+                self.bodies.append((method, path, body))
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+def fake_orion(**kwargs):
+    return RecordingHTTPServer({
+        ('POST', '/v2/op/update'): (204, None),
+        ('POST', '/v2/op/query'): (200, []),
+        ('POST', '/v2/entities'): (201, None),
+        ('PATCH', '/v2/entities'): (204, None),
+        ('GET', '/v2/entities'): (200, {}),
+        ('DELETE', '/v2/entities'): (204, None)
+    }, **kwargs)
+
+def fake_iot_agent(**kwargs):
+    return RecordingHTTPServer({
+        ('POST', '/iot/services'): (201, None),
+        ('POST', '/iot/devices'): (201, None),
+        ('PUT', '/iot/devices'): (204, None),
+        ('GET', '/iot/devices'): (200, {'count': 0, 'devices': []})
+    }, **kwargs)
+
+def fake_dashboard(**kwargs):
+    return RecordingHTTPServer({
+        ('POST', '/update_data'): (200, {'message': 'Data updated successfully'})
+    }, **kwargs)
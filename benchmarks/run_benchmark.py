@@ -0,0 +1,203 @@
+# wastewater_dr_twin/benchmarks/run_benchmark.py
+"""End-to-end throughput benchmark against in-process stand-ins.
+
+Drives DataGenerator -> DemandResponseAlgorithm -> IoTAgent (MQTT) ->
+OrionInterface -> dashboard (HTTP POST and the Flask update_data handler)
+for a synthetic fleet, and reports per-stage latency percentiles and
+messages/s. Nothing outside this process is needed.
+
+    python -m benchmarks.run_benchmark --pumps 200 --basins 50 --ticks 100 --output results.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.fakes import FakeMQTTBroker, fake_orion, fake_dashboard
+from config import DR_SOLVER, UPDATE_INTERVAL
+from data_generators.fleet import Fleet
+from data_generators.main_generator import DataGenerator
+from demand_response.algorithm import DemandResponseAlgorithm
+from fiware_integration.orion_interface import OrionInterface
+import main as twin
+import metrics
+
+STAGES = ('generate', 'optimize', 'mqtt', 'orion', 'dashboard_http', 'dashboard_ingest')
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def summarize(samples, messages, wall_seconds):
+    latencies = np.asarray(samples) * 1000.0
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        'count': len(samples),
+        'mean_ms': float(latencies.mean()),
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'max_ms': float(latencies.max()),
+        'messages': messages,
+        # Throughput while the stage was busy, and over the whole run
+        'messages_per_s': messages / latencies.sum() * 1000.0 if latencies.sum() else None,
+        'messages_per_wall_s': messages / wall_seconds if wall_seconds else None
+    }
+
+def load_dashboard(history_dir):
+    # app.py reads HISTORY_DIR at import time; keep benchmark history out of the real one
+    os.environ['HISTORY_DIR'] = history_dir
+    from wastewater_dashboard import app as dashboard
+    return dashboard
+
+def run(args):
+    fleet = Fleet.synthetic(args.pumps, args.basins, seed=args.seed)
+    generator = DataGenerator(fleet, seed=args.seed)
+    dr_algorithm = DemandResponseAlgorithm(solver=args.solver)
+
+    broker = FakeMQTTBroker().start()
+    orion_server = fake_orion().start()
+    dashboard_server = fake_dashboard().start()
+    history_dir = tempfile.TemporaryDirectory(prefix='twin-bench-')
+    dashboard = load_dashboard(history_dir.name)
+    dashboard_client = dashboard.app.test_client()
+
+    iot_agent = twin.IoTAgent(broker.host, broker.port, qos=args.qos)
+    orion = OrionInterface(orion_server.url)
+    dashboard_url = f"{dashboard_server.url}/update_data"
+
+    samples = {stage: [] for stage in STAGES}
+    messages = {stage: 0 for stage in STAGES}
+    devices = args.pumps + args.basins + 1
+    start_time = datetime.fromisoformat(args.start)
+    tick_period = 1.0 / args.rate if args.rate else 0.0
+    failures = 0
+    state = generator.plant_state()
+
+    wall_start = time.perf_counter()
+    try:
+        for tick in range(args.ticks):
+            tick_start = time.perf_counter()
+            timestamp = start_time + timedelta(seconds=tick * UPDATE_INTERVAL)
+
+            t0 = time.perf_counter()
+            generator.generate_state(timestamp, state)
+            t1 = time.perf_counter()
+            twin.optimize_plant(state, dr_algorithm)
+            t2 = time.perf_counter()
+            twin.publish_plant(iot_agent, state)
+            t3 = time.perf_counter()
+            orion.upsert_entities(state.ngsi_entities())
+            t4 = time.perf_counter()
+            twin.send_data_to_dashboard(state, timestamp.isoformat(), url=dashboard_url)
+            t5 = time.perf_counter()
+            response = dashboard_client.post('/update_data', json=state.dashboard_payload(timestamp.isoformat()))
+            t6 = time.perf_counter()
+            failures += response.status_code != 200
+
+            for stage, elapsed in zip(STAGES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4, t6 - t5)):
+                samples[stage].append(elapsed)
+            messages['generate'] += devices
+            messages['optimize'] += devices
+            messages['mqtt'] += devices
+            messages['orion'] += devices
+            messages['dashboard_http'] += 1
+            messages['dashboard_ingest'] += 1
+
+            if tick_period:
+                time.sleep(max(0.0, tick_period - (time.perf_counter() - tick_start)))
+    finally:
+        wall_seconds = time.perf_counter() - wall_start
+        iot_agent.disconnect()
+        orion.close()
+        for server in (broker, orion_server, dashboard_server):
+            server.stop()
+        for store in dashboard.history_stores.values():
+            store.close()
+        history_dir.cleanup()
+
+    tick_latencies = np.sum([samples[stage] for stage in STAGES], axis=0)
+    return {
+        'benchmark': 'end_to_end',
+        'timestamp': datetime.now().isoformat(),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {
+            'pumps': args.pumps,
+            'basins': args.basins,
+            'ticks': args.ticks,
+            'rate': args.rate,
+            'qos': args.qos,
+            'solver': args.solver,
+            'seed': args.seed
+        },
+        'wall_seconds': wall_seconds,
+        'ticks_per_s': args.ticks / wall_seconds if wall_seconds else None,
+        'stages': {stage: summarize(samples[stage], messages[stage], wall_seconds) for stage in STAGES},
+        'tick': summarize(tick_latencies, args.ticks, wall_seconds),
+        'received': {
+            'mqtt_messages': broker.message_count,
+            'mqtt_bytes': broker.byte_count,
+            'orion_requests': sum(orion_server.requests.values()),
+            'orion_bytes': orion_server.byte_count,
+            'dashboard_requests': sum(dashboard_server.requests.values()),
+            'dashboard_bytes': dashboard_server.byte_count,
+            'dashboard_ingest_failures': failures
+        },
+        # Instrumentation recorded by the components themselves during the run
+        'metrics': metrics.summary()
+    }
+
+def print_report(results):
+    print(f"{'stage':<18}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'msg/s':>12}")
+    for stage, stats in list(results['stages'].items()) + [('tick', results['tick'])]:
+        rate = f"{stats['messages_per_s']:.0f}" if stats['messages_per_s'] else '-'
+        print(f"{stage:<18}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+              f"{stats['max_ms']:>10.2f}{rate:>12}")
+    print(f"{results['ticks_per_s']:.1f} ticks/s over {results['wall_seconds']:.1f} s; received {results['received']}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end benchmark with local stand-ins")
+    parser.add_argument('--pumps', type=int, default=100)
+    parser.add_argument('--basins', type=int, default=20)
+    parser.add_argument('--ticks', type=int, default=50)
+    parser.add_argument('--rate', type=float, default=0.0,
+                        help="ticks per second to pace at (default: as fast as possible)")
+    parser.add_argument('--qos', type=int, choices=(0, 1, 2), default=0)
+    parser.add_argument('--solver', default=DR_SOLVER)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--start', default='2024-01-01T00:00:00', help="simulated start time")
+    parser.add_argument('--output', help="write machine-readable results to this JSON file")
+    parser.add_argument('--log-level', default='WARNING',
+                        help="log level while running; INFO floods the terminal with per-device lines")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    # basicConfig already ran in main/app; adjust the root level instead
+    logging.getLogger().setLevel(args.log_level)
+    for name in ('main', 'wastewater_dashboard.app', 'demand_response.algorithm'):
+        logging.getLogger(name).setLevel(args.log_level)
+
+    results = run(args)
+    print_report(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return results
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# wastewater_dr_twin/benchmarks/startup_benchmark.py
+"""Start-up cost of the twin entry points: import time, peak RSS and heavy modules loaded.
+
+Each target is measured in fresh interpreters (median over --runs) so nothing
+is already cached in sys.modules. The edge runner is additionally timed
+through the end of its first tick, imports included. Budgets make it usable as a
+regression check: the exit status is 1 when one is exceeded, or when the edge
+runner loads a module it must not (pandas, requests, flask; scipy unless
+--solver slsqp).
+
+    python -m benchmarks.startup_benchmark --max-import-seconds 1.5 --max-rss-mb 60
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.run_benchmark import git_commit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('pandas', 'scipy', 'requests', 'flask', 'flask_socketio')
+EDGE_FORBIDDEN = ('pandas', 'requests', 'flask', 'flask_socketio')
+
+# Runs in the child interpreter; prints one JSON line. Peak RSS comes from VmHWM where
+# available, since ru_maxrss carries over the parent's peak across fork/exec on Linux
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+{body}
+seconds = time.perf_counter() - started
+try:
+    with open('/proc/self/status') as f:
+        rss_mb = next(int(line.split()[1]) for line in f if line.startswith('VmHWM:')) / 1024
+except (OSError, StopIteration):
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps({{
+    'seconds': seconds,
+    'rss_mb': rss_mb,
+    'heavy_modules': [name for name in {heavy!r} if name in sys.modules]
+}}))
+"""
+
+def targets(solver):
+    return {
+        'edge_runner': "import edge_runner",
+        'edge_first_tick': (
+            "import edge_runner\n"
+            f"edge_runner.main(['--ticks', '1', '--no-mqtt', '--no-metrics', '--solver', {solver!r}])"
+        ),
+        'main': "import main"
+    }
+
+def measure(body):
+    code = PROBE.format(body=body, heavy=HEAVY_MODULES)
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Probe failed: {result.stderr.strip()}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def run(args):
+    results = {}
+    for name, body in targets(args.solver).items():
+        samples = [measure(body) for _ in range(args.runs)]
+        results[name] = {
+            'seconds': statistics.median(sample['seconds'] for sample in samples),
+            'rss_mb': statistics.median(sample['rss_mb'] for sample in samples),
+            'heavy_modules': samples[-1]['heavy_modules']
+        }
+    return {
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'solver': args.solver,
+        'runs': args.runs,
+        'targets': results
+    }
+
+def check(results, args):
+    # Budgets apply to the edge runner's first tick, which includes its imports
+    problems = []
+    edge = results['targets']['edge_first_tick']
+    forbidden = EDGE_FORBIDDEN if args.solver == 'slsqp' else EDGE_FORBIDDEN + ('scipy',)
+    loaded = [name for name in edge['heavy_modules'] if name in forbidden]
+    if loaded:
+        problems.append(f"edge runner imported {', '.join(loaded)}")
+    if args.max_import_seconds is not None and edge['seconds'] > args.max_import_seconds:
+        problems.append(f"edge runner first tick took {edge['seconds']:.2f} s (budget {args.max_import_seconds:.2f} s)")
+    if args.max_rss_mb is not None and edge['rss_mb'] > args.max_rss_mb:
+        problems.append(f"edge runner peak RSS {edge['rss_mb']:.0f} MB (budget {args.max_rss_mb:.0f} MB)")
+    return problems
+
+def print_report(results):
+    print(f"{'target':<18}{'seconds':>10}{'RSS MB':>10}  heavy modules")
+    for name, stats in results['targets'].items():
+        print(f"{name:<18}{stats['seconds']:>10.3f}{stats['rss_mb']:>10.1f}  {', '.join(stats['heavy_modules']) or '-'}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time and RSS benchmark of the entry points")
+    parser.add_argument('--runs', type=int, default=5, help="fresh interpreters per target")
+    parser.add_argument('--solver', default='vectorized', help="solver the edge runner's first tick uses")
+    parser.add_argument('--max-import-seconds', type=float, help="fail if the edge runner's first tick is slower")
+    parser.add_argument('--max-rss-mb', type=float, help="fail if the edge runner's peak RSS is larger")
+    parser.add_argument('--output', help="write machine-readable results to this JSON file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args)
+    print_report(results)
+    results['problems'] = check(results, args)
+    for problem in results['problems']:
+        print(f"FAIL: {problem}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 1 if results['problems'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,6 +5,15 @@ ORION_URL = "http://localhost:1026"
 MQTT_BROKER = "localhost"
 MQTT_PORT = 1883
 API_KEY = "wastewater_dr_twin_key"
+DASHBOARD_URL = "http://localhost:5000/update_data"
+DASHBOARD_INGEST_URL = "http://localhost:5000/ingest"
+
+# Virtual-clock and pipelined runs post snapshots to DASHBOARD_INGEST_URL in batches, flushed at
+# DASHBOARD_BATCH_SIZE snapshots or DASHBOARD_BATCH_INTERVAL seconds (1 = one /update_data post per tick).
+# DASHBOARD_INGEST_FORMAT is 'json' or 'msgpack' (needs the msgpack package on both ends).
+DASHBOARD_BATCH_SIZE = 100
+DASHBOARD_BATCH_INTERVAL = 1.0
+DASHBOARD_INGEST_FORMAT = 'json'
 
 FIWARE_SERVICE = "wastewater"
 FIWARE_SERVICEPATH = "/"
@@ -19,9 +28,52 @@ PUMP_TOPIC = f"/json/{API_KEY}/pump/attrs"
 AERATION_TOPIC = f"/json/{API_KEY}/aeration/attrs"
 GRID_TOPIC = f"/json/{API_KEY}/grid/attrs"
 
+# MQTT publishing
+MQTT_QOS = 0
+MQTT_MAX_INFLIGHT = 1000  # unacknowledged QoS>0 messages allowed at once
+MQTT_FLUSH_TIMEOUT = 5  # seconds to wait for delivery at the end of a tick
+
 # Simulation parameters
 SIMULATION_DURATION = 60  # minutes
 UPDATE_INTERVAL = 60  # seconds
+SIMULATION_SPEED = None  # virtual-clock mode: virtual seconds per wall second, None = as fast as possible
+SIMULATION_CHUNK_TICKS = 1440  # ticks generated per batch in virtual-clock mode
+
+# Pipelined runner (main.py --pipeline): queue size per stage and overflow policy per sink
+# ('block', 'drop_oldest', 'drop_newest' or 'coalesce')
+PIPELINE_QUEUE_SIZE = 16
+PIPELINE_MQTT_POLICY = 'drop_oldest'
+PIPELINE_DASHBOARD_POLICY = 'coalesce'
+PIPELINE_MONITOR_INTERVAL = 30  # seconds between queue-depth log lines, None to disable
+
+# Subscriber mode (main.py --subscribe): re-run DR once this fraction of the fleet has reported
+# since the last run, or the grid price moved by SUBSCRIBE_PRICE_CHANGE ($/kWh); triggers within
+# SUBSCRIBE_DEBOUNCE seconds of each other share one run. Nothing runs until every pump and basin has
+# reported at least once
+SUBSCRIBE_REPORT_FRACTION = 0.8
+SUBSCRIBE_PRICE_CHANGE = 0.01
+SUBSCRIBE_DEBOUNCE = 0.05
+
+# Multi-plant portfolio (main.py --plants / simulation.multi_plant): JSON list of plant configs
+# ({'name', 'fleet' or 'fleet_file', 'fiware_service', 'fiware_servicepath', 'seed', 'api_key'})
+PLANTS_FILE = None
+PORTFOLIO_WORKERS = None  # worker processes, None = one per core
+PORTFOLIO_TARGET_REDUCTION = None  # grid-level reduction target as a fraction of baseline, None = all flexibility
+
+# Monte Carlo strategy evaluation (simulation.scenarios)
+SCENARIO_COUNT = 1000
+SCENARIO_CHUNK_SIZE = 250  # scenarios sampled and solved per batch
+SCENARIO_HORIZON_HOURS = 24
+SCENARIO_FREQ = '15min'
+
+# Backtesting over recorded telemetry (simulation.backtest): rows read per file per chunk
+BACKTEST_CHUNK_ROWS = 100000
+
+# Instrumentation (metrics.py). The dashboard always serves /metrics; main.py only when
+# METRICS_PORT is set. METRICS_SUMMARY_INTERVAL logs a summary every N seconds (None = off).
+METRICS_ENABLED = True
+METRICS_PORT = None
+METRICS_SUMMARY_INTERVAL = None
 
 # Pump configuration
 NUM_PUMPS = 5
@@ -32,10 +84,40 @@ PUMP_EFFICIENCY_RANGE = (0.6, 0.9)
 NUM_AERATION_BASINS = 3
 AERATION_POWER_RANGE = (100, 500)  # kW
 DISSOLVED_OXYGEN_RANGE = (0.5, 8.0)  # mg/L
+AERATION_BASE_DO_RANGE = (1.8, 2.4)  # mg/L, nominal DO setpoints for synthetic fleets
 
 # Grid configuration
 GRID_DEMAND_RANGE = (1000, 5000)  # kW
 ENERGY_PRICE_RANGE = (0.05, 0.20)  # $/kWh
+GRID_BASE_DEMAND = 5000  # kW
+GRID_BASE_PRICE = 0.1  # $/kWh
+
+# Fleet definition (JSON file with 'pumps', 'aeration_basins' and optional 'grid').
+# When unset, batched generation builds NUM_PUMPS/NUM_AERATION_BASINS devices from the ranges above.
+FLEET_FILE = None
+
+# Demand response solver backend: 'vectorized' (closed-form bound-constrained LP) or 'slsqp'
+DR_SOLVER = 'vectorized'
+
+# Demand response solver state kept across ticks: LRU cache of solutions keyed on device powers
+# rounded to DR_CACHE_POWER_QUANTUM (kW) and price rounded to DR_CACHE_PRICE_QUANTUM ($/kWh),
+# and SLSQP warm starts from the previous solution. DR_CACHE_SIZE = 0 disables the cache.
+# The cache only pays off when whole plant states repeat after rounding: replayed or looped
+# telemetry, steady fleets reporting unchanged readings, or coarse quanta with the SLSQP solver.
+# With per-device noise (the generators) keys never repeat and every lookup is pure overhead.
+DR_CACHE_SIZE = 0
+DR_CACHE_POWER_QUANTUM = 1.0
+DR_CACHE_PRICE_QUANTUM = 0.01
+DR_WARM_START = True
+
+# Process model for DR setpoints (demand_response.process_model). When DR_PROCESS_MODEL is set, basin
+# setpoints keep the steady-state DO within the algorithm's DO band and pump efficiency follows the pump
+# curves instead of the linear DO/power and efficiency/power assumptions.
+DR_PROCESS_MODEL = False
+AERATION_KLA = 6.0  # 1/h, oxygen transfer coefficient at the basin's current power
+DO_SATURATION = 9.0  # mg/L
+PUMP_STATIC_HEAD = 0.3  # share of the pumping head that is static lift
+PUMP_MIN_FLOW = 0.0  # lowest pump flow DR may leave, as a fraction of the current flow
 
 # Random seed for reproducibility (optional)
 RANDOM_SEED = 42
\ No newline at end of file
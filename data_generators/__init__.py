@@ -1,8 +1,20 @@
 # wastewater_dr_twin/data_generators/__init__.py
+from lazy_imports import lazy_exports
 
-from .pump_data import PumpDataGenerator
-from .aeration_data import AerationDataGenerator
-from .grid_data import GridDataGenerator
-from .main_generator import DataGenerator
+# Exports are imported on first access, so loading one submodule (the edge runner only
+# needs fleet, plant_state and the samplers) does not drag in pandas through the others
+_EXPORTS = {
+    'PumpDataGenerator': '.pump_data',
+    'AerationDataGenerator': '.aeration_data',
+    'GridDataGenerator': '.grid_data',
+    'DataGenerator': '.main_generator',
+    'BatchDataGenerator': '.batch_generator',
+    'arrays_to_frames': '.batch_generator',
+    'Fleet': '.fleet',
+    'load_fleet': '.fleet',
+    'PlantState': '.plant_state',
+    'StreamGenerator': '.streams'
+}
 
-__all__ = ['PumpDataGenerator', 'AerationDataGenerator', 'GridDataGenerator', 'WWTPDataGenerator']
\ No newline at end of file
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(globals(), _EXPORTS)
@@ -1,23 +1,31 @@
 # data_generators/aeration_data.py
 import numpy as np
-import pandas as pd
+
+from .noise import scaled_noise
+
+POWER_NOISE = 0.1
+DO_NOISE = 0.2
+
+def sample_aeration_data(base_power, base_do, shape, rng=np.random, dtype=np.float64):
+    power = scaled_noise(rng, base_power, POWER_NOISE, shape, dtype)
+    do_level = scaled_noise(rng, base_do, DO_NOISE, shape, dtype)
+    return power, do_level
 
 class AerationDataGenerator:
-    def __init__(self, basin_id, base_power, base_do):
+    def __init__(self, basin_id, base_power, base_do, rng=np.random):
         self.basin_id = basin_id
         self.base_power = base_power
         self.base_do = base_do
+        self.rng = rng
 
     def generate_data(self, start_time, end_time, freq='5T'):
+        import pandas as pd
+
         date_range = pd.date_range(start=start_time, end=end_time, freq=freq.replace('T', 'min'))
-        data = []
-        for timestamp in date_range:
-            power = self.base_power * (1 + np.random.normal(0, 0.1))
-            do_level = self.base_do * (1 + np.random.normal(0, 0.2))
-            data.append({
-                'timestamp': timestamp,
-                'basin_id': self.basin_id,
-                'power': power,
-                'dissolved_oxygen': do_level
-            })
-        return pd.DataFrame(data)
\ No newline at end of file
+        power, do_level = sample_aeration_data(self.base_power, self.base_do, len(date_range), self.rng)
+        return pd.DataFrame({
+            'timestamp': date_range,
+            'basin_id': self.basin_id,
+            'power': power,
+            'dissolved_oxygen': do_level
+        })
\ No newline at end of file
@@ -0,0 +1,78 @@
+# data_generators/batch_generator.py
+import numpy as np
+import pandas as pd
+
+from .pump_data import sample_pump_data
+from .aeration_data import sample_aeration_data
+from .grid_data import sample_grid_data
+
+class BatchDataGenerator:
+    """Generates every device of a fleet over a time range in one call.
+
+    Device series come back as (n_devices, n_steps) arrays instead of one
+    DataFrame per device, so a week at 1-minute resolution for thousands of
+    devices is a handful of vectorized draws. Every call draws from one shared
+    generator, so the data depends on the order of the calls; chunked and
+    parallel runs use StreamGenerator instead.
+    """
+
+    def __init__(self, fleet, seed=None, dtype=np.float32):
+        self.fleet = fleet
+        self.rng = np.random.default_rng(seed)
+        self.dtype = dtype
+
+    def generate_arrays(self, start_time, end_time, freq='5T'):
+        date_range = pd.date_range(start=start_time, end=end_time, freq=freq.replace('T', 'min'))
+        fleet = self.fleet
+        n_steps = len(date_range)
+
+        pump_power, pump_running, pump_efficiency = sample_pump_data(
+            fleet.pump_base_power[:, None], fleet.pump_efficiency[:, None],
+            (fleet.num_pumps, n_steps), self.rng, self.dtype)
+        basin_power, basin_do = sample_aeration_data(
+            fleet.basin_base_power[:, None], fleet.basin_base_do[:, None],
+            (fleet.num_basins, n_steps), self.rng, self.dtype)
+        grid_demand, grid_price = sample_grid_data(
+            fleet.grid_base_demand, fleet.grid_base_price, date_range.hour.values,
+            rng=self.rng, dtype=self.dtype)
+
+        return {
+            'timestamp': date_range.values,
+            'pump_ids': fleet.pump_ids,
+            'pump_power': pump_power,
+            'pump_running': pump_running,
+            'pump_efficiency': pump_efficiency,
+            'basin_ids': fleet.basin_ids,
+            'basin_power': basin_power,
+            'basin_dissolved_oxygen': basin_do,
+            'grid_demand': grid_demand,
+            'grid_price': grid_price
+        }
+
+def arrays_to_frames(arrays):
+    """Convert generate_arrays() output to the (pump_data, aeration_data, grid_data) frames of DataGenerator."""
+    timestamps = arrays['timestamp']
+    n_steps = len(timestamps)
+    n_pumps = len(arrays['pump_ids'])
+    n_basins = len(arrays['basin_ids'])
+
+    # Device-major order matches DataGenerator's per-device concat
+    pump_data = pd.DataFrame({
+        'timestamp': np.tile(timestamps, n_pumps),
+        'pump_id': np.repeat(np.asarray(arrays['pump_ids'], dtype=object), n_steps),
+        'power': arrays['pump_power'].ravel(),
+        'status': np.where(arrays['pump_running'].ravel(), 'running', 'idle'),
+        'efficiency': arrays['pump_efficiency'].ravel()
+    })
+    aeration_data = pd.DataFrame({
+        'timestamp': np.tile(timestamps, n_basins),
+        'basin_id': np.repeat(np.asarray(arrays['basin_ids'], dtype=object), n_steps),
+        'power': arrays['basin_power'].ravel(),
+        'dissolved_oxygen': arrays['basin_dissolved_oxygen'].ravel()
+    })
+    grid_data = pd.DataFrame({
+        'timestamp': timestamps,
+        'demand': arrays['grid_demand'],
+        'price': arrays['grid_price']
+    })
+    return pump_data, aeration_data, grid_data
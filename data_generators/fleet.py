@@ -0,0 +1,114 @@
+# data_generators/fleet.py
+import json
+
+import numpy as np
+
+import config
+
+# Reference plant used by DataGenerator when no fleet is given
+DEFAULT_PUMPS = [
+    ('pump001', 100, 0.8),
+    ('pump002', 120, 0.85),
+    ('pump003', 90, 0.75),
+    ('pump004', 110, 0.82),
+    ('pump005', 105, 0.78)
+]
+DEFAULT_AERATION_BASINS = [
+    ('basin001', 200, 2.0),
+    ('basin002', 220, 2.2),
+    ('basin003', 210, 2.1)
+]
+
+class Fleet:
+    """Device parameters of one plant, stored as parallel arrays (one entry per device)."""
+
+    def __init__(self, pump_ids, pump_base_power, pump_efficiency,
+                 basin_ids, basin_base_power, basin_base_do,
+                 grid_base_demand=config.GRID_BASE_DEMAND, grid_base_price=config.GRID_BASE_PRICE):
+        self.pump_ids = list(pump_ids)
+        self.pump_base_power = np.asarray(pump_base_power, dtype=np.float64)
+        self.pump_efficiency = np.asarray(pump_efficiency, dtype=np.float64)
+        self.basin_ids = list(basin_ids)
+        self.basin_base_power = np.asarray(basin_base_power, dtype=np.float64)
+        self.basin_base_do = np.asarray(basin_base_do, dtype=np.float64)
+        self.grid_base_demand = float(grid_base_demand)
+        self.grid_base_price = float(grid_base_price)
+
+        if not (len(self.pump_ids) == len(self.pump_base_power) == len(self.pump_efficiency)):
+            raise ValueError("Pump ids, base powers and efficiencies must have the same length")
+        if not (len(self.basin_ids) == len(self.basin_base_power) == len(self.basin_base_do)):
+            raise ValueError("Basin ids, base powers and base DO levels must have the same length")
+
+    @property
+    def num_pumps(self):
+        return len(self.pump_ids)
+
+    @property
+    def num_basins(self):
+        return len(self.basin_ids)
+
+    @classmethod
+    def default(cls):
+        pump_ids, pump_power, pump_efficiency = zip(*DEFAULT_PUMPS)
+        basin_ids, basin_power, basin_do = zip(*DEFAULT_AERATION_BASINS)
+        return cls(pump_ids, pump_power, pump_efficiency, basin_ids, basin_power, basin_do)
+
+    @classmethod
+    def synthetic(cls, num_pumps, num_basins, seed=None):
+        rng = np.random.default_rng(seed)
+        return cls(
+            [f"pump{i:03d}" for i in range(1, num_pumps + 1)],
+            rng.uniform(*config.PUMP_POWER_RANGE, num_pumps),
+            rng.uniform(*config.PUMP_EFFICIENCY_RANGE, num_pumps),
+            [f"basin{i:03d}" for i in range(1, num_basins + 1)],
+            rng.uniform(*config.AERATION_POWER_RANGE, num_basins),
+            rng.uniform(*config.AERATION_BASE_DO_RANGE, num_basins)
+        )
+
+    @classmethod
+    def from_config(cls):
+        return cls.synthetic(config.NUM_PUMPS, config.NUM_AERATION_BASINS, seed=config.RANDOM_SEED)
+
+    @classmethod
+    def from_dict(cls, data):
+        pumps = data.get('pumps', [])
+        basins = data.get('aeration_basins', [])
+        grid = data.get('grid', {})
+        return cls(
+            [p['id'] for p in pumps],
+            [p['base_power'] for p in pumps],
+            [p['efficiency'] for p in pumps],
+            [b['id'] for b in basins],
+            [b['base_power'] for b in basins],
+            [b['base_do'] for b in basins],
+            grid.get('base_demand', config.GRID_BASE_DEMAND),
+            grid.get('base_price', config.GRID_BASE_PRICE)
+        )
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def to_dict(self):
+        return {
+            'pumps': [
+                {'id': pump_id, 'base_power': float(power), 'efficiency': float(efficiency)}
+                for pump_id, power, efficiency in zip(self.pump_ids, self.pump_base_power, self.pump_efficiency)
+            ],
+            'aeration_basins': [
+                {'id': basin_id, 'base_power': float(power), 'base_do': float(do_level)}
+                for basin_id, power, do_level in zip(self.basin_ids, self.basin_base_power, self.basin_base_do)
+            ],
+            'grid': {'base_demand': self.grid_base_demand, 'base_price': self.grid_base_price}
+        }
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+def load_fleet(path=None):
+    path = path or config.FLEET_FILE
+    if path:
+        return Fleet.from_file(path)
+    return Fleet.from_config()
@@ -1,27 +1,39 @@
 # data_generators/grid_data.py
 import numpy as np
-import pandas as pd
+
+from .noise import scaled_noise
+
+DEMAND_NOISE = 0.1
+PRICE_NOISE = 0.05
+
+def demand_factor(hours):
+    # Simulate higher demand during day hours
+    return 1 + 0.5 * np.sin(np.pi * np.asarray(hours) / 12)
+
+def sample_grid_data(base_demand, base_price, hours, shape=None, rng=np.random, dtype=np.float64):
+    # hours broadcasts against shape, so a leading scenario axis can be sampled in one call
+    factor = demand_factor(hours)
+    shape = factor.shape if shape is None else shape
+    demand = scaled_noise(rng, base_demand * factor, DEMAND_NOISE, shape, dtype)
+    price = scaled_noise(rng, base_price * factor, PRICE_NOISE, shape, dtype)
+    return demand, price
 
 class GridDataGenerator:
-    def __init__(self, base_demand, base_price):
+    def __init__(self, base_demand, base_price, rng=np.random):
         self.base_demand = base_demand
         self.base_price = base_price
+        self.rng = rng
 
     def generate_data(self, start_time, end_time, freq='5T'):
+        import pandas as pd
+
         date_range = pd.date_range(start=start_time, end=end_time, freq=freq.replace('T', 'min'))
-        data = []
-        for timestamp in date_range:
-            hour = timestamp.hour
-            # Simulate higher demand during day hours
-            demand_factor = 1 + 0.5 * np.sin(np.pi * hour / 12)
-            demand = self.base_demand * demand_factor * (1 + np.random.normal(0, 0.1))
-            price = self.base_price * demand_factor * (1 + np.random.normal(0, 0.05))
-            data.append({
-                'timestamp': timestamp,
-                'demand': demand,  # Changed from 'grid_demand' to 'demand'
-                'price': price     # Changed from 'energy_price' to 'price'
-            })
-        return pd.DataFrame(data)
+        demand, price = sample_grid_data(self.base_demand, self.base_price, date_range.hour, rng=self.rng)
+        return pd.DataFrame({
+            'timestamp': date_range,
+            'demand': demand,  # Changed from 'grid_demand' to 'demand'
+            'price': price     # Changed from 'energy_price' to 'price'
+        })
 
 # Test the generator
 if __name__ == "__main__":
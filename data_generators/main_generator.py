@@ -2,23 +2,33 @@
 from .pump_data import PumpDataGenerator
 from .aeration_data import AerationDataGenerator
 from .grid_data import GridDataGenerator
+from .batch_generator import BatchDataGenerator
+from .fleet import Fleet
+from .plant_state import PlantState
+from .streams import StreamGenerator, device_rng, PUMP_STREAM, BASIN_STREAM, GRID_STREAM
+import numpy as np
 import pandas as pd
+import config
 
 class DataGenerator:  # Renamed from WWTPDataGenerator to DataGenerator
-    def __init__(self):
+    def __init__(self, fleet=None, seed=None):
+        self.fleet = fleet if fleet is not None else Fleet.default()
+        # Every device gets its own SeedSequence child of one root seed (drawn from OS entropy when
+        # seed is None and kept, so the run can be repeated with DataGenerator(seed=generator.seed))
+        self.seed = np.random.SeedSequence(seed).entropy
         self.pump_generators = [
-            PumpDataGenerator('pump001', 100, 0.8),
-            PumpDataGenerator('pump002', 120, 0.85),
-            PumpDataGenerator('pump003', 90, 0.75),
-            PumpDataGenerator('pump004', 110, 0.82),
-            PumpDataGenerator('pump005', 105, 0.78)
+            PumpDataGenerator(pump_id, power, efficiency, device_rng(self.seed, PUMP_STREAM, i))
+            for i, (pump_id, power, efficiency) in enumerate(
+                zip(self.fleet.pump_ids, self.fleet.pump_base_power, self.fleet.pump_efficiency))
         ]
         self.aeration_generators = [
-            AerationDataGenerator('basin001', 200, 2.0),
-            AerationDataGenerator('basin002', 220, 2.2),
-            AerationDataGenerator('basin003', 210, 2.1)
+            AerationDataGenerator(basin_id, power, do_level, device_rng(self.seed, BASIN_STREAM, i))
+            for i, (basin_id, power, do_level) in enumerate(
+                zip(self.fleet.basin_ids, self.fleet.basin_base_power, self.fleet.basin_base_do))
         ]
-        self.grid_generator = GridDataGenerator(5000, 0.1)
+        self.grid_generator = GridDataGenerator(self.fleet.grid_base_demand, self.fleet.grid_base_price,
+                                                device_rng(self.seed, GRID_STREAM, 0))
+        self.batch_generator = BatchDataGenerator(self.fleet, seed=self.seed)
 
     def generate_data(self, start_time, end_time, freq='5T'):
         pump_data = pd.concat([gen.generate_data(start_time, end_time, freq) for gen in self.pump_generators])
@@ -27,6 +37,30 @@ class DataGenerator:  # Renamed from WWTPDataGenerator to DataGenerator
         
         return pump_data, aeration_data, grid_data
 
+    def generate_batch(self, start_time, end_time, freq='5T'):
+        # All devices x all timestamps as NumPy arrays, see BatchDataGenerator.generate_arrays
+        return self.batch_generator.generate_arrays(start_time, end_time, freq)
+
+    def stream(self, origin=None, freq='1min', chunk_size=config.SIMULATION_CHUNK_TICKS):
+        """StreamGenerator over this fleet and seed, chunked from origin (default: today at midnight)."""
+        return StreamGenerator(self.fleet, seed=self.seed, origin=origin, freq=freq, chunk_size=chunk_size)
+
+    def iter_chunks(self, start_time, end_time=None, freq='1min', chunk_size=config.SIMULATION_CHUNK_TICKS,
+                    origin=None, workers=1):
+        # Lazily yields generate_batch()-style arrays of at most chunk_size ticks over [start_time, end_time)
+        # (end_time None = forever). Chunks are aligned on origin (default: start_time), so the same origin
+        # gives the same data whichever worker generates a chunk and wherever the range starts or ends.
+        stream = self.stream(origin if origin is not None else start_time, freq, chunk_size)
+        return stream.iter_range(start_time, end_time, workers)
+
+    def plant_state(self):
+        return PlantState.from_fleet(self.fleet)
+
+    def generate_state(self, timestamp, state=None):
+        # One tick straight into a (reusable) PlantState, without going through DataFrames
+        state = state if state is not None else self.plant_state()
+        return state.load_arrays(self.generate_batch(timestamp, timestamp), 0, timestamp)
+
 # Usage example:
 if __name__ == "__main__":
     generator = DataGenerator()  # Updated to use the new class name
@@ -0,0 +1,24 @@
+# data_generators/noise.py
+import numpy as np
+
+# Shared draw helpers so the per-device generators (which default to the global
+# np.random state) and the batched generators (np.random.Generator) use the same
+# noise models.
+
+def standard_normal(rng, shape, dtype=np.float64):
+    if isinstance(rng, np.random.Generator):
+        return rng.standard_normal(shape, dtype=dtype)
+    return np.asarray(rng.standard_normal(shape), dtype=dtype)
+
+def uniform(rng, shape, dtype=np.float64):
+    if isinstance(rng, np.random.Generator):
+        return rng.random(shape, dtype=dtype)
+    return np.asarray(rng.random(shape), dtype=dtype)
+
+def scaled_noise(rng, base, sigma, shape, dtype=np.float64):
+    # base * (1 + N(0, sigma)), computed in place to keep large batches cheap
+    values = standard_normal(rng, shape, dtype)
+    values *= sigma
+    values += 1
+    values *= base
+    return values
@@ -0,0 +1,188 @@
+# data_generators/plant_state.py
+import hashlib
+
+import numpy as np
+
+# Pump status codes; optimized_pump_status is UNKNOWN until the DR algorithm has run
+UNKNOWN, IDLE, RUNNING = -1, 0, 1
+STATUS_NAMES = {IDLE: 'idle', RUNNING: 'running'}
+
+def device_signature(pump_ids, basin_ids):
+    # Same digest in every process (unlike hash(), which is salted per interpreter), so solver
+    # caches and warm starts keyed on it agree between portfolio workers
+    key = '\x1f'.join(map(str, pump_ids)) + '\x1e' + '\x1f'.join(map(str, basin_ids))
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def _device_numbers(ids, prefix):
+    # Suffix shared by the IoT Agent device id and Orion entity id, as in provision_devices.py
+    return [device_id[len(prefix):] if device_id.startswith(prefix) else device_id for device_id in ids]
+
+def _number(value):
+    return {"type": "Number", "value": value}
+
+def _text(value):
+    return {"type": "Text", "value": value}
+
+class PlantState:
+    """Columnar state of one plant for a single tick.
+
+    Measured and optimized values live in preallocated NumPy arrays indexed by
+    device position (pump_index/basin_index map ids to positions). Generators
+    write into them with load_arrays(), the DR algorithm fills the optimized_*
+    arrays in place, and the serializers read the arrays directly, so a tick
+    allocates a fixed number of objects regardless of fleet size.
+    """
+
+    def __init__(self, pump_ids, basin_ids):
+        self.pump_ids = list(pump_ids)
+        self.basin_ids = list(basin_ids)
+        self.pump_index = {pump_id: i for i, pump_id in enumerate(self.pump_ids)}
+        self.basin_index = {basin_id: i for i, basin_id in enumerate(self.basin_ids)}
+        # Full suffixes, so pump1000 no longer collides with pump000
+        pump_numbers = _device_numbers(self.pump_ids, 'pump')
+        basin_numbers = _device_numbers(self.basin_ids, 'basin')
+        self.device_ids = [f"pump{number}" for number in pump_numbers] + \
+            [f"aeration{number}" for number in basin_numbers] + ["grid001"]
+        self.entity_ids = [f"urn:ngsi-ld:Pump:{number}" for number in pump_numbers] + \
+            [f"urn:ngsi-ld:AerationBasin:{number}" for number in basin_numbers] + ["urn:ngsi-ld:GridDemand:001"]
+        self.entity_types = ['Pump'] * len(pump_numbers) + ['AerationBasin'] * len(basin_numbers) + ['GridDemand']
+        # Identifies the device set, e.g. for solver state that is only valid for one fleet
+        self.signature = device_signature(self.pump_ids, self.basin_ids)
+
+        n_pumps, n_basins = len(self.pump_ids), len(self.basin_ids)
+        self.timestamp = None
+        self.pump_power = np.zeros(n_pumps)
+        self.pump_efficiency = np.zeros(n_pumps)
+        self.pump_status = np.zeros(n_pumps, dtype=np.int8)
+        self.optimized_pump_power = np.full(n_pumps, np.nan)
+        self.optimized_pump_efficiency = np.full(n_pumps, np.nan)
+        self.optimized_pump_status = np.full(n_pumps, UNKNOWN, dtype=np.int8)
+        self.basin_power = np.zeros(n_basins)
+        self.basin_dissolved_oxygen = np.zeros(n_basins)
+        self.optimized_basin_power = np.full(n_basins, np.nan)
+        self.optimized_basin_dissolved_oxygen = np.full(n_basins, np.nan)
+        self.grid_demand = 0.0
+        self.grid_price = 0.0
+        self.optimized = False
+
+    @classmethod
+    def from_fleet(cls, fleet):
+        return cls(fleet.pump_ids, fleet.basin_ids)
+
+    @property
+    def num_pumps(self):
+        return len(self.pump_ids)
+
+    @property
+    def num_basins(self):
+        return len(self.basin_ids)
+
+    def load_arrays(self, arrays, column, timestamp=None):
+        """Copy one column of BatchDataGenerator.generate_arrays() output into the state."""
+        np.copyto(self.pump_power, arrays['pump_power'][:, column])
+        np.copyto(self.pump_efficiency, arrays['pump_efficiency'][:, column])
+        np.copyto(self.pump_status, arrays['pump_running'][:, column], casting='unsafe')
+        np.copyto(self.basin_power, arrays['basin_power'][:, column])
+        np.copyto(self.basin_dissolved_oxygen, arrays['basin_dissolved_oxygen'][:, column])
+        self.grid_demand = float(arrays['grid_demand'][column])
+        self.grid_price = float(arrays['grid_price'][column])
+        self.timestamp = timestamp if timestamp is not None else arrays['timestamp'][column]
+        self.clear_optimized()
+        return self
+
+    def clear_optimized(self):
+        self.optimized_pump_power.fill(np.nan)
+        self.optimized_pump_efficiency.fill(np.nan)
+        self.optimized_pump_status.fill(UNKNOWN)
+        self.optimized_basin_power.fill(np.nan)
+        self.optimized_basin_dissolved_oxygen.fill(np.nan)
+        self.optimized = False
+
+    def set_optimized(self, result):
+        """Store DemandResponseAlgorithm.optimize_arrays() output."""
+        np.copyto(self.optimized_pump_power, result['pump_power'])
+        np.copyto(self.optimized_pump_efficiency, result['pump_efficiency'])
+        np.copyto(self.optimized_pump_status, result['pump_running'], casting='unsafe')
+        np.copyto(self.optimized_basin_power, result['basin_power'])
+        np.copyto(self.optimized_basin_dissolved_oxygen, result['basin_dissolved_oxygen'])
+        self.optimized = True
+
+    def copy(self):
+        # Shares the (immutable) id lists and indexes; only the value arrays are copied
+        state = object.__new__(PlantState)
+        state.__dict__.update(self.__dict__)
+        for name, value in self.__dict__.items():
+            if isinstance(value, np.ndarray):
+                setattr(state, name, value.copy())
+        return state
+
+    def _optimized_values(self, array):
+        return array.tolist() if self.optimized else [None] * len(array)
+
+    def _status_names(self, codes):
+        return [STATUS_NAMES.get(code) for code in codes.tolist()]
+
+    def pump_records(self):
+        # Same fields as the dashboard's pump rows
+        return [
+            {'id': pump_id, 'power': power, 'efficiency': efficiency, 'status': status,
+             'optimized_power': optimized_power, 'optimized_efficiency': optimized_efficiency,
+             'optimized_status': optimized_status}
+            for pump_id, power, efficiency, status, optimized_power, optimized_efficiency, optimized_status in zip(
+                self.pump_ids, self.pump_power.tolist(), self.pump_efficiency.tolist(),
+                self._status_names(self.pump_status), self._optimized_values(self.optimized_pump_power),
+                self._optimized_values(self.optimized_pump_efficiency), self._status_names(self.optimized_pump_status))
+        ]
+
+    def basin_records(self):
+        return [
+            {'id': basin_id, 'power': power, 'dissolved_oxygen': do_level,
+             'optimized_power': optimized_power, 'optimized_dissolved_oxygen': optimized_do}
+            for basin_id, power, do_level, optimized_power, optimized_do in zip(
+                self.basin_ids, self.basin_power.tolist(), self.basin_dissolved_oxygen.tolist(),
+                self._optimized_values(self.optimized_basin_power),
+                self._optimized_values(self.optimized_basin_dissolved_oxygen))
+        ]
+
+    def grid_record(self):
+        return {'demand': self.grid_demand, 'price': self.grid_price}
+
+    def dashboard_payload(self, timestamp=None):
+        data = {
+            'pumps': self.pump_records(),
+            'aeration_basins': self.basin_records(),
+            'grid': self.grid_record()
+        }
+        if timestamp is not None:
+            data['timestamp'] = timestamp
+        return data
+
+    def device_attributes(self):
+        """NGSI attributes of every device, aligned with device_ids (pumps, basins, grid)."""
+        for record in self.pump_records():
+            yield {
+                "power": _number(record['power']),
+                "status": _text(record['status']),
+                "efficiency": _number(record['efficiency']),
+                "optimized_power": _number(record['optimized_power']),
+                "optimized_status": _text(record['optimized_status']),
+                "optimized_efficiency": _number(record['optimized_efficiency'])
+            }
+        for record in self.basin_records():
+            yield {
+                "power": _number(record['power']),
+                "dissolved_oxygen": _number(record['dissolved_oxygen']),
+                "optimized_power": _number(record['optimized_power']),
+                "optimized_dissolved_oxygen": _number(record['optimized_dissolved_oxygen'])
+            }
+        yield {
+            "demand": _number(self.grid_demand),
+            "price": _number(self.grid_price)
+        }
+
+    def ngsi_entities(self):
+        """NGSI v2 entities for OrionInterface.batch_update, named as provision_devices.py registers them."""
+        return [
+            dict(attributes, id=entity_id, type=entity_type)
+            for entity_id, entity_type, attributes in zip(self.entity_ids, self.entity_types, self.device_attributes())
+        ]
@@ -1,25 +1,35 @@
 # data_generators/pump_data.py
 import numpy as np
-import pandas as pd
+
+from .noise import scaled_noise, uniform
+
+POWER_NOISE = 0.1
+EFFICIENCY_NOISE = 0.05
+IDLE_PROBABILITY = 0.05
+
+def sample_pump_data(base_power, efficiency, shape, rng=np.random, dtype=np.float64):
+    # base_power/efficiency broadcast against shape, e.g. (n_pumps, 1) for (n_pumps, n_steps)
+    power = scaled_noise(rng, base_power, POWER_NOISE, shape, dtype)
+    running = uniform(rng, shape, dtype) > IDLE_PROBABILITY
+    efficiency = scaled_noise(rng, efficiency, EFFICIENCY_NOISE, shape, dtype)
+    return power, running, efficiency
 
 class PumpDataGenerator:
-    def __init__(self, pump_id, base_power, efficiency):
+    def __init__(self, pump_id, base_power, efficiency, rng=np.random):
         self.pump_id = pump_id
         self.base_power = base_power
         self.efficiency = efficiency
+        self.rng = rng
 
     def generate_data(self, start_time, end_time, freq='5T'):
+        import pandas as pd  # only the DataFrame API needs it; the samplers are NumPy-only
+
         date_range = pd.date_range(start=start_time, end=end_time, freq=freq.replace('T', 'min'))
-        data = []
-        for timestamp in date_range:
-            power = self.base_power * (1 + np.random.normal(0, 0.1))
-            status = 'running' if np.random.random() > 0.05 else 'idle'
-            efficiency = self.efficiency * (1 + np.random.normal(0, 0.05))
-            data.append({
-                'timestamp': timestamp,
-                'pump_id': self.pump_id,
-                'power': power,
-                'status': status,
-                'efficiency': efficiency
-            })
-        return pd.DataFrame(data)
\ No newline at end of file
+        power, running, efficiency = sample_pump_data(self.base_power, self.efficiency, len(date_range), self.rng)
+        return pd.DataFrame({
+            'timestamp': date_range,
+            'pump_id': self.pump_id,
+            'power': power,
+            'status': np.where(running, 'running', 'idle'),
+            'efficiency': efficiency
+        })
\ No newline at end of file
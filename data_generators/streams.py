@@ -0,0 +1,128 @@
+# data_generators/streams.py
+from concurrent.futures import ProcessPoolExecutor
+from itertools import count
+
+import numpy as np
+import pandas as pd
+
+import config
+from .pump_data import sample_pump_data
+from .aeration_data import sample_aeration_data
+from .grid_data import sample_grid_data
+
+# First spawn-key element of each device kind's streams
+PUMP_STREAM, BASIN_STREAM, GRID_STREAM = 0, 1, 2
+
+def device_rng(entropy, kind, index, chunk=None):
+    """Generator of one device's stream (or of one chunk of it), independent of every other device."""
+    spawn_key = (kind, index) if chunk is None else (kind, index, chunk)
+    return np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=spawn_key))
+
+class StreamGenerator:
+    """Fleet data over an unbounded horizon, addressable chunk by chunk.
+
+    Time is cut into chunks of chunk_size intervals counted from origin, and
+    every device draws each chunk from its own SeedSequence child keyed on
+    (device kind, device index, chunk index). Chunk k is therefore the same
+    whichever process generates it, in whatever order, and whatever the end
+    of the horizon; adding devices at the end of the fleet leaves the
+    existing devices' data unchanged.
+    """
+
+    def __init__(self, fleet, seed=None, origin=None, freq='1min', chunk_size=config.SIMULATION_CHUNK_TICKS,
+                 dtype=np.float32):
+        self.fleet = fleet
+        # Keep the entropy, so an unseeded generator can still be reproduced (and pickled to workers)
+        self.entropy = np.random.SeedSequence(seed).entropy
+        self.origin = np.datetime64(pd.Timestamp(origin if origin is not None else pd.Timestamp.now().normalize()), 'ns')
+        self.interval = np.timedelta64(pd.Timedelta(freq.replace('T', 'min')))
+        self.chunk_size = chunk_size
+        self.dtype = dtype
+
+    def chunk_index(self, timestamp):
+        """Chunk holding timestamp (rounded down to the interval grid)."""
+        return int((np.datetime64(pd.Timestamp(timestamp), 'ns') - self.origin) // (self.interval * self.chunk_size))
+
+    def chunk(self, index):
+        """generate_arrays()-style arrays for chunk `index`."""
+        fleet = self.fleet
+        n = self.chunk_size
+        timestamps = self.origin + (index * n + np.arange(n)) * self.interval
+
+        pump_power = np.empty((fleet.num_pumps, n), dtype=self.dtype)
+        pump_running = np.empty((fleet.num_pumps, n), dtype=bool)
+        pump_efficiency = np.empty((fleet.num_pumps, n), dtype=self.dtype)
+        for i in range(fleet.num_pumps):
+            pump_power[i], pump_running[i], pump_efficiency[i] = sample_pump_data(
+                fleet.pump_base_power[i], fleet.pump_efficiency[i], n,
+                device_rng(self.entropy, PUMP_STREAM, i, index), self.dtype)
+
+        basin_power = np.empty((fleet.num_basins, n), dtype=self.dtype)
+        basin_do = np.empty((fleet.num_basins, n), dtype=self.dtype)
+        for i in range(fleet.num_basins):
+            basin_power[i], basin_do[i] = sample_aeration_data(
+                fleet.basin_base_power[i], fleet.basin_base_do[i], n,
+                device_rng(self.entropy, BASIN_STREAM, i, index), self.dtype)
+
+        hours = (timestamps.astype('datetime64[h]') - timestamps.astype('datetime64[D]')).astype(np.int64)
+        grid_demand, grid_price = sample_grid_data(
+            fleet.grid_base_demand, fleet.grid_base_price, hours,
+            rng=device_rng(self.entropy, GRID_STREAM, 0, index), dtype=self.dtype)
+
+        return {
+            'chunk': index,
+            'timestamp': timestamps,
+            'pump_ids': fleet.pump_ids,
+            'pump_power': pump_power,
+            'pump_running': pump_running,
+            'pump_efficiency': pump_efficiency,
+            'basin_ids': fleet.basin_ids,
+            'basin_power': basin_power,
+            'basin_dissolved_oxygen': basin_do,
+            'grid_demand': grid_demand,
+            'grid_price': grid_price
+        }
+
+    def chunks(self, first=0, last=None, workers=1):
+        """Lazily yield chunks first..last (inclusive; None = forever) in order.
+
+        With workers > 1 chunks are generated in a process pool, at most
+        2 * workers ahead of the consumer.
+        """
+        indices = iter(range(first, last + 1)) if last is not None else count(first)
+        if not workers or workers <= 1:
+            for index in indices:
+                yield self.chunk(index)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = []
+            for index in indices:
+                pending.append(executor.submit(self.chunk, index))
+                if len(pending) >= 2 * workers:
+                    yield pending.pop(0).result()
+            for future in pending:
+                yield future.result()
+
+    def iter_range(self, start_time, end_time=None, workers=1):
+        """Chunks covering [start_time, end_time), trimmed to that range; end_time None = unbounded."""
+        start = np.datetime64(pd.Timestamp(start_time), 'ns')
+        end = np.datetime64(pd.Timestamp(end_time), 'ns') if end_time is not None else None
+        last = self.chunk_index(end - np.timedelta64(1, 'ns')) if end is not None else None
+        for arrays in self.chunks(self.chunk_index(start), last, workers):
+            timestamps = arrays['timestamp']
+            lo = int(np.searchsorted(timestamps, start))
+            hi = int(np.searchsorted(timestamps, end)) if end is not None else len(timestamps)
+            if lo > 0 or hi < len(timestamps):
+                arrays = trim_chunk(arrays, lo, hi)
+            if len(arrays['timestamp']):
+                yield arrays
+
+def trim_chunk(arrays, lo, hi):
+    trimmed = {}
+    for key, value in arrays.items():
+        if isinstance(value, np.ndarray):
+            trimmed[key] = value[..., lo:hi]
+        else:
+            trimmed[key] = value
+    return trimmed
@@ -1,5 +1,14 @@
 # wastewater_dr_twin/demand_response/__init__.py
+from lazy_imports import lazy_exports
 
-from .algorithm import DemandResponseAlgorithm
+# Resolved on first access: HorizonScheduler needs scipy, the vectorized solver does not
+_EXPORTS = {
+    'DemandResponseAlgorithm': '.algorithm',
+    'solve_box_lp': '.algorithm',
+    'SolutionCache': '.solver_cache',
+    'ProcessModel': '.process_model',
+    'HorizonScheduler': '.scheduler'
+}
 
-__all__ = ['DemandResponseAlgorithm']
\ No newline at end of file
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(globals(), _EXPORTS)
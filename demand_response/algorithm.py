@@ -1,70 +1,256 @@
 # wastewater_dr_twin/demand_response/demand_response_algorithm.py
 
 import numpy as np
-from scipy.optimize import minimize
+
+import config
+import metrics
+from .process_model import ProcessModel
+from .solver_cache import SolutionCache
+
+SOLVERS = ('slsqp', 'vectorized')
+
+SOLVE_SECONDS = metrics.histogram('dr_solve_seconds', "Demand response solve time", ['solver'])
+SOLVER_ITERATIONS = metrics.histogram('dr_solver_iterations', "SLSQP iterations per solve",
+                                      buckets=(1, 2, 5, 10, 20, 50, 100, 200))
+SOLVER_FAILURES = metrics.counter('dr_solver_failures_total', "SLSQP solves that did not report success")
+SOLVE_DEVICES = metrics.gauge('dr_devices', "Devices in the last demand response solve")
+CACHE_REQUESTS = metrics.counter('dr_cache_requests_total', "Solution cache lookups", ['result'])
+
+def solve_box_lp(cost, lower, upper):
+    # Closed form of min cost @ x s.t. lower <= x <= upper: every variable sits on the
+    # bound its cost coefficient points to (zero-cost variables keep the upper bound).
+    return np.where(cost > 0, lower, upper)
+
+class _SLSQPProblem:
+    """Constraint and objective structure for one device set, reused across ticks.
+
+    The 2n box constraints are two vectorized inequality blocks with constant
+    Jacobians reading the bounds from arrays that are refreshed per call,
+    instead of 2n Python closures rebuilt every tick.
+    """
+
+    def __init__(self, n):
+        self.lower = np.zeros(n)
+        self.upper = np.zeros(n)
+        self.total = 1.0
+        self.previous = None  # last solution, for warm starts
+        identity = np.eye(n)
+        self.gradient = np.ones(n)
+        self.constraints = [
+            {'type': 'ineq', 'fun': lambda x: x - self.lower, 'jac': lambda x: identity},
+            {'type': 'ineq', 'fun': lambda x: self.upper - x, 'jac': lambda x: -identity}
+        ]
+
+    def objective(self, x):
+        # Minimize negative power reduction (maximize reduction)
+        return -(self.total - x.sum()) / self.total
+
+    def jacobian(self, x):
+        return self.gradient / self.total
 
 class DemandResponseAlgorithm:
-    def __init__(self):
+    def __init__(self, solver='slsqp', cache_size=0, power_quantum=1.0, price_quantum=0.01, warm_start=True,
+                 process_model=None):
+        if solver not in SOLVERS:
+            raise ValueError(f"Unknown solver '{solver}', expected one of {SOLVERS}")
+        self.solver = solver
         self.pump_efficiency_threshold = 0.75
         self.do_lower_limit = 1.5
         self.do_upper_limit = 2.5
         self.max_power_reduction = 0.3  # Maximum 30% power reduction
+        # With a process model (demand_response.process_model.ProcessModel) basin setpoints are held to the
+        # DO band, raising a basin by up to max_power_increase when its DO would otherwise stay below it
+        self.process_model = process_model
+        self.max_power_increase = 0.2
+
+        # Solver state kept between calls
+        self.warm_start = warm_start
+        self.cache = SolutionCache(cache_size, power_quantum, price_quantum) if cache_size else None
+        self._problems = {}  # device-set signature -> _SLSQPProblem
+        self.problem_builds = 0
+        self.warm_starts = 0
+
+    @classmethod
+    def from_config(cls, solver=None, process_model=None):
+        """Algorithm set up from the DR_* settings in config.
+
+        solver overrides DR_SOLVER and process_model the DR_PROCESS_MODEL choice.
+        """
+        if process_model is None and config.DR_PROCESS_MODEL:
+            process_model = ProcessModel()
+        return cls(solver=solver or config.DR_SOLVER, cache_size=config.DR_CACHE_SIZE,
+                   power_quantum=config.DR_CACHE_POWER_QUANTUM, price_quantum=config.DR_CACHE_PRICE_QUANTUM,
+                   warm_start=config.DR_WARM_START, process_model=process_model)
+
+    def power_bounds(self, power):
+        return power * (1 - self.max_power_reduction), power
+
+    def pump_bounds(self, pump_power):
+        lower, upper = self.power_bounds(pump_power)
+        if self.process_model is None:
+            return lower, upper
+        return self.process_model.pump_bounds(pump_power, lower, upper)
+
+    def basin_bounds(self, basin_power, basin_do):
+        lower, upper = self.power_bounds(basin_power)
+        if self.process_model is None:
+            return lower, upper
+        lower, upper, _ = self.process_model.basin_bounds(
+            basin_power, basin_do, lower, basin_power * (1 + self.max_power_increase),
+            self.do_lower_limit, self.do_upper_limit)
+        return lower, upper
+
+    def _derive(self, pump_power, pump_efficiency, basin_power, basin_do, new_pump_power, new_basin_power):
+        if self.process_model is not None:
+            return self.process_model.derive(pump_power, pump_efficiency, basin_power, basin_do,
+                                             new_pump_power, new_basin_power)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            new_efficiency = pump_efficiency * (pump_power / new_pump_power)  # Assuming efficiency scales linearly
+            new_do = basin_do * (new_basin_power / basin_power)  # Assuming DO scales linearly with power
+
+        return {
+            'pump_power': new_pump_power,
+            'pump_efficiency': new_efficiency,
+            'pump_running': new_pump_power > 0,
+            'basin_power': new_basin_power,
+            'basin_dissolved_oxygen': new_do
+        }
+
+    def optimize_arrays(self, pump_power, pump_efficiency, basin_power, basin_do):
+        """Vectorized solve over device power arrays.
+
+        The objective (maximize total power reduction) is linear and every
+        constraint is a per-device box, so the LP separates and is solved in
+        closed form. Inputs may carry leading batch axes; outputs keep the
+        input shapes. With a process model the DO band only narrows the basin
+        boxes, so this still holds.
+        """
+        pump_power = np.asarray(pump_power, dtype=np.float64)
+        basin_power = np.asarray(basin_power, dtype=np.float64)
+        basin_do = np.asarray(basin_do, dtype=np.float64)
+
+        new_pump_power = solve_box_lp(1.0, *self.pump_bounds(pump_power))
+        new_basin_power = solve_box_lp(1.0, *self.basin_bounds(basin_power, basin_do))
+        return self._derive(pump_power, pump_efficiency, basin_power, basin_do, new_pump_power, new_basin_power)
+
+    def solve(self, pump_power, pump_efficiency, basin_power, basin_do, price=None, signature=None):
+        """Single-tick solve with the configured solver, the solution cache and warm starts.
+
+        signature identifies the device set (e.g. PlantState.signature); the
+        cache and the SLSQP structures are only shared between calls with the
+        same signature.
+        """
+        pump_power = np.asarray(pump_power, dtype=np.float64)
+        basin_power = np.asarray(basin_power, dtype=np.float64)
+        basin_do = np.asarray(basin_do, dtype=np.float64)
+        signature = signature if signature is not None else (len(pump_power), len(basin_power))
+        SOLVE_DEVICES.set(len(pump_power) + len(basin_power))
+
+        key = None
+        if self.cache is not None:
+            # DO only moves the solution when the basin boxes depend on it
+            key = self.cache.key(pump_power, basin_power, price, signature,
+                                 basin_do if self.process_model is not None else None)
+            ratios = self.cache.get(key)
+            CACHE_REQUESTS.inc(result='miss' if ratios is None else 'hit')
+            if ratios is not None:
+                # Near-repeat of a cached state: same relative setpoints, no solve
+                return self._derive(pump_power, pump_efficiency, basin_power, basin_do,
+                                    pump_power * ratios[0], basin_power * ratios[1])
+
+        with SOLVE_SECONDS.time(solver=self.solver):
+            pump_lower, pump_upper = self.pump_bounds(pump_power)
+            basin_lower, basin_upper = self.basin_bounds(basin_power, basin_do)
+            if self.solver == 'vectorized':
+                new_pump_power = solve_box_lp(1.0, pump_lower, pump_upper)
+                new_basin_power = solve_box_lp(1.0, basin_lower, basin_upper)
+            else:
+                new_power = self._solve_slsqp(np.concatenate([pump_power, basin_power]),
+                                              np.concatenate([pump_lower, basin_lower]),
+                                              np.concatenate([pump_upper, basin_upper]), signature)
+                new_pump_power, new_basin_power = new_power[:len(pump_power)], new_power[len(pump_power):]
+
+        if key is not None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ratios = (np.where(pump_power > 0, new_pump_power / pump_power, 1.0),
+                          np.where(basin_power > 0, new_basin_power / basin_power, 1.0))
+            self.cache.put(key, ratios)
+        return self._derive(pump_power, pump_efficiency, basin_power, basin_do, new_pump_power, new_basin_power)
+
+    def _solve_slsqp(self, power, lower, upper, signature):
+        # Imported on first use: scipy dominates start-up time and the vectorized solver never needs it
+        from scipy.optimize import minimize
+
+        problem = self._problems.get(signature)
+        if problem is None:
+            problem = self._problems[signature] = _SLSQPProblem(len(power))
+            self.problem_builds += 1
+
+        np.copyto(problem.lower, lower)
+        np.copyto(problem.upper, upper)
+        problem.total = power.sum()
+
+        # Initial guess: the previous solution moved into this tick's bounds, or the current powers
+        if self.warm_start and problem.previous is not None:
+            x0 = np.clip(problem.previous, problem.lower, problem.upper)
+            self.warm_starts += 1
+        else:
+            x0 = np.clip(power, problem.lower, problem.upper)
+
+        result = minimize(problem.objective, x0, jac=problem.jacobian, method='SLSQP', constraints=problem.constraints)
+        SOLVER_ITERATIONS.observe(result.nit)
+        if not result.success:
+            SOLVER_FAILURES.inc()
+        problem.previous = result.x
+        return result.x
+
+    def stats(self):
+        return {
+            'solver': self.solver,
+            'problem_builds': self.problem_builds,
+            'warm_starts': self.warm_starts,
+            'cache': self.cache.stats() if self.cache is not None else None
+        }
 
     def optimize(self, pumps, aeration_basins, grid_data):
-        current_total_power = sum(pump.power for pump in pumps) + sum(basin.power for basin in aeration_basins)
-        
-        # Define objective function
-        def objective(x):
-            new_total_power = sum(x[:len(pumps)]) + sum(x[len(pumps):])
-            power_reduction = (current_total_power - new_total_power) / current_total_power
-            return -power_reduction  # Minimize negative power reduction (maximize reduction)
-
-        # Define constraints
-        constraints = []
-        
-        # Pump constraints
-        for i, pump in enumerate(pumps):
-            constraints.append({'type': 'ineq', 'fun': lambda x, i=i: x[i] - pump.power * (1 - self.max_power_reduction)})
-            constraints.append({'type': 'ineq', 'fun': lambda x, i=i: pump.power - x[i]})
-        
-        # Aeration basin constraints
-        for i, basin in enumerate(aeration_basins):
-            j = i + len(pumps)
-            constraints.append({'type': 'ineq', 'fun': lambda x, j=j: x[j] - basin.power * (1 - self.max_power_reduction)})
-            constraints.append({'type': 'ineq', 'fun': lambda x, j=j: basin.power - x[j]})
-        
-        # Initial guess
-        x0 = [pump.power for pump in pumps] + [basin.power for basin in aeration_basins]
-        
-        # Solve optimization problem
-        result = minimize(objective, x0, method='SLSQP', constraints=constraints)
-        
-        # Process results
-        optimized_pumps = []
-        optimized_aeration = []
-        
-        for i, pump in enumerate(pumps):
-            new_power = result.x[i]
-            new_efficiency = pump.efficiency * (pump.power / new_power)  # Assuming efficiency scales linearly
-            optimized_pumps.append({
-                'id': pump.id,
-                'power': new_power,
-                'efficiency': new_efficiency,
-                'status': 'running' if new_power > 0 else 'idle'
-            })
-        
-        for i, basin in enumerate(aeration_basins):
-            j = i + len(pumps)
-            new_power = result.x[j]
-            new_do = basin.dissolved_oxygen * (new_power / basin.power)  # Assuming DO scales linearly with power
-            optimized_aeration.append({
-                'id': basin.id,
-                'power': new_power,
-                'dissolved_oxygen': new_do
-            })
-        
+        result = self.solve(
+            np.fromiter((pump.power for pump in pumps), dtype=np.float64, count=len(pumps)),
+            np.fromiter((pump.efficiency for pump in pumps), dtype=np.float64, count=len(pumps)),
+            np.fromiter((basin.power for basin in aeration_basins), dtype=np.float64, count=len(aeration_basins)),
+            np.fromiter((basin.dissolved_oxygen for basin in aeration_basins), dtype=np.float64, count=len(aeration_basins)),
+            getattr(grid_data, 'price', None),
+            (tuple(pump.id for pump in pumps), tuple(basin.id for basin in aeration_basins))
+        )
+
+        optimized_pumps = [
+            {'id': pump.id, 'power': power, 'efficiency': efficiency, 'status': 'running' if running else 'idle'}
+            for pump, power, efficiency, running in zip(
+                pumps, result['pump_power'].tolist(), result['pump_efficiency'].tolist(), result['pump_running'].tolist())
+        ]
+        optimized_aeration = [
+            {'id': basin.id, 'power': power, 'dissolved_oxygen': do_level}
+            for basin, power, do_level in zip(
+                aeration_basins, result['basin_power'].tolist(), result['basin_dissolved_oxygen'].tolist())
+        ]
         return optimized_pumps, optimized_aeration
 
+    def optimize_state(self, state):
+        """Solve for a data_generators.PlantState and write the optimized_* arrays in place."""
+        state.set_optimized(self.solve(state.pump_power, state.pump_efficiency, state.basin_power,
+                                       state.basin_dissolved_oxygen, state.grid_price, state.signature))
+        return state
+
+    def state_recommendations(self, state):
+        """get_recommendations() wording for an optimized PlantState; only changed devices are formatted."""
+        recommendations = []
+        for label, ids, power, optimized in (
+                ('Pump', state.pump_ids, state.pump_power, state.optimized_pump_power),
+                ('Aeration Basin', state.basin_ids, state.basin_power, state.optimized_basin_power)):
+            for i in np.flatnonzero(optimized != power).tolist():
+                action = 'Reduce' if optimized[i] < power[i] else 'Increase'
+                recommendations.append(f"{action} power of {label} {ids[i]} from {power[i]:.2f} to {optimized[i]:.2f}")
+        return recommendations
+
     def get_recommendations(self, pumps, aeration_basins, grid_data):
         optimized_pumps, optimized_aeration = self.optimize(pumps, aeration_basins, grid_data)
         
@@ -0,0 +1,155 @@
+# wastewater_dr_twin/demand_response/process_model.py
+"""Vectorized process model of the aeration basins and pumps.
+
+Aeration: DO in each basin follows the oxygen balance
+
+    dC/dt = kLa(P) * (C_sat - C) - OUR
+
+with kLa proportional to blower power (kla at the basin's reference power).
+The oxygen uptake rate OUR is calibrated per basin by taking the observed
+(power, DO) as a steady state, which gives C_ss(P) = C_sat - (C_sat - DO) * P_ref / P.
+With power held over a step the balance integrates exactly:
+C(t + dt) = C_ss + (C - C_ss) * exp(-kLa * dt).
+
+Pumps: affinity laws against a system curve with a static-head share. At flow
+q (fraction of the reference flow) the system needs head h = h_s + (1 - h_s) q^2,
+the pump reaches it at speed s^2 = (h_s + (a - h_s) q^2) / a (a: shut-off head
+ratio), and the efficiency falls off quadratically as q / s leaves the best
+efficiency point. Shaft power relative to the reference is q * h / efficiency ratio,
+which rises monotonically with q and is inverted by interpolating a table of
+operating points.
+
+Every method is plain NumPy over broadcast arrays, so leading axes can hold
+devices, intervals or candidate setpoints.
+"""
+import numpy as np
+
+import config
+
+SHUTOFF_HEAD = 1.3  # pump head at zero flow, relative to the reference head
+EFFICIENCY_CURVATURE = 0.5  # efficiency loss per squared relative deviation from the best efficiency point
+MIN_EFFICIENCY_RATIO = 0.05
+MAX_FLOW = 2.0  # end of the flow table, relative to the reference flow
+FLOW_TABLE_POINTS = 4097
+BAND_MARGIN = 1e-9
+
+class ProcessModel:
+    def __init__(self, kla=config.AERATION_KLA, saturation=config.DO_SATURATION,
+                 static_head=config.PUMP_STATIC_HEAD, min_pump_flow=config.PUMP_MIN_FLOW):
+        self.kla = kla  # 1/h at the reference power
+        self.saturation = saturation  # mg/L
+        self.static_head = static_head
+        self.min_pump_flow = min_pump_flow
+        self._flow_table = None  # (static_head, power ratios, flows)
+
+    # Aeration
+
+    def _deficit(self, basin_do):
+        # Saturation deficit at the reference point; kept positive so noisy readings at or above
+        # saturation still give a finite steady state
+        return np.maximum(self.saturation - basin_do, 1e-3)
+
+    def oxygen_uptake(self, basin_power, basin_do):
+        """OUR (mg/L/h) that holds basin_do at basin_power in steady state."""
+        return self.kla * self._deficit(np.asarray(basin_do, dtype=np.float64)) * (np.asarray(basin_power) > 0)
+
+    def steady_state_do(self, power, basin_power, basin_do):
+        """DO each basin settles at when power is held, relative to the reference (basin_power, basin_do)."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            do_level = self.saturation - self._deficit(basin_do) * (basin_power / power)
+        return np.maximum(do_level, 0.0)
+
+    def power_for_do(self, target_do, basin_power, basin_do):
+        """Power at which the steady-state DO equals target_do (inf when target_do >= saturation)."""
+        with np.errstate(divide='ignore'):
+            return basin_power * self._deficit(basin_do) / np.maximum(self.saturation - target_do, 0.0)
+
+    def simulate_do(self, power, basin_power, basin_do, dt_hours, uptake=None):
+        """Integrate DO over a power schedule.
+
+        power has shape (..., n_basins, n_steps) and is held over each step of
+        dt_hours; basin_power and basin_do (shape (n_basins,) or broadcastable)
+        are the starting point, also used to calibrate the uptake unless it is
+        given. Returns the DO at the end of every step, same shape as power.
+        """
+        power = np.asarray(power, dtype=np.float64)
+        basin_power = np.asarray(basin_power, dtype=np.float64)[..., None]
+        do_level = np.broadcast_to(np.asarray(basin_do, dtype=np.float64)[..., None], power.shape[:-1] + (1,))
+        uptake = self.oxygen_uptake(basin_power, do_level) if uptake is None else np.asarray(uptake)[..., None]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            kla = np.where(basin_power > 0, self.kla * power / basin_power, 0.0)
+        aerated = kla > 0
+        steady = self.saturation - uptake / np.where(aerated, kla, 1.0)
+        decay = np.exp(-kla * dt_hours)
+        drain = np.broadcast_to(uptake[..., 0] * dt_hours, power.shape[:-1])
+
+        trajectory = np.empty(power.shape)
+        current = do_level[..., 0]
+        for t in range(power.shape[-1]):
+            # Without aeration the uptake drains the basin linearly
+            current = np.where(aerated[..., t], steady[..., t] + (current - steady[..., t]) * decay[..., t],
+                               current - drain)
+            current = np.maximum(current, 0.0)
+            trajectory[..., t] = current
+        return trajectory
+
+    def basin_bounds(self, basin_power, basin_do, lower, upper, do_lower_limit, do_upper_limit):
+        """Intersect the power limits with the powers whose steady-state DO stays within the band.
+
+        Where no power within [lower, upper] reaches the band, both bounds are set to the
+        point of the limits closest to it. Returns (lower, upper, infeasible).
+        """
+        # The margin keeps rounding from putting the steady-state DO a hair outside the band
+        do_lower = self.power_for_do(do_lower_limit, basin_power, basin_do) * (1 + BAND_MARGIN)
+        do_upper = self.power_for_do(do_upper_limit, basin_power, basin_do) * (1 - BAND_MARGIN)
+        band_lower = np.maximum(lower, do_lower)
+        band_upper = np.minimum(upper, do_upper)
+
+        infeasible = band_lower > band_upper
+        fallback = np.where(do_lower > upper, upper, lower)
+        band_lower = np.where(infeasible, fallback, band_lower)
+        band_upper = np.where(infeasible, fallback, band_upper)
+        return band_lower, band_upper, infeasible
+
+    # Pumps
+
+    def pump_operating_point(self, flow):
+        """(speed, head, efficiency ratio, power ratio) at each relative flow."""
+        flow = np.asarray(flow, dtype=np.float64)
+        static = self.static_head
+        head = static + (1 - static) * flow ** 2
+        speed = np.sqrt((static + (SHUTOFF_HEAD - static) * flow ** 2) / SHUTOFF_HEAD)
+        efficiency = np.maximum(1 - EFFICIENCY_CURVATURE * (flow / speed - 1) ** 2, MIN_EFFICIENCY_RATIO)
+        return speed, head, efficiency, flow * head / efficiency
+
+    def pump_flow(self, power_ratio):
+        """Relative flow delivered at power_ratio x the reference power."""
+        if self._flow_table is None or self._flow_table[0] != self.static_head:
+            flows = np.linspace(0.0, MAX_FLOW, FLOW_TABLE_POINTS)
+            self._flow_table = (self.static_head, self.pump_operating_point(flows)[3], flows)
+        _, power_ratios, flows = self._flow_table
+        return np.interp(power_ratio, power_ratios, flows)
+
+    def pump_bounds(self, pump_power, lower, upper):
+        """Raise the lower power limit so every pump keeps at least min_pump_flow."""
+        if not self.min_pump_flow:
+            return lower, upper
+        floor = pump_power * self.pump_operating_point(self.min_pump_flow)[3]
+        lower = np.minimum(np.maximum(lower, floor), upper)
+        return lower, upper
+
+    def derive(self, pump_power, pump_efficiency, basin_power, basin_do, new_pump_power, new_basin_power):
+        """DemandResponseAlgorithm result dict for new setpoints, plus the relative pump flow."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            power_ratio = np.where(pump_power > 0, new_pump_power / pump_power, 0.0)
+        flow = self.pump_flow(power_ratio)
+        efficiency_ratio = self.pump_operating_point(flow)[2]
+        return {
+            'pump_power': new_pump_power,
+            'pump_efficiency': np.asarray(pump_efficiency) * efficiency_ratio,
+            'pump_running': new_pump_power > 0,
+            'pump_flow': flow,
+            'basin_power': new_basin_power,
+            'basin_dissolved_oxygen': self.steady_state_do(new_basin_power, basin_power, basin_do)
+        }
@@ -0,0 +1,167 @@
+# wastewater_dr_twin/demand_response/scheduler.py
+
+import math
+
+import numpy as np
+from scipy import sparse
+from scipy.optimize import linprog
+
+from .algorithm import DemandResponseAlgorithm
+
+class HorizonScheduler:
+    """Day-ahead DR schedule solved jointly over every device and interval.
+
+    Variables are the power setpoints x[d, t] of all pumps and aeration basins
+    over the horizon. The LP minimizes the energy cost against the price curve
+    subject to:
+      - per-device power limits around the baseline (the algorithm's
+        max_power_reduction below, max_power_increase above),
+      - the DO band (do_lower_limit/do_upper_limit) for basins, using the
+        algorithm's process model when it has one and otherwise the same
+        linear DO/power relation as DemandResponseAlgorithm,
+      - each device delivering at least min_energy_fraction of its baseline
+        energy over the horizon (pumped volume / oxygen demand must still be met),
+      - a plant-level cap of (1 - peak_reduction) x baseline load in the
+        ceil((1 - peak_quantile) x n_steps) intervals with the highest grid
+        demand (none when demand is flat). Where the devices cannot move
+        enough energy out of the peak the cap is raised to what they need, so
+        it never makes the energy constraints infeasible.
+    The energy and peak constraints couple devices and intervals, so the whole
+    horizon goes to HiGHS as one sparse problem.
+    """
+
+    def __init__(self, dr_algorithm=None, max_power_increase=0.2, min_energy_fraction=1.0,
+                 peak_quantile=0.9, peak_reduction=0.1):
+        self.dr_algorithm = dr_algorithm if dr_algorithm is not None else DemandResponseAlgorithm()
+        self.max_power_increase = max_power_increase
+        self.min_energy_fraction = min_energy_fraction
+        self.peak_quantile = peak_quantile
+        self.peak_reduction = peak_reduction
+
+    def _basin_bounds(self, basin_power, basin_do, lower, upper):
+        algorithm = self.dr_algorithm
+        if algorithm.process_model is not None:
+            return algorithm.process_model.basin_bounds(basin_power, basin_do, lower, upper,
+                                                        algorithm.do_lower_limit, algorithm.do_upper_limit)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            power_per_do = basin_power / basin_do
+        do_lower = algorithm.do_lower_limit * power_per_do
+        do_upper = algorithm.do_upper_limit * power_per_do
+        band_lower = np.maximum(lower, do_lower)
+        band_upper = np.minimum(upper, do_upper)
+
+        # Where the power limits cannot reach the DO band, hold the setpoint
+        # as close to the band as the power limits allow
+        infeasible = band_lower > band_upper
+        fallback = np.clip((do_lower + do_upper) / 2, lower, upper)
+        band_lower = np.where(infeasible, fallback, band_lower)
+        band_upper = np.where(infeasible, fallback, band_upper)
+        return band_lower, band_upper, infeasible
+
+    def peak_intervals(self, demand):
+        # By rank rather than by threshold, so ties at the top cannot flag most of the horizon
+        demand = np.asarray(demand, dtype=np.float64)
+        peak = np.zeros(len(demand), dtype=bool)
+        if len(demand) and demand.max() > demand.min():
+            # round() keeps float noise in (1 - peak_quantile) from adding an interval
+            count = math.ceil(round((1 - self.peak_quantile) * len(demand), 9))
+            peak[np.argsort(-demand, kind='stable')[:count]] = True
+        return peak
+
+    def _peak_floor(self, lower, upper, required, peak):
+        # Plant load in each peak interval of a schedule that meets every device's
+        # energy: off-peak intervals at their upper bound, the rest spread over the
+        # peak intervals in proportion to each interval's headroom
+        headroom = (upper - lower)[:, peak]
+        needed = required - upper[:, ~peak].sum(axis=1) - lower[:, peak].sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fill = np.clip(np.nan_to_num(needed / headroom.sum(axis=1)), 0.0, 1.0)
+        return (lower[:, peak] + fill[:, None] * headroom).sum(axis=0)
+
+    def schedule(self, pump_power, basin_power, basin_do, price, demand, interval_hours=5 / 60):
+        """Solve the horizon.
+
+        pump_power, basin_power and basin_do are baselines of shape (n_devices,)
+        or (n_devices, n_steps); price and demand have shape (n_steps,).
+        Returns a dict with per-interval setpoint matrices.
+        """
+        price = np.asarray(price, dtype=np.float64)
+        demand = np.asarray(demand, dtype=np.float64)
+        n_steps = len(price)
+        pump_power = np.broadcast_to(np.asarray(pump_power, dtype=np.float64).reshape(len(pump_power), -1),
+                                     (len(pump_power), n_steps))
+        basin_power = np.broadcast_to(np.asarray(basin_power, dtype=np.float64).reshape(len(basin_power), -1),
+                                      (len(basin_power), n_steps))
+        basin_do = np.broadcast_to(np.asarray(basin_do, dtype=np.float64).reshape(len(basin_do), -1),
+                                   (len(basin_do), n_steps))
+        n_pumps = len(pump_power)
+        baseline = np.vstack([pump_power, basin_power])
+        n_devices = len(baseline)
+        n_vars = n_devices * n_steps
+
+        reduction = self.dr_algorithm.max_power_reduction
+        lower = baseline * (1 - reduction)
+        upper = baseline * (1 + self.max_power_increase)
+        basin_lower, basin_upper, do_infeasible = self._basin_bounds(
+            basin_power, basin_do, lower[n_pumps:], upper[n_pumps:])
+        lower[n_pumps:] = basin_lower
+        upper[n_pumps:] = basin_upper
+
+        # Variables are laid out device-major: x[d, t] -> d * n_steps + t
+        cost = np.tile(price * interval_hours, n_devices)
+
+        # Energy rows: -sum_t x[d, t] <= -min_energy_fraction * baseline energy,
+        # capped at what the bounds can deliver so DO-clamped basins stay feasible
+        required = np.minimum(self.min_energy_fraction * baseline.sum(axis=1), upper.sum(axis=1))
+        energy_rows = sparse.csr_matrix(
+            (np.full(n_vars, -1.0), np.arange(n_vars), np.arange(0, n_vars + 1, n_steps)),
+            shape=(n_devices, n_vars))
+
+        # Peak rows: sum_d x[d, t] <= (1 - peak_reduction) * baseline load for peak intervals
+        peak = self.peak_intervals(demand)
+        peak_steps = np.flatnonzero(peak)
+        cap = np.maximum((1 - self.peak_reduction) * baseline[:, peak_steps].sum(axis=0),
+                         self._peak_floor(lower, upper, required, peak))
+        rows = np.repeat(np.arange(len(peak_steps)), n_devices)
+        cols = (np.arange(n_devices)[None, :] * n_steps + peak_steps[:, None]).ravel()
+        peak_rows = sparse.csr_matrix((np.ones(len(cols)), (rows, cols)), shape=(len(peak_steps), n_vars))
+
+        result = linprog(
+            cost,
+            A_ub=sparse.vstack([energy_rows, peak_rows], format='csr'),
+            b_ub=np.concatenate([-required, cap]),
+            bounds=np.column_stack([lower.ravel(), upper.ravel()]),
+            method='highs'
+        )
+        if result.status != 0:
+            raise RuntimeError(f"Horizon scheduling failed: {result.message}")
+
+        setpoints = result.x.reshape(n_devices, n_steps)
+        aeration_power = setpoints[n_pumps:]
+        if self.dr_algorithm.process_model is not None:
+            dissolved_oxygen = self.dr_algorithm.process_model.steady_state_do(aeration_power, basin_power, basin_do)
+        else:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                dissolved_oxygen = basin_do * (aeration_power / basin_power)
+
+        return {
+            'setpoints': setpoints,
+            'pump_power': setpoints[:n_pumps],
+            'aeration_power': aeration_power,
+            'dissolved_oxygen': dissolved_oxygen,
+            'peak_intervals': peak,
+            'do_infeasible': do_infeasible,
+            'cost': float(result.fun),
+            'baseline_cost': float(cost @ baseline.ravel())
+        }
+
+    def schedule_arrays(self, arrays, interval_hours=5 / 60):
+        # Convenience wrapper for BatchDataGenerator.generate_arrays() output
+        return self.schedule(
+            arrays['pump_power'],
+            arrays['basin_power'],
+            arrays['basin_dissolved_oxygen'],
+            arrays['grid_price'],
+            arrays['grid_demand'],
+            interval_hours
+        )
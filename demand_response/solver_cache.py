@@ -0,0 +1,73 @@
+# wastewater_dr_twin/demand_response/solver_cache.py
+
+from collections import OrderedDict
+
+import numpy as np
+
+class SolutionCache:
+    """LRU cache of DR solutions keyed on a quantized plant state.
+
+    Device powers are rounded to power_quantum (kW), the price to
+    price_quantum and basin DO (when given) to do_quantum (mg/L) before
+    hashing, so near-identical ticks share an entry.
+    Values are stored as setpoint/power ratios, which stay feasible for any
+    plant state that maps to the same key.
+
+    A hit needs every device to land in the same buckets as a cached tick,
+    so the cache helps when plant states recur (replayed telemetry, steady
+    fleets) and costs a key build per tick when they do not.
+    """
+
+    def __init__(self, maxsize=1024, power_quantum=1.0, price_quantum=0.01, do_quantum=0.05):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.power_quantum = power_quantum
+        self.price_quantum = price_quantum
+        self.do_quantum = do_quantum
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, pump_power, basin_power, price=None, signature=None, basin_do=None):
+        # signature identifies the device set, so equal powers of different fleets never collide
+        quantized = np.round(np.concatenate([pump_power, basin_power]) / self.power_quantum).astype(np.int64)
+        price_bucket = None if price is None else int(round(price / self.price_quantum))
+        if basin_do is None:
+            return signature, len(pump_power), price_bucket, quantized.tobytes()
+        do_buckets = np.round(basin_do / self.do_quantum).astype(np.int64)
+        return signature, len(pump_power), price_bucket, quantized.tobytes(), do_buckets.tobytes()
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        requests = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / requests if requests else 0.0
+        }
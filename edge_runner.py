@@ -0,0 +1,142 @@
+# wastewater_dr_twin/edge_runner.py
+"""Lightweight twin loop for edge gateways.
+
+Generates, optimizes and publishes one plant over MQTT with only NumPy and
+paho-mqtt loaded: no pandas, requests or Flask, and scipy only when the SLSQP
+solver is selected. Dashboard pushes and Orion updates are left to the
+central main.py deployment.
+
+    python edge_runner.py --ticks 10 --interval 1
+"""
+import argparse
+import json
+import logging
+import time
+from datetime import datetime
+
+import numpy as np
+
+import config
+import metrics
+from metrics import STAGE_SECONDS, TICKS
+from data_generators.fleet import load_fleet
+from data_generators.plant_state import PlantState
+from data_generators.pump_data import sample_pump_data
+from data_generators.aeration_data import sample_aeration_data
+from data_generators.grid_data import sample_grid_data
+from demand_response.algorithm import DemandResponseAlgorithm
+
+logger = logging.getLogger(__name__)
+
+class EdgeGenerator:
+    """One tick at a time straight into a reusable PlantState, with BatchDataGenerator's noise models.
+
+    Live ticks are drawn in sequence from a single generator, so unlike
+    StreamGenerator chunks they are reproducible only by replaying the run
+    from the start with the same seed.
+    """
+
+    def __init__(self, fleet, seed=None):
+        self.fleet = fleet
+        self.rng = np.random.default_rng(seed)
+        self.state = PlantState.from_fleet(fleet)
+
+    def generate(self, timestamp):
+        fleet = self.fleet
+        pump_power, pump_running, pump_efficiency = sample_pump_data(
+            fleet.pump_base_power[:, None], fleet.pump_efficiency[:, None], (fleet.num_pumps, 1), self.rng)
+        basin_power, basin_do = sample_aeration_data(
+            fleet.basin_base_power[:, None], fleet.basin_base_do[:, None], (fleet.num_basins, 1), self.rng)
+        grid_demand, grid_price = sample_grid_data(
+            fleet.grid_base_demand, fleet.grid_base_price, np.array([timestamp.hour]), rng=self.rng)
+        return self.state.load_arrays({
+            'pump_power': pump_power,
+            'pump_running': pump_running,
+            'pump_efficiency': pump_efficiency,
+            'basin_power': basin_power,
+            'basin_dissolved_oxygen': basin_do,
+            'grid_demand': grid_demand,
+            'grid_price': grid_price
+        }, 0, timestamp)
+
+def connect_publisher(broker, port, qos=config.MQTT_QOS, max_inflight=config.MQTT_MAX_INFLIGHT):
+    import paho.mqtt.client as mqtt
+    from fiware_integration.mqtt_publisher import BatchPublisher
+
+    client = mqtt.Client()
+    publisher = BatchPublisher(client, qos=qos, max_inflight=max_inflight)
+    client.connect(broker, port)
+    client.loop_start()
+    return publisher
+
+def publish_state(publisher, topics, state):
+    with STAGE_SECONDS.time(stage='mqtt'):
+        for topic, data in zip(topics, state.device_attributes()):
+            publisher.enqueue(topic, json.dumps(data))
+        in_flight = publisher.flush(config.MQTT_FLUSH_TIMEOUT)
+    if in_flight:
+        logger.warning(f"MQTT delivery: {in_flight} messages still in flight")
+
+def run(generator, dr_algorithm, publisher=None, interval=config.UPDATE_INTERVAL, ticks=None, duration=None):
+    """Tick every interval seconds (monotonic schedule) until ticks or duration (seconds) runs out."""
+    topics = [f"/json/{config.API_KEY}/{device_id}/attrs" for device_id in generator.state.device_ids]
+    started = time.monotonic()
+    next_tick = started
+    count = 0
+    while (ticks is None or count < ticks) and (duration is None or time.monotonic() - started < duration):
+        with STAGE_SECONDS.time(stage='generate'):
+            state = generator.generate(datetime.now().replace(microsecond=0))
+        with STAGE_SECONDS.time(stage='optimize'):
+            dr_algorithm.optimize_state(state)
+        if publisher is not None:
+            publish_state(publisher, topics, state)
+        TICKS.inc()
+        count += 1
+        reduction = (state.pump_power.sum() + state.basin_power.sum()
+                     - state.optimized_pump_power.sum() - state.optimized_basin_power.sum())
+        logger.info(f"Tick {count}: {len(topics)} devices, total power reduced by {reduction:.2f} kW")
+
+        next_tick += interval
+        if ticks is not None and count >= ticks:
+            break
+        time.sleep(max(0.0, next_tick - time.monotonic()))
+    return count
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the DR twin loop on an edge gateway")
+    parser.add_argument('--broker', default=config.MQTT_BROKER)
+    parser.add_argument('--port', type=int, default=config.MQTT_PORT)
+    parser.add_argument('--qos', type=int, choices=(0, 1, 2), default=config.MQTT_QOS)
+    parser.add_argument('--interval', type=float, default=config.UPDATE_INTERVAL, help="seconds between ticks")
+    parser.add_argument('--ticks', type=int, help="stop after this many ticks")
+    parser.add_argument('--duration', type=float, help="stop after this many minutes")
+    parser.add_argument('--fleet', help="fleet JSON file (default: FLEET_FILE or the synthetic config fleet)")
+    parser.add_argument('--solver', default=config.DR_SOLVER, help="'vectorized' or 'slsqp' (imports scipy)")
+    parser.add_argument('--seed', type=int, default=config.RANDOM_SEED)
+    parser.add_argument('--no-mqtt', action='store_true', help="generate and optimize only")
+    parser.add_argument('--metrics-port', type=int, default=config.METRICS_PORT)
+    parser.add_argument('--no-metrics', action='store_true', help="disable instrumentation")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_args(argv)
+    metrics.configure(config.METRICS_ENABLED and not args.no_metrics, port=args.metrics_port)
+
+    generator = EdgeGenerator(load_fleet(args.fleet), seed=args.seed)
+    dr_algorithm = DemandResponseAlgorithm.from_config(args.solver)
+    publisher = None if args.no_mqtt else connect_publisher(args.broker, args.port, args.qos)
+    try:
+        run(generator, dr_algorithm, publisher, args.interval, args.ticks,
+            args.duration * 60 if args.duration is not None else None)
+    except KeyboardInterrupt:
+        logger.info("Stopped")
+    finally:
+        if publisher is not None:
+            publisher.flush(config.MQTT_FLUSH_TIMEOUT)
+            publisher.client.loop_stop()
+            publisher.client.disconnect()
+        logger.info(f"MQTT publisher stats: {publisher.stats() if publisher is not None else None}")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,14 @@
 # wastewater_dr_twin/fiware_integration/__init__.py
+from lazy_imports import lazy_exports
 
-from .orion_interface import OrionInterface
-from .iot_agent_interface import IoTAgentInterface
+# Resolved on first access, so MQTT-only callers never import requests for the Orion client
+_EXPORTS = {
+    'OrionInterface': '.orion_interface',
+    'AsyncOrionInterface': '.orion_interface',
+    'IoTAgentInterface': '.iot_agent_interface',
+    'BatchPublisher': '.mqtt_publisher',
+    'TelemetryConsumer': '.telemetry_consumer'
+}
 
-__all__ = ['OrionInterface', 'IoTAgentInterface']
\ No newline at end of file
+__all__ = list(_EXPORTS)
+__getattr__, __dir__ = lazy_exports(globals(), _EXPORTS)
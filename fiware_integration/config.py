@@ -5,6 +5,11 @@ MQTT_BROKER = "localhost"
 MQTT_PORT = 1883
 API_KEY = "wastewater_dr_twin_key"
 
+# Orion batch operations
+ORION_BATCH_SIZE = 500  # entities per /v2/op/update or /v2/op/query request
+ORION_POOL_SIZE = 10  # keep-alive connections per host
+ORION_TIMEOUT = 10  # seconds
+
 # Entity types
 PUMP_TYPE = "Pump"
 AERATION_BASIN_TYPE = "AerationBasin"
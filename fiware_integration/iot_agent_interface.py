@@ -2,25 +2,42 @@
 
 import paho.mqtt.client as mqtt
 import json
-import time
+
+from .mqtt_publisher import BatchPublisher
 
 class IoTAgentInterface:
-    def __init__(self, mqtt_broker, mqtt_port, api_key):
+    def __init__(self, mqtt_broker, mqtt_port, api_key, qos=0, max_inflight=1000):
         self.mqtt_broker = mqtt_broker
         self.mqtt_port = mqtt_port
         self.api_key = api_key
         self.client = mqtt.Client()
+        self.publisher = BatchPublisher(self.client, qos=qos, max_inflight=max_inflight)
 
     def connect(self):
         self.client.connect(self.mqtt_broker, self.mqtt_port, 60)
         self.client.loop_start()
 
     def disconnect(self):
+        self.publisher.flush()
         self.client.loop_stop()
         self.client.disconnect()
 
-    def send_data(self, device_id, data):
+    def queue_data(self, device_id, data):
         topic = f"/json/{self.api_key}/{device_id}/attrs"
-        payload = json.dumps(data)
-        self.client.publish(topic, payload)
-        time.sleep(0.1)  # Small delay to ensure message is sent
\ No newline at end of file
+        self.publisher.enqueue(topic, json.dumps(data))
+
+    def send_data(self, device_id, data):
+        # Non-blocking: call flush() to wait for delivery of everything sent so far
+        self.queue_data(device_id, data)
+        self.publisher.publish_pending()
+
+    def send_many(self, items):
+        for device_id, data in items:
+            self.queue_data(device_id, data)
+        self.publisher.publish_pending()
+
+    def flush(self, timeout=5.0):
+        return self.publisher.flush(timeout)
+
+    def stats(self):
+        return self.publisher.stats()
\ No newline at end of file
@@ -0,0 +1,104 @@
+# wastewater_dr_twin/fiware_integration/mqtt_publisher.py
+
+import json
+import threading
+import time
+from collections import deque
+
+import paho.mqtt.client as mqtt
+
+import metrics
+
+PUBLISHED = metrics.counter('mqtt_messages_published_total', "MQTT messages handed to the client")
+BYTES_SENT = metrics.counter('mqtt_bytes_sent_total', "MQTT payload bytes handed to the client")
+FAILED = metrics.counter('mqtt_publish_failures_total', "MQTT messages rejected or not confirmed")
+FLUSH_SECONDS = metrics.histogram('mqtt_flush_seconds', "Time spent waiting on delivery in flush()")
+IN_FLIGHT = metrics.gauge('mqtt_in_flight', "MQTT messages queued or unconfirmed after the last flush")
+
+class BatchPublisher:
+    """Queues MQTT messages and hands them to paho without per-message waits.
+
+    publish_pending() pushes everything queued into the client's network loop
+    and returns immediately; flush() additionally waits on all outstanding
+    delivery tokens with a single deadline. Messages that paho rejects or that
+    are not confirmed in time are counted instead of being silently dropped.
+    """
+
+    def __init__(self, client, qos=0, max_inflight=1000):
+        self.client = client
+        self.qos = qos
+        client.max_inflight_messages_set(max_inflight)
+        client.max_queued_messages_set(0)  # 0 = unbounded client-side queue
+        self._queue = deque()
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+        self.failed = 0
+        self.bytes_sent = 0
+        self._first_publish = None
+
+    def enqueue(self, topic, payload):
+        if not isinstance(payload, (str, bytes)):
+            payload = json.dumps(payload)
+        self._queue.append((topic, payload))
+
+    def publish_pending(self):
+        with self._lock:
+            if self._queue and self._first_publish is None:
+                self._first_publish = time.monotonic()
+            published, bytes_sent, failed = self.published, self.bytes_sent, self.failed
+            while self._queue:
+                topic, payload = self._queue.popleft()
+                info = self.client.publish(topic, payload, qos=self.qos)
+                if info.rc == mqtt.MQTT_ERR_SUCCESS:
+                    self._pending.append(info)
+                    self.published += 1
+                    self.bytes_sent += len(payload)
+                else:
+                    self.failed += 1
+            # One metrics update per batch rather than per message
+            PUBLISHED.inc(self.published - published)
+            BYTES_SENT.inc(self.bytes_sent - bytes_sent)
+            FAILED.inc(self.failed - failed)
+
+    def flush(self, timeout=5.0):
+        """Publish everything queued and wait for delivery. Returns the number of messages still in flight."""
+        self.publish_pending()
+        started = time.monotonic()
+        deadline = started + timeout
+        with self._lock:
+            failed = self.failed
+            unconfirmed = deque()
+            while self._pending:
+                info = self._pending.popleft()
+                try:
+                    info.wait_for_publish(max(deadline - time.monotonic(), 0))
+                except (ValueError, RuntimeError):
+                    self.failed += 1
+                    continue
+                if info.is_published():
+                    self.delivered += 1
+                else:
+                    unconfirmed.append(info)
+            self._pending = unconfirmed
+            FLUSH_SECONDS.observe(time.monotonic() - started)
+            FAILED.inc(self.failed - failed)
+            IN_FLIGHT.set(len(self._queue) + len(self._pending))
+            return len(self._pending)
+
+    @property
+    def in_flight(self):
+        return len(self._queue) + sum(1 for info in list(self._pending) if not info.is_published())
+
+    def stats(self):
+        elapsed = time.monotonic() - self._first_publish if self._first_publish is not None else 0
+        return {
+            'queued': len(self._queue),
+            'in_flight': self.in_flight,
+            'published': self.published,
+            'delivered': self.delivered,
+            'failed': self.failed,
+            'bytes_sent': self.bytes_sent,
+            'messages_per_second': self.delivered / elapsed if elapsed > 0 else 0.0
+        }
@@ -1,28 +1,169 @@
 # wastewater_dr_twin/fiware_integration/orion_interface.py
 
+import asyncio
+import logging
 import requests
 import json
+from requests.adapters import HTTPAdapter
+
+import metrics
+from config import FIWARE_SERVICE, FIWARE_SERVICEPATH
+
+from .config import ORION_BATCH_SIZE, ORION_POOL_SIZE, ORION_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+REQUEST_SECONDS = metrics.histogram('orion_request_seconds', "Orion request latency", ['operation'])
+BYTES_SENT = metrics.counter('orion_bytes_sent_total', "Request body bytes sent to Orion", ['operation'])
+ENTITIES_SENT = metrics.counter('orion_entities_sent_total', "Entities sent through batch updates")
+FAILURES = metrics.counter('orion_request_failures_total', "Orion requests with an unexpected status", ['operation'])
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
 
 class OrionInterface:
-    def __init__(self, orion_url):
+    def __init__(self, orion_url, fiware_service=FIWARE_SERVICE, fiware_servicepath=FIWARE_SERVICEPATH,
+                 batch_size=ORION_BATCH_SIZE, pool_size=ORION_POOL_SIZE, timeout=ORION_TIMEOUT):
         self.orion_url = orion_url
+        self.batch_size = batch_size
+        self.timeout = timeout
 
-    def create_entity(self, entity):
+        # One keep-alive pool for every request instead of a new connection per entity
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if fiware_service:
+            self.session.headers['fiware-service'] = fiware_service
+        if fiware_servicepath:
+            self.session.headers['fiware-servicepath'] = fiware_servicepath
+
+    def close(self):
+        self.session.close()
+
+    def _post_json(self, path, body, params=None):
         headers = {'Content-Type': 'application/json'}
-        response = requests.post(f"{self.orion_url}/v2/entities", headers=headers, data=json.dumps(entity))
+        data = json.dumps(body)
+        BYTES_SENT.inc(len(data), operation=path)
+        with REQUEST_SECONDS.time(operation=path):
+            return self.session.post(f"{self.orion_url}{path}", headers=headers, data=data,
+                                     params=params, timeout=self.timeout)
+
+    def create_entity(self, entity):
+        response = self._post_json("/v2/entities", entity)
         return response.status_code == 201
 
     def update_entity(self, entity_id, attributes):
         headers = {'Content-Type': 'application/json'}
-        response = requests.patch(f"{self.orion_url}/v2/entities/{entity_id}/attrs", headers=headers, data=json.dumps(attributes))
+        response = self.session.patch(f"{self.orion_url}/v2/entities/{entity_id}/attrs", headers=headers,
+                                      data=json.dumps(attributes), timeout=self.timeout)
         return response.status_code == 204
 
     def get_entity(self, entity_id):
-        response = requests.get(f"{self.orion_url}/v2/entities/{entity_id}")
+        response = self.session.get(f"{self.orion_url}/v2/entities/{entity_id}", timeout=self.timeout)
         if response.status_code == 200:
             return response.json()
         return None
 
     def delete_entity(self, entity_id):
-        response = requests.delete(f"{self.orion_url}/v2/entities/{entity_id}")
-        return response.status_code == 204
\ No newline at end of file
+        response = self.session.delete(f"{self.orion_url}/v2/entities/{entity_id}", timeout=self.timeout)
+        return response.status_code == 204
+
+    def update_chunk(self, entities, action_type='append'):
+        response = self._post_json("/v2/op/update", {'actionType': action_type, 'entities': entities})
+        ENTITIES_SENT.inc(len(entities))
+        if response.status_code != 204:
+            FAILURES.inc(operation="/v2/op/update")
+            logger.warning(f"Orion batch {action_type} of {len(entities)} entities failed: "
+                           f"{response.status_code} {response.text[:200]}")
+            return False
+        return True
+
+    def batch_update(self, entities, action_type='append'):
+        """Send entities through /v2/op/update in chunks of batch_size.
+
+        action_type is any NGSI v2 batch action ('append' upserts, 'appendStrict',
+        'update', 'replace', 'delete'). Returns True if every chunk succeeded.
+        """
+        results = [self.update_chunk(chunk, action_type) for chunk in chunked(list(entities), self.batch_size)]
+        return all(results)
+
+    def upsert_entities(self, entities):
+        return self.batch_update(entities, 'append')
+
+    def query_page(self, entities=None, attrs=None, offset=0, limit=None):
+        body = {'entities': entities or [{'idPattern': '.*'}]}
+        if attrs:
+            body['attrs'] = attrs
+        params = {'offset': offset, 'limit': limit or self.batch_size, 'options': 'count'}
+        response = self._post_json("/v2/op/query", body, params=params)
+        if response.status_code != 200:
+            # A missing page must not pass for the end of the result set
+            FAILURES.inc(operation="/v2/op/query")
+            logger.error(f"Orion query at offset {offset} failed: {response.status_code} {response.text[:200]}")
+            raise RuntimeError(f"Orion query at offset {offset} failed with status {response.status_code}")
+        return response.json(), int(response.headers.get('Fiware-Total-Count', 0))
+
+    def batch_query(self, entities=None, attrs=None):
+        """Query entities through /v2/op/query, paging batch_size entities per request.
+
+        Raises RuntimeError if any page fails, rather than returning a partial list.
+        """
+        results = []
+        offset = 0
+        while True:
+            page, total = self.query_page(entities, attrs, offset)
+            if not page:
+                break
+            results.extend(page)
+            offset += len(page)
+            if offset >= total:
+                break
+        return results
+
+class AsyncOrionInterface:
+    """asyncio front end for OrionInterface.
+
+    Chunks of a batch run concurrently (up to max_concurrency) on worker threads
+    sharing the synchronous interface's connection pool, so no extra HTTP client
+    dependency is needed.
+    """
+
+    def __init__(self, orion_url, max_concurrency=ORION_POOL_SIZE, **kwargs):
+        kwargs.setdefault('pool_size', max_concurrency)
+        self.orion = OrionInterface(orion_url, **kwargs)
+        self.max_concurrency = max_concurrency
+
+    def close(self):
+        self.orion.close()
+
+    async def _gather(self, calls):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(func, *args):
+            async with semaphore:
+                return await asyncio.to_thread(func, *args)
+
+        return await asyncio.gather(*(run(func, *args) for func, *args in calls))
+
+    async def batch_update(self, entities, action_type='append'):
+        chunks = chunked(list(entities), self.orion.batch_size)
+        results = await self._gather([(self.orion.update_chunk, chunk, action_type) for chunk in chunks])
+        return all(results)
+
+    async def upsert_entities(self, entities):
+        return await self.batch_update(entities, 'append')
+
+    async def batch_query(self, entities=None, attrs=None):
+        # The first page reports the total count; the remaining pages are fetched concurrently.
+        # A failed page raises RuntimeError (from query_page) instead of shortening the result.
+        first, total = await asyncio.to_thread(self.orion.query_page, entities, attrs, 0)
+        if not first:
+            return []
+        offsets = range(len(first), total, self.orion.batch_size)
+        pages = await self._gather([(self.orion.query_page, entities, attrs, offset) for offset in offsets])
+        results = list(first)
+        for page, _ in pages:
+            results.extend(page)
+        return results
\ No newline at end of file
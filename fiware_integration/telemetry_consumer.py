@@ -0,0 +1,210 @@
+# wastewater_dr_twin/fiware_integration/telemetry_consumer.py
+
+import json
+import logging
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+MESSAGES = metrics.counter('telemetry_messages_total', "Device attribute messages received", ['result'])
+TRIGGERS = metrics.counter('telemetry_triggers_total', "DR runs triggered by telemetry", ['reason'])
+REACTION_SECONDS = metrics.histogram('telemetry_reaction_seconds', "From the triggering message to the end of the DR run")
+
+# Attributes read from each device type; NGSI-style {"type": ..., "value": ...} values are unwrapped
+PUMP_ATTRIBUTES = ('power', 'efficiency', 'status')
+BASIN_ATTRIBUTES = ('power', 'dissolved_oxygen')
+GRID_ATTRIBUTES = ('demand', 'price')
+# Readings a pump or basin must have sent at least once before its state is used
+REQUIRED_ATTRIBUTES = {'pump': ('power', 'efficiency'), 'basin': ('power', 'dissolved_oxygen')}
+
+def _value(raw):
+    return raw.get('value') if isinstance(raw, dict) else raw
+
+class TelemetryConsumer:
+    """Subscribes to the devices' /json/{api_key}/+/attrs topics and reacts to new readings.
+
+    Every message updates the latest-state table, a PlantState whose arrays
+    hold the most recent reading of each device. on_trigger(state, reasons)
+    then runs on a worker thread, with a copy of the table, once
+    report_fraction of the fleet has reported since the previous run or the
+    grid price has moved by price_change since then. Until every pump and
+    basin has sent its REQUIRED_ATTRIBUTES at least once the table still
+    holds placeholders, so nothing triggers, price moves included. Triggers
+    raised within debounce seconds of the first one are coalesced into a
+    single run, and runs never overlap.
+
+    Messages that carry optimized_* attributes are the twin's own publishes
+    echoed back by the broker and are ignored.
+    """
+
+    def __init__(self, state, broker, port, api_key, on_trigger, report_fraction=0.8,
+                 price_change=0.01, debounce=0.05, qos=0):
+        self.state = state
+        self.broker = broker
+        self.port = port
+        self.topic = f"/json/{api_key}/+/attrs"
+        self.prefix = f"/json/{api_key}/"
+        self.on_trigger = on_trigger
+        self.report_fraction = report_fraction
+        self.price_change = price_change
+        self.debounce = debounce
+        self.qos = qos
+
+        # device id -> (kind, position) in the state's arrays
+        self.devices = {}
+        for i, device_id in enumerate(state.device_ids[:state.num_pumps]):
+            self.devices[device_id] = ('pump', i)
+        for i, device_id in enumerate(state.device_ids[state.num_pumps:state.num_pumps + state.num_basins]):
+            self.devices[device_id] = ('basin', i)
+        self.devices[state.device_ids[-1]] = ('grid', 0)
+        self.fleet_size = state.num_pumps + state.num_basins
+        # device id -> required attributes it has not reported yet
+        self._unseen = {device_id: set(REQUIRED_ATTRIBUTES[kind])
+                        for device_id, (kind, i) in self.devices.items() if kind in REQUIRED_ATTRIBUTES}
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._reported = set()
+        self._trigger_price = None
+        self._reasons = set()
+        self._pending_since = None
+        self._running = False
+        self._worker = None
+        self.runs = 0
+        self.counts = {'ingested': 0, 'unknown': 0, 'echo': 0, 'invalid': 0}
+
+        self.client = mqtt.Client()
+        self.client.on_connect = self._on_connect
+        self.client.on_message = self._on_message
+
+    def start(self):
+        self._running = True
+        self._worker = threading.Thread(target=self._run, name='telemetry-trigger', daemon=True)
+        self._worker.start()
+        self.client.connect(self.broker, self.port, 60)
+        self.client.loop_start()
+        logger.info(f"Subscribed to {self.topic} on {self.broker}:{self.port}")
+
+    def stop(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+        with self._wakeup:
+            self._running = False
+            self._wakeup.notify()
+        if self._worker is not None:
+            self._worker.join()
+
+    def _on_connect(self, client, userdata, flags, rc):
+        # Subscribing here also restores the subscription after a reconnect
+        if rc == 0:
+            client.subscribe(self.topic, qos=self.qos)
+        else:
+            logger.error(f"MQTT connection refused (rc={rc})")
+
+    def _on_message(self, client, userdata, message):
+        self.ingest(message.topic, message.payload)
+
+    def ingest(self, topic, payload):
+        """Apply one attrs message to the latest-state table and check the triggers."""
+        received = time.monotonic()
+        device_id = topic[len(self.prefix):].split('/', 1)[0] if topic.startswith(self.prefix) else None
+        device = self.devices.get(device_id)
+        if device is None:
+            return self._count('unknown')
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            return self._count('invalid')
+        if not isinstance(data, dict):
+            return self._count('invalid')
+        if any(name.startswith('optimized_') for name in data):
+            return self._count('echo')
+
+        kind, i = device
+        state = self.state
+        try:
+            with self._lock:
+                if kind == 'pump':
+                    if 'power' in data:
+                        state.pump_power[i] = float(_value(data['power']))
+                    if 'efficiency' in data:
+                        state.pump_efficiency[i] = float(_value(data['efficiency']))
+                    if 'status' in data:
+                        state.pump_status[i] = _value(data['status']) == 'running'
+                    self._reported.add(device_id)
+                    self._seen(device_id, data)
+                elif kind == 'basin':
+                    if 'power' in data:
+                        state.basin_power[i] = float(_value(data['power']))
+                    if 'dissolved_oxygen' in data:
+                        state.basin_dissolved_oxygen[i] = float(_value(data['dissolved_oxygen']))
+                    self._reported.add(device_id)
+                    self._seen(device_id, data)
+                else:
+                    if 'demand' in data:
+                        state.grid_demand = float(_value(data['demand']))
+                    if 'price' in data:
+                        state.grid_price = float(_value(data['price']))
+                        if not self._unseen and (self._trigger_price is None or
+                                                 abs(state.grid_price - self._trigger_price) >= self.price_change):
+                            self._trigger('price', received)
+                if not self._unseen and self.fleet_size and len(self._reported) >= self.report_fraction * self.fleet_size:
+                    self._trigger('fleet', received)
+        except (TypeError, ValueError):
+            return self._count('invalid')
+        self._count('ingested')
+
+    def _seen(self, device_id, data):
+        # Called with the lock held
+        missing = self._unseen.get(device_id)
+        if missing is not None:
+            missing.difference_update(data)
+            if not missing:
+                del self._unseen[device_id]
+
+    def _count(self, result):
+        self.counts[result] += 1
+        MESSAGES.inc(result=result)
+
+    def _trigger(self, reason, received):
+        # Called with the lock held
+        self._reasons.add(reason)
+        if self._pending_since is None:
+            self._pending_since = received
+            self._wakeup.notify()
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                while self._running and self._pending_since is None:
+                    self._wakeup.wait()
+                if not self._running:
+                    return
+                since = self._pending_since
+            # Let the rest of a burst arrive before solving
+            time.sleep(max(0.0, since + self.debounce - time.monotonic()))
+            with self._lock:
+                snapshot = self.state.copy()
+                reasons = sorted(self._reasons)
+                self._reasons.clear()
+                self._reported.clear()
+                self._trigger_price = snapshot.grid_price
+                self._pending_since = None
+            for reason in reasons:
+                TRIGGERS.inc(reason=reason)
+            try:
+                self.on_trigger(snapshot, reasons)
+            except Exception:
+                logger.exception("DR run triggered by telemetry failed")
+            self.runs += 1
+            REACTION_SECONDS.observe(time.monotonic() - since)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, runs=self.runs, reported=len(self._reported), unseen=len(self._unseen),
+                        fleet_size=self.fleet_size)
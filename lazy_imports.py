@@ -0,0 +1,25 @@
+# wastewater_dr_twin/lazy_imports.py
+# Package exports resolved on first access (PEP 562), so importing one submodule
+# does not load every dependency the package's other submodules need.
+import importlib
+
+def lazy_exports(namespace, exports):
+    """Module-level (__getattr__, __dir__) for a package's globals().
+
+    exports maps each exported name to the submodule, relative to the
+    package, that defines it. A resolved name is cached in the package
+    namespace, so later lookups bypass __getattr__.
+    """
+    package = namespace['__name__']
+
+    def __getattr__(name):
+        if name not in exports:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(exports[name], package), name)
+        namespace[name] = value
+        return value
+
+    def __dir__():
+        return sorted(set(namespace) | set(exports))
+
+    return __getattr__, __dir__
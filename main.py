@@ -1,3 +1,5 @@
+import argparse
+import asyncio
 import time
 from datetime import datetime, timedelta
 import paho.mqtt.client as mqtt
@@ -5,14 +7,28 @@ import json
 from data_generators.main_generator import DataGenerator
 from config import *
 from demand_response.algorithm import DemandResponseAlgorithm
+from fiware_integration.mqtt_publisher import BatchPublisher
+from fiware_integration.telemetry_consumer import TelemetryConsumer
+from simulation.clock import VirtualClock, ChunkedTickSource
+from simulation.pipeline import Pipeline
+from simulation.multi_plant import load_plants, run_portfolio
+import numpy as np
 import requests
 from pandas import Timestamp
 import logging
+import metrics
+from metrics import STAGE_SECONDS, TICKS
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+DASHBOARD_BYTES = metrics.counter('twin_dashboard_bytes_sent_total', "JSON bytes posted to the dashboard")
+DASHBOARD_FAILURES = metrics.counter('twin_dashboard_failures_total', "Failed dashboard posts")
+
+# Keep-alive connection for every dashboard post
+dashboard_session = requests.Session()
+
 def serialize_datetime(obj):
     if isinstance(obj, datetime):
         return obj.isoformat()
@@ -21,168 +37,362 @@ def serialize_datetime(obj):
     raise TypeError(f"Type {type(obj)} not serializable")
 
 class IoTAgent:
-    def __init__(self, broker, port):
+    def __init__(self, broker, port, qos=MQTT_QOS, max_inflight=MQTT_MAX_INFLIGHT):
         self.client = mqtt.Client()
+        self.publisher = BatchPublisher(self.client, qos=qos, max_inflight=max_inflight)
         self.client.connect(broker, port)
         self.client.loop_start()
         self.api_key = API_KEY
 
     def send_data(self, device_id, data):
+        # Queued only; flush() publishes the whole tick and waits on delivery in bulk
         topic = f"/json/{self.api_key}/{device_id}/attrs"
         payload = json.dumps(data, default=serialize_datetime)
-        self.client.publish(topic, payload)
-        print(f"Published to topic {topic}: {payload}")
+        self.publisher.enqueue(topic, payload)
+        logger.debug("Queued for topic %s: %s", topic, payload)
+
+    def flush(self, timeout=MQTT_FLUSH_TIMEOUT):
+        in_flight = self.publisher.flush(timeout)
+        stats = self.publisher.stats()
+        if in_flight or stats['failed']:
+            logger.warning(f"MQTT delivery: {in_flight} in flight, {stats['failed']} failed so far")
+        return in_flight
 
     def disconnect(self):
+        self.flush()
+        logger.info(f"MQTT publisher stats: {self.publisher.stats()}")
         self.client.loop_stop()
         self.client.disconnect()
 
-def send_data_to_dashboard(pumps, aeration_basins, grid):
-    data = {
-        'pumps': [pump.to_dict() for pump in pumps],
-        'aeration_basins': [basin.to_dict() for basin in aeration_basins],
-        'grid': grid.to_dict()
-    }
-    url = 'http://localhost:5000/update_data'
+@STAGE_SECONDS.timed(stage='dashboard')
+def send_data_to_dashboard(state, timestamp=None, url=DASHBOARD_URL):
+    # Simulated runs carry their virtual time; the dashboard otherwise stamps on receipt
+    data = state.dashboard_payload(timestamp)
     headers = {'Content-Type': 'application/json'}
+    body = json.dumps(data, default=serialize_datetime)
+    DASHBOARD_BYTES.inc(len(body))
     try:
         logger.info("Sending data to dashboard")
-        response = requests.post(url, 
-                                 headers=headers,
-                                 data=json.dumps(data, default=serialize_datetime))
+        response = dashboard_session.post(url,
+                                          headers=headers,
+                                          data=body)
         response.raise_for_status()
         logger.info("Data sent to dashboard successfully")
         logger.info(f"Response: {response.text}")
     except requests.exceptions.RequestException as e:
+        DASHBOARD_FAILURES.inc()
         logger.error(f"Failed to send data to dashboard: {e}")
         if hasattr(e, 'response') and e.response is not None:
             logger.error(f"Response content: {e.response.text}")
 
-class Pump:
-    def __init__(self, id, power, efficiency, status, optimized_power=None, optimized_efficiency=None, optimized_status=None):
-        self.id = id
-        self.power = power
-        self.efficiency = efficiency
-        self.status = status
-        self.optimized_power = optimized_power
-        self.optimized_efficiency = optimized_efficiency
-        self.optimized_status = optimized_status
-
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'power': float(self.power),
-            'efficiency': float(self.efficiency),
-            'status': self.status,
-            'optimized_power': float(self.optimized_power) if self.optimized_power is not None else None,
-            'optimized_efficiency': float(self.optimized_efficiency) if self.optimized_efficiency is not None else None,
-            'optimized_status': self.optimized_status
-        }
-
-class AerationBasin:
-    def __init__(self, id, power, dissolved_oxygen, optimized_power=None, optimized_dissolved_oxygen=None):
-        self.id = id
-        self.power = power
-        self.dissolved_oxygen = dissolved_oxygen
-        self.optimized_power = optimized_power
-        self.optimized_dissolved_oxygen = optimized_dissolved_oxygen
-
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'power': float(self.power),
-            'dissolved_oxygen': float(self.dissolved_oxygen),
-            'optimized_power': float(self.optimized_power) if self.optimized_power is not None else None,
-            'optimized_dissolved_oxygen': float(self.optimized_dissolved_oxygen) if self.optimized_dissolved_oxygen is not None else None
-        }
-
-class Grid:
-    def __init__(self, demand, price):
-        self.demand = demand
-        self.price = price
-
-    def to_dict(self):
-        return {
-            'demand': float(self.demand),
-            'price': float(self.price)
-        }
-
-def main():
-    start_time = datetime.now()
-    end_time = start_time + timedelta(minutes=SIMULATION_DURATION)
-    generator = DataGenerator()
-    iot_agent = IoTAgent(MQTT_BROKER, MQTT_PORT)
-    dr_algorithm = DemandResponseAlgorithm()
+class DashboardBatcher:
+    """Collects tick snapshots and posts them to the dashboard's /ingest endpoint in columnar batches.
 
-    logger.info(f"Starting simulation at {start_time}")
-    logger.info(f"Simulation will end at {end_time}")
+    Flushes once max_snapshots are pending or the oldest pending one is
+    max_interval seconds old (checked on add), and on close().
+    """
 
-    while datetime.now() < end_time:
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        logger.info(f"\nGenerating data for {current_time}")
-        pump_data, aeration_data, grid_data = generator.generate_data(current_time, current_time)
-
-        # Prepare data for DR algorithm
-        pumps = [Pump(row['pump_id'], row['power'], row['efficiency'], row['status']) for _, row in pump_data.iterrows()]
-        aeration_basins = [AerationBasin(row['basin_id'], row['power'], row['dissolved_oxygen']) for _, row in aeration_data.iterrows()]
-        grid = Grid(grid_data.iloc[0]['demand'], grid_data.iloc[0]['price'])
-
-        # Run DR algorithm
-        recommendations, optimized_pumps, optimized_aeration = dr_algorithm.get_recommendations(pumps, aeration_basins, grid)
-
-        # Print recommendations
-        logger.info("Demand Response Recommendations:")
-        for recommendation in recommendations:
-            logger.info(f"- {recommendation}")
-
-        # Update pumps and aeration basins with optimized data
-        for i, pump in enumerate(pumps):
-            pump.optimized_power = optimized_pumps[i]['power']
-            pump.optimized_efficiency = optimized_pumps[i]['efficiency']
-            pump.optimized_status = optimized_pumps[i]['status']
-
-        for i, basin in enumerate(aeration_basins):
-            basin.optimized_power = optimized_aeration[i]['power']
-            basin.optimized_dissolved_oxygen = optimized_aeration[i]['dissolved_oxygen']
-
-        # Send data to IoT platform
-        for pump in pumps:
-            data = {
-                "power": {"type": "Number", "value": pump.power},
-                "status": {"type": "Text", "value": pump.status},
-                "efficiency": {"type": "Number", "value": pump.efficiency},
-                "optimized_power": {"type": "Number", "value": pump.optimized_power},
-                "optimized_status": {"type": "Text", "value": pump.optimized_status},
-                "optimized_efficiency": {"type": "Number", "value": pump.optimized_efficiency}
-            }
-            device_id = f"pump{pump.id[-3:]}"
-            iot_agent.send_data(device_id, data)
-
-        for basin in aeration_basins:
-            data = {
-                "power": {"type": "Number", "value": basin.power},
-                "dissolved_oxygen": {"type": "Number", "value": basin.dissolved_oxygen},
-                "optimized_power": {"type": "Number", "value": basin.optimized_power},
-                "optimized_dissolved_oxygen": {"type": "Number", "value": basin.optimized_dissolved_oxygen}
-            }
-            device_id = f"aeration{basin.id[-3:]}"
-            iot_agent.send_data(device_id, data)
-
-        # Send grid data
-        data = {
-            "demand": {"type": "Number", "value": grid.demand},
-            "price": {"type": "Number", "value": grid.price}
-        }
-        device_id = "grid001"
+    FIELDS = {
+        'pumps': ('power', 'optimized_power', 'efficiency', 'optimized_efficiency'),
+        'aeration_basins': ('power', 'optimized_power', 'dissolved_oxygen', 'optimized_dissolved_oxygen'),
+        'grid': ('demand', 'price')
+    }
+
+    def __init__(self, url=DASHBOARD_INGEST_URL, max_snapshots=DASHBOARD_BATCH_SIZE,
+                 max_interval=DASHBOARD_BATCH_INTERVAL, encoding=DASHBOARD_INGEST_FORMAT, session=None):
+        if encoding == 'msgpack':
+            import msgpack  # fail at start-up rather than on the first flush
+            self._packb = msgpack.packb
+        elif encoding != 'json':
+            raise ValueError(f"Unknown dashboard encoding '{encoding}'")
+        self.url = url
+        self.max_snapshots = max_snapshots
+        self.max_interval = max_interval
+        self.encoding = encoding
+        self.session = session or dashboard_session
+        self._ids = None
+        self._timestamps = []
+        self._rows = {entity: {field: [] for field in fields} for entity, fields in self.FIELDS.items()}
+        self._oldest = None
+        self.batches = 0
+        self.snapshots = 0
+
+    def add(self, state, timestamp=None):
+        ids = (state.pump_ids, state.basin_ids)
+        if self._ids is not None and self._ids != ids:
+            self.flush()
+        self._ids = ids
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        self._timestamps.append(np.datetime64(timestamp if timestamp is not None else datetime.now(), 'ns'))
+        rows = self._rows
+        rows['pumps']['power'].append(state.pump_power.copy())
+        rows['pumps']['optimized_power'].append(state.optimized_pump_power.copy())
+        rows['pumps']['efficiency'].append(state.pump_efficiency.copy())
+        rows['pumps']['optimized_efficiency'].append(state.optimized_pump_efficiency.copy())
+        rows['aeration_basins']['power'].append(state.basin_power.copy())
+        rows['aeration_basins']['optimized_power'].append(state.optimized_basin_power.copy())
+        rows['aeration_basins']['dissolved_oxygen'].append(state.basin_dissolved_oxygen.copy())
+        rows['aeration_basins']['optimized_dissolved_oxygen'].append(state.optimized_basin_dissolved_oxygen.copy())
+        rows['grid']['demand'].append(state.grid_demand)
+        rows['grid']['price'].append(state.grid_price)
+        if len(self._timestamps) >= self.max_snapshots or time.monotonic() - self._oldest >= self.max_interval:
+            self.flush()
+
+    def _column(self, values):
+        array = np.asarray(values, dtype=np.float64)
+        if self.encoding == 'msgpack':
+            return array.astype('<f8').tobytes()
+        return np.where(np.isnan(array), None, array).tolist()
+
+    def _encode(self):
+        timestamps = np.array(self._timestamps, dtype='datetime64[ns]').astype(np.int64)
+        payload = {'timestamps': timestamps.astype('<i8').tobytes() if self.encoding == 'msgpack' else timestamps.tolist()}
+        for (entity, fields), ids in zip(self.FIELDS.items(), self._ids + (None,)):
+            block = {field: self._column(self._rows[entity][field]) for field in fields}
+            if ids is not None:
+                block['ids'] = list(ids)
+            payload[entity] = block
+        if self.encoding == 'msgpack':
+            return self._packb(payload, use_bin_type=True), 'application/msgpack'
+        return json.dumps(payload), 'application/json'
+
+    @STAGE_SECONDS.timed(stage='dashboard')
+    def flush(self):
+        count = len(self._timestamps)
+        if not count:
+            return 0
+        body, content_type = self._encode()
+        self._timestamps = []
+        self._rows = {entity: {field: [] for field in fields} for entity, fields in self.FIELDS.items()}
+        self._oldest = None
+        DASHBOARD_BYTES.inc(len(body))
+        try:
+            response = self.session.post(self.url, data=body, headers={'Content-Type': content_type})
+            response.raise_for_status()
+            self.batches += 1
+            self.snapshots += count
+            logger.info(f"Sent {count} snapshots to the dashboard ({len(body)} bytes)")
+        except requests.exceptions.RequestException as e:
+            DASHBOARD_FAILURES.inc()
+            logger.error(f"Failed to send {count} snapshots to dashboard: {e}")
+        return count
+
+    def close(self):
+        self.flush()
+
+def dashboard_batcher(send_dashboard=True):
+    # None means one /update_data post per tick
+    return DashboardBatcher() if send_dashboard and DASHBOARD_BATCH_SIZE > 1 else None
+
+@STAGE_SECONDS.timed(stage='build')
+def plant_from_arrays(arrays, column, state):
+    # One column of BatchDataGenerator.generate_arrays() output, copied into a reusable PlantState
+    return state.load_arrays(arrays, column)
+
+@STAGE_SECONDS.timed(stage='mqtt')
+def publish_plant(iot_agent, state):
+    for device_id, data in zip(state.device_ids, state.device_attributes()):
         iot_agent.send_data(device_id, data)
+    iot_agent.flush()
+    logger.debug(f"MQTT publisher stats: {iot_agent.publisher.stats()}")
+
+@STAGE_SECONDS.timed(stage='optimize')
+def optimize_plant(state, dr_algorithm):
+    # Run DR algorithm; optimized values are written into the state's arrays
+    dr_algorithm.optimize_state(state)
+
+    reduction = (state.pump_power.sum() + state.basin_power.sum()
+                 - state.optimized_pump_power.sum() - state.optimized_basin_power.sum())
+    logger.info(f"Demand Response: {state.num_pumps} pumps and {state.num_basins} aeration basins, "
+                f"total power reduced by {reduction:.2f} kW")
+    # Per-device lines only when asked for; formatting them dominates the tick for large fleets
+    if logger.isEnabledFor(logging.DEBUG):
+        for recommendation in dr_algorithm.state_recommendations(state):
+            logger.debug(f"- {recommendation}")
+
+def run_tick(timestamp, state, dr_algorithm, iot_agent, send_dashboard=True, batcher=None):
+    TICKS.inc()
+    optimize_plant(state, dr_algorithm)
+
+    # Send data to IoT platform
+    publish_plant(iot_agent, state)
 
-        # Send data to dashboard
-        send_data_to_dashboard(pumps, aeration_basins, grid)
+    # Send data to dashboard
+    if batcher is not None:
+        batcher.add(state, timestamp)
+    elif send_dashboard:
+        send_data_to_dashboard(state, timestamp)
+
+def run_wall_clock(generator, dr_algorithm, iot_agent, end_time):
+    state = generator.plant_state()
+    while datetime.now() < end_time:
+        current_time = datetime.now().replace(microsecond=0)
+        logger.info(f"\nGenerating data for {current_time}")
+        with STAGE_SECONDS.time(stage='generate'):
+            generator.generate_state(current_time, state)
+        run_tick(None, state, dr_algorithm, iot_agent)
 
         logger.info(f"Waiting for next update... (Current time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')})")
         time.sleep(UPDATE_INTERVAL)
 
+def run_virtual_clock(generator, dr_algorithm, iot_agent, start_time, end_time, speed=None, send_dashboard=True):
+    # Device data for the whole horizon is precomputed chunk by chunk; the clock only paces the run
+    clock = VirtualClock(start_time, speed)
+    ticks = ChunkedTickSource(generator, start_time, end_time, UPDATE_INTERVAL, SIMULATION_CHUNK_TICKS)
+    state = generator.plant_state()
+    batcher = dashboard_batcher(send_dashboard)
+    tick_count = 0
+    try:
+        for timestamp, arrays, column in ticks:
+            clock.current_time = timestamp
+            logger.info(f"\nSimulating {timestamp}")
+            plant_from_arrays(arrays, column, state)
+            run_tick(timestamp, state, dr_algorithm, iot_agent, send_dashboard, batcher)
+            clock.sleep(UPDATE_INTERVAL)
+            tick_count += 1
+    finally:
+        if batcher is not None:
+            batcher.close()
+    return tick_count
+
+async def tick_source(generator, start_time, end_time, virtual=False, speed=None):
+    # Yields (timestamp, PlantState); timestamp is None on the wall clock. Each tick gets
+    # its own copy of the state because the sinks may still be reading earlier ones.
+    state = generator.plant_state()
+    if virtual:
+        clock = VirtualClock(start_time, speed)
+        ticks = ChunkedTickSource(generator, start_time, end_time, UPDATE_INTERVAL, SIMULATION_CHUNK_TICKS)
+        for timestamp, arrays, column in ticks:
+            clock.current_time = timestamp
+            yield timestamp, plant_from_arrays(arrays, column, state).copy()
+            await asyncio.sleep(clock.advance(UPDATE_INTERVAL))
+    else:
+        while datetime.now() < end_time:
+            current_time = datetime.now().replace(microsecond=0)
+            with STAGE_SECONDS.time(stage='generate'):
+                generator.generate_state(current_time, state)
+            yield None, state.copy()
+            await asyncio.sleep(UPDATE_INTERVAL)
+
+def run_pipeline(generator, dr_algorithm, iot_agent, start_time, end_time, virtual=False, speed=None, send_dashboard=True):
+    """Run generation, DR, MQTT and dashboard as concurrent stages.
+
+    The sinks sit behind their own bounded queues (PIPELINE_*_POLICY), so a
+    slow broker or dashboard drops or coalesces ticks instead of delaying the
+    next DR solve.
+    """
+    def process(tick):
+        TICKS.inc()
+        optimize_plant(tick[1], dr_algorithm)
+        return tick
+
+    sinks = {'mqtt': (lambda tick: publish_plant(iot_agent, tick[1]), PIPELINE_MQTT_POLICY)}
+    # Wall-clock ticks are a minute apart, so only accelerated runs batch their dashboard posts
+    batcher = dashboard_batcher(send_dashboard) if virtual else None
+    if batcher is not None:
+        sinks['dashboard'] = (lambda tick: batcher.add(tick[1], tick[0]), PIPELINE_DASHBOARD_POLICY)
+    elif send_dashboard:
+        sinks['dashboard'] = (lambda tick: send_data_to_dashboard(tick[1], tick[0]), PIPELINE_DASHBOARD_POLICY)
+
+    pipeline = Pipeline(
+        tick_source(generator, start_time, end_time, virtual, speed),
+        process,
+        sinks,
+        queue_size=PIPELINE_QUEUE_SIZE,
+        monitor_interval=PIPELINE_MONITOR_INTERVAL
+    )
+    stats = asyncio.run(pipeline.run())
+    if batcher is not None:
+        batcher.close()
+    logger.info(f"Pipeline finished: {stats}")
+    return stats
+
+def run_subscriber(generator, dr_algorithm, iot_agent, end_time, send_dashboard=True):
+    """Run DR whenever field telemetry arrives instead of on the UPDATE_INTERVAL poll."""
+    def on_trigger(state, reasons):
+        logger.info(f"Telemetry trigger ({', '.join(reasons)})")
+        run_tick(None, state, dr_algorithm, iot_agent, send_dashboard)
+
+    consumer = TelemetryConsumer(generator.plant_state(), MQTT_BROKER, MQTT_PORT, API_KEY, on_trigger,
+                                 SUBSCRIBE_REPORT_FRACTION, SUBSCRIBE_PRICE_CHANGE, SUBSCRIBE_DEBOUNCE, MQTT_QOS)
+    consumer.start()
+    try:
+        while datetime.now() < end_time:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        logger.info("Subscriber stopped")
+    finally:
+        consumer.stop()
+    logger.info(f"Telemetry consumer stats: {consumer.stats()}")
+    return consumer.runs
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Wastewater demand response digital twin")
+    parser.add_argument('--virtual', action='store_true',
+                        help="run on a simulated clock instead of wall time")
+    parser.add_argument('--speed', type=float, default=SIMULATION_SPEED,
+                        help="virtual seconds per wall second (default: as fast as possible)")
+    parser.add_argument('--duration', type=float, default=SIMULATION_DURATION,
+                        help="simulated duration in minutes")
+    parser.add_argument('--start', help="virtual start time (ISO format, default: now)")
+    parser.add_argument('--no-dashboard', action='store_true',
+                        help="skip posting ticks to the dashboard")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="run generation, DR and publishing as concurrent stages with bounded queues")
+    parser.add_argument('--subscribe', action='store_true',
+                        help="run DR on telemetry from the device attrs topics instead of generating data")
+    parser.add_argument('--plants', default=PLANTS_FILE,
+                        help="simulate every plant in this JSON file across a process pool (virtual clock)")
+    parser.add_argument('--workers', type=int, default=PORTFOLIO_WORKERS,
+                        help="worker processes for --plants (default: one per core)")
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT,
+                        help="serve Prometheus metrics on this port")
+    parser.add_argument('--metrics-summary', type=float, default=METRICS_SUMMARY_INTERVAL,
+                        help="log a metrics summary every N seconds")
+    parser.add_argument('--no-metrics', action='store_true', help="disable instrumentation")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    metrics.configure(METRICS_ENABLED and not args.no_metrics, args.metrics_summary, args.metrics_port)
+    start_time = datetime.fromisoformat(args.start) if args.start else datetime.now()
+    end_time = start_time + timedelta(minutes=args.duration)
+
+    if args.plants:
+        # Each worker process owns its generators, solver and MQTT connection
+        portfolio = run_portfolio(load_plants(args.plants), start_time, end_time, args.workers,
+                                  broker=MQTT_BROKER, port=MQTT_PORT, speed=args.speed,
+                                  target_reduction=PORTFOLIO_TARGET_REDUCTION)
+        logger.info(f"Portfolio of {len(portfolio['plants'])} plants completed in {portfolio['wall_seconds']:.1f} s: "
+                    f"dispatched {portfolio['dispatched_energy_kwh']:.0f} of {portfolio['baseline_energy_kwh']:.0f} kWh, "
+                    f"savings {portfolio['cost_savings']:.2f}")
+        return portfolio
+
+    generator = DataGenerator(seed=RANDOM_SEED)
+    iot_agent = IoTAgent(MQTT_BROKER, MQTT_PORT)
+    dr_algorithm = DemandResponseAlgorithm.from_config()
+
+    logger.info(f"Starting simulation at {start_time}")
+    logger.info(f"Simulation will end at {end_time}")
+
+    if args.subscribe:
+        run_subscriber(generator, dr_algorithm, iot_agent, end_time, not args.no_dashboard)
+    elif args.pipeline:
+        run_pipeline(generator, dr_algorithm, iot_agent, start_time, end_time,
+                     args.virtual, args.speed, not args.no_dashboard)
+    elif args.virtual:
+        wall_start = time.monotonic()
+        tick_count = run_virtual_clock(generator, dr_algorithm, iot_agent, start_time, end_time,
+                                       args.speed, not args.no_dashboard)
+        logger.info(f"Simulated {tick_count} ticks in {time.monotonic() - wall_start:.1f} s wall time")
+    else:
+        run_wall_clock(generator, dr_algorithm, iot_agent, end_time)
+
     logger.info(f"Simulation completed at {datetime.now()}")
+    logger.info(f"DR solver stats: {dr_algorithm.stats()}")
+    if metrics.REGISTRY.enabled:
+        logger.info(f"Metrics summary: {metrics.summary()}")
     iot_agent.disconnect()
 
 if __name__ == "__main__":
@@ -0,0 +1,287 @@
+# wastewater_dr_twin/metrics.py
+# Process-wide counters, gauges and histograms in Prometheus text format.
+# Updates are no-ops while the registry is disabled (config.METRICS_ENABLED).
+import bisect
+import functools
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Seconds; spans a vectorized solve (sub-millisecond) up to a stalled broker flush
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _label_key(label_names, labels):
+    if len(labels) != len(label_names) or any(name not in labels for name in label_names):
+        raise ValueError(f"Expected labels {label_names}, got {sorted(labels)}")
+    return tuple(str(labels[name]) for name in label_names)
+
+def _format_labels(label_names, key, extra=None):
+    pairs = list(zip(label_names, key))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class _Timer:
+    def __init__(self, metric, labels):
+        self.metric = metric
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.started
+        self.metric.observe(self.elapsed, **self.labels)
+        return False
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, help_text, label_names=()):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def time(self, **labels):
+        # Observes (histogram) or adds (counter) the elapsed seconds
+        if not self.registry.enabled:
+            return _NULL_TIMER
+        return _Timer(self, labels)
+
+    def timed(self, **labels):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if not self.registry.enabled:
+            return
+        key = _label_key(self.label_names, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    observe = inc  # lets time() accumulate busy seconds into a counter
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.label_names, labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, None, value) for key, value in self._values.items()]
+
+    def summary(self):
+        return {','.join(key) or 'value': value for key, value in self._values.items()}
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        if not self.registry.enabled:
+            return
+        key = _label_key(self.label_names, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        if not self.registry.enabled:
+            return
+        key = _label_key(self.label_names, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts (+Inf last), sum, count, max]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0, value]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+            state[3] = max(state[3], value)
+
+    def samples(self):
+        with self._lock:
+            states = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+        samples = []
+        for key, counts, total, count in states:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", key, ('le', _format_value(bound)), cumulative))
+            samples.append((f"{self.name}_sum", key, None, total))
+            samples.append((f"{self.name}_count", key, None, count))
+        return samples
+
+    def quantile(self, q, **labels):
+        # Upper bound of the bucket holding the q-quantile
+        state = self._values.get(_label_key(self.label_names, labels))
+        if not state or not state[2]:
+            return None
+        rank = q * state[2]
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, state[0]):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return min(bound, state[3])
+        return state[3]
+
+    def summary(self):
+        result = {}
+        for key, (_, total, count, maximum) in list(self._values.items()):
+            labels = dict(zip(self.label_names, key))
+            result[','.join(key) or 'value'] = {
+                'count': count,
+                'mean': round(total / count, 6),
+                'p95': self.quantile(0.95, **labels),
+                'max': round(maximum, 6)
+            }
+        return result
+
+class Registry:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._summary_thread = None
+        self._summary_stop = threading.Event()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(self, name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric '{name}' already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter, name, help_text, labels)
+
+    def gauge(self, name, help_text, labels=()):
+        return self._register(Gauge, name, help_text, labels)
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help_text, labels, buckets)
+
+    def reset(self):
+        for metric in list(self._metrics.values()):
+            metric.reset()
+
+    def render(self):
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f"# HELP {name} {metric.help_text}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for sample_name, key, extra, value in metric.samples():
+                lines.append(f"{sample_name}{_format_labels(metric.label_names, key, extra)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        return {name: metric.summary() for name, metric in sorted(self._metrics.items()) if metric._values}
+
+    def start_summary_log(self, interval):
+        if self._summary_thread is not None:
+            return
+        self._summary_stop.clear()
+
+        def run():
+            while not self._summary_stop.wait(interval):
+                logger.info(f"Metrics summary: {self.summary()}")
+
+        self._summary_thread = threading.Thread(target=run, name='metrics-summary', daemon=True)
+        self._summary_thread.start()
+
+    def stop_summary_log(self):
+        self._summary_stop.set()
+        self._summary_thread = None
+
+    def start_http_server(self, port, host='0.0.0.0'):
+        # /metrics for processes without a web framework (main.py)
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+        logger.info(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+        return server
+
+REGISTRY = Registry()
+
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+render = REGISTRY.render
+summary = REGISTRY.summary
+
+# Tick stages shared by main.py, the virtual clock and the edge runner
+STAGE_SECONDS = histogram('twin_stage_seconds', "Duration of each tick stage", ['stage'])
+TICKS = counter('twin_ticks_total', "Ticks processed")
+
+def configure(enabled=True, summary_interval=None, port=None):
+    REGISTRY.enabled = enabled
+    if not enabled:
+        return None
+    if summary_interval:
+        REGISTRY.start_summary_log(summary_interval)
+    if port is not None:
+        return REGISTRY.start_http_server(port)
+    return None
@@ -1,58 +1,72 @@
+import argparse
 import requests
 import json
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 
 IOT_AGENT_URL = "http://localhost:4041"
 
 # Add these constants
 FIWARE_SERVICE = "wastewater"
 FIWARE_SERVICEPATH = "/"
+API_KEY = "wastewater_dr_twin_key"
 
-def provision_service():
-    headers = {
+DEFAULT_BATCH_SIZE = 200  # devices per POST /iot/devices
+DEFAULT_WORKERS = 8
+PAGE_SIZE = 1000  # devices per GET /iot/devices page
+
+DEVICE_ATTRIBUTES = [
+    {"object_id": "power", "name": "power", "type": "Number"},
+    {"object_id": "status", "name": "status", "type": "Text"},
+    {"object_id": "efficiency", "name": "efficiency", "type": "Number"},
+    {"object_id": "dissolved_oxygen", "name": "dissolved_oxygen", "type": "Number"},
+    {"object_id": "demand", "name": "demand", "type": "Number"},
+    {"object_id": "price", "name": "price", "type": "Number"}
+]
+
+def fiware_headers(service=FIWARE_SERVICE, servicepath=FIWARE_SERVICEPATH):
+    return {
         'Content-Type': 'application/json',
-        'fiware-service': FIWARE_SERVICE,
-        'fiware-servicepath': FIWARE_SERVICEPATH
+        'fiware-service': service,
+        'fiware-servicepath': servicepath
     }
+
+def provision_service(session=requests, api_key=API_KEY, service=FIWARE_SERVICE, servicepath=FIWARE_SERVICEPATH):
+    headers = fiware_headers(service, servicepath)
     payload = {
         "services": [
             {
-                "apikey": "wastewater_dr_twin_key",
+                "apikey": api_key,
                 "cbroker": "http://orion:1026",
                 "entity_type": "Device",
                 "resource": "/iot/json"
             }
         ]
     }
-    response = requests.post(f"{IOT_AGENT_URL}/iot/services", headers=headers, data=json.dumps(payload))
+    response = session.post(f"{IOT_AGENT_URL}/iot/services", headers=headers, data=json.dumps(payload))
     print(f"Service provisioning response: {response.status_code}")
-    if response.status_code != 201:
+    if response.status_code == 409:
+        print("Service group already provisioned")
+    elif response.status_code != 201:
         print(f"Error details: {response.text}")
         sys.exit(1)  # Exit if service provisioning fails
 
-def provision_device(device_id, entity_name, entity_type):
-    headers = {
-        'Content-Type': 'application/json',
-        'fiware-service': FIWARE_SERVICE,
-        'fiware-servicepath': FIWARE_SERVICEPATH
+def device_definition(device_id, entity_name, entity_type):
+    return {
+        "device_id": device_id,
+        "entity_name": entity_name,
+        "entity_type": entity_type,
+        "protocol": "json",
+        "transport": "MQTT",
+        "attributes": DEVICE_ATTRIBUTES
     }
+
+def provision_device(device_id, entity_name, entity_type):
+    headers = fiware_headers()
     payload = {
         "devices": [
-            {
-                "device_id": device_id,
-                "entity_name": entity_name,
-                "entity_type": entity_type,
-                "protocol": "json",
-                "transport": "MQTT",
-                "attributes": [
-                    {"object_id": "power", "name": "power", "type": "Number"},
-                    {"object_id": "status", "name": "status", "type": "Text"},
-                    {"object_id": "efficiency", "name": "efficiency", "type": "Number"},
-                    {"object_id": "dissolved_oxygen", "name": "dissolved_oxygen", "type": "Number"},
-                    {"object_id": "demand", "name": "demand", "type": "Number"},
-                    {"object_id": "price", "name": "price", "type": "Number"}
-                ]
-            }
+            device_definition(device_id, entity_name, entity_type)
         ]
     }
     response = requests.post(f"{IOT_AGENT_URL}/iot/devices", headers=headers, data=json.dumps(payload))
@@ -60,10 +74,105 @@ def provision_device(device_id, entity_name, entity_type):
     if response.status_code != 201:
         print(f"Error details: {response.text}")
 
+def strip_prefix(entity_id, prefix):
+    return entity_id[len(prefix):] if entity_id.startswith(prefix) else entity_id
+
+def fleet_devices(fleet):
+    # Same device ids and entity names as the single-device provisioning below
+    devices = []
+    for pump_id in fleet.pump_ids:
+        number = strip_prefix(pump_id, 'pump')
+        devices.append(device_definition(f"pump{number}", f"urn:ngsi-ld:Pump:{number}", "Pump"))
+    for basin_id in fleet.basin_ids:
+        number = strip_prefix(basin_id, 'basin')
+        devices.append(device_definition(f"aeration{number}", f"urn:ngsi-ld:AerationBasin:{number}", "AerationBasin"))
+    devices.append(device_definition("grid001", "urn:ngsi-ld:GridDemand:001", "GridDemand"))
+    return devices
+
+def fetch_provisioned(session):
+    provisioned = {}
+    offset = 0
+    while True:
+        response = session.get(f"{IOT_AGENT_URL}/iot/devices", params={'limit': PAGE_SIZE, 'offset': offset})
+        response.raise_for_status()
+        body = response.json()
+        devices = body.get('devices', [])
+        for device in devices:
+            provisioned[device['device_id']] = device
+        offset += len(devices)
+        if not devices or offset >= body.get('count', 0):
+            return provisioned
+
+def attribute_set(attributes):
+    return {(a.get('object_id'), a.get('name'), a.get('type')) for a in attributes or []}
+
+def device_changed(wanted, existing):
+    return (wanted['entity_name'] != existing.get('entity_name')
+            or wanted['entity_type'] != existing.get('entity_type')
+            or attribute_set(wanted['attributes']) != attribute_set(existing.get('attributes')))
+
+def diff_devices(wanted, provisioned):
+    new, changed = [], []
+    for device in wanted:
+        existing = provisioned.get(device['device_id'])
+        if existing is None:
+            new.append(device)
+        elif device_changed(device, existing):
+            changed.append(device)
+    return new, changed
+
+def post_batch(session, devices):
+    response = session.post(f"{IOT_AGENT_URL}/iot/devices", data=json.dumps({"devices": devices}))
+    if response.status_code != 201:
+        print(f"Batch of {len(devices)} devices failed ({response.status_code}): {response.text}")
+        return 0
+    return len(devices)
+
+def update_device(session, device):
+    body = {key: device[key] for key in ('entity_name', 'entity_type', 'attributes')}
+    response = session.put(f"{IOT_AGENT_URL}/iot/devices/{device['device_id']}", data=json.dumps(body))
+    if response.status_code != 204:
+        print(f"Update of device {device['device_id']} failed ({response.status_code}): {response.text}")
+        return 0
+    return 1
+
+def provision_fleet(fleet, batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS, api_key=API_KEY,
+                    service=FIWARE_SERVICE, servicepath=FIWARE_SERVICEPATH):
+    # The service group and every device are registered under one tenant (service, servicepath)
+    session = requests.Session()
+    session.mount('http://', HTTPAdapter(pool_connections=workers, pool_maxsize=workers))
+    session.headers.update(fiware_headers(service, servicepath))
+
+    provision_service(session, api_key, service, servicepath)
+    new, changed = diff_devices(fleet_devices(fleet), fetch_provisioned(session))
+    print(f"{len(new)} new and {len(changed)} changed devices to provision")
+
+    batches = [new[i:i + batch_size] for i in range(0, len(new), batch_size)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        created = sum(executor.map(lambda batch: post_batch(session, batch), batches))
+        updated = sum(executor.map(lambda device: update_device(session, device), changed))
+    print(f"Provisioned {created}/{len(new)} new devices, updated {updated}/{len(changed)} changed devices")
+    return created == len(new) and updated == len(changed)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Provision the IoT Agent service group and devices")
+    parser.add_argument('--bulk', action='store_true',
+                        help="provision the fleet definition in concurrent batches, skipping devices already provisioned")
+    parser.add_argument('--fleet', help="fleet JSON file (defaults to config.FLEET_FILE or the configured fleet size)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    provision_service()
-    for i in range(1, 6):
-        provision_device(f"pump00{i}", f"urn:ngsi-ld:Pump:00{i}", "Pump")
-    for i in range(1, 4):
-        provision_device(f"aeration00{i}", f"urn:ngsi-ld:AerationBasin:00{i}", "AerationBasin")
-    provision_device("grid001", "urn:ngsi-ld:GridDemand:001", "GridDemand")
\ No newline at end of file
+    args = parse_args()
+    if args.bulk:
+        from data_generators.fleet import load_fleet
+        if not provision_fleet(load_fleet(args.fleet), args.batch_size, args.workers):
+            sys.exit(1)
+    else:
+        provision_service()
+        for i in range(1, 6):
+            provision_device(f"pump00{i}", f"urn:ngsi-ld:Pump:00{i}", "Pump")
+        for i in range(1, 4):
+            provision_device(f"aeration00{i}", f"urn:ngsi-ld:AerationBasin:00{i}", "AerationBasin")
+        provision_device("grid001", "urn:ngsi-ld:GridDemand:001", "GridDemand")
\ No newline at end of file
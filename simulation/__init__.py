@@ -0,0 +1,11 @@
+# wastewater_dr_twin/simulation/__init__.py
+
+from .clock import WallClock, VirtualClock, ChunkedTickSource
+from .pipeline import Pipeline, StageQueue
+from .multi_plant import PlantConfig, PortfolioCoordinator, load_plants, run_portfolio
+from .scenarios import ScenarioSampler, evaluate_strategy, run_scenarios
+from .backtest import BacktestEngine, run_backtest
+
+__all__ = ['WallClock', 'VirtualClock', 'ChunkedTickSource', 'Pipeline', 'StageQueue',
+           'PlantConfig', 'PortfolioCoordinator', 'load_plants', 'run_portfolio',
+           'ScenarioSampler', 'evaluate_strategy', 'run_scenarios', 'BacktestEngine', 'run_backtest']
@@ -0,0 +1,365 @@
+# wastewater_dr_twin/simulation/backtest.py
+"""Replay recorded telemetry through the DR algorithm in bounded memory.
+
+Inputs use the DataGenerator frame layouts, one row per device reading,
+sorted by timestamp:
+
+    pumps:  timestamp, pump_id, power, status, efficiency
+    basins: timestamp, basin_id, power, dissolved_oxygen
+    grid:   timestamp, demand, price
+
+Files are read chunk_rows rows at a time (CSV, or Parquet with pyarrow),
+aligned on the union of their timestamps with the last reading of each
+device held until it reports again, and optimized window by window. Only
+the current window and one row of carried state per device stay in memory.
+"""
+import argparse
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import config
+from data_generators.fleet import load_fleet
+from data_generators.plant_state import device_signature
+from demand_response.algorithm import DemandResponseAlgorithm
+
+logger = logging.getLogger(__name__)
+
+PUMP_COLUMNS = ['timestamp', 'pump_id', 'power', 'status', 'efficiency']
+BASIN_COLUMNS = ['timestamp', 'basin_id', 'power', 'dissolved_oxygen']
+GRID_COLUMNS = ['timestamp', 'demand', 'price']
+
+def _is_parquet(path):
+    return str(path).endswith(('.parquet', '.pq'))
+
+def read_chunks(path, columns, chunk_rows=config.BACKTEST_CHUNK_ROWS):
+    """Yield DataFrames of at most chunk_rows rows from a CSV or Parquet file."""
+    if _is_parquet(path):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Reading Parquet telemetry requires pyarrow (pip install pyarrow)")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+            chunk = batch.to_pandas()
+            chunk['timestamp'] = pd.to_datetime(chunk['timestamp'])
+            yield chunk
+    else:
+        for chunk in pd.read_csv(path, usecols=columns, chunksize=chunk_rows):
+            chunk['timestamp'] = pd.to_datetime(chunk['timestamp'])
+            yield chunk
+
+def read_ids(path, id_column, chunk_rows=config.BACKTEST_CHUNK_ROWS):
+    # First pass over the id column only, for runs without a fleet file
+    ids = {}
+    for chunk in read_chunks(path, ['timestamp', id_column], chunk_rows):
+        ids.update(dict.fromkeys(chunk[id_column].astype(str).unique()))
+    return list(ids)
+
+class ChunkWriter:
+    """Appends DataFrames to a CSV or Parquet file as they are produced."""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._parquet_writer = None
+        if os.path.exists(path):
+            os.remove(path)
+
+    def write(self, frame):
+        if frame.empty:
+            return
+        if _is_parquet(self.path):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode='a', header=self.rows == 0, index=False)
+        self.rows += len(frame)
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+
+class _Stream:
+    """Buffered cursor over one telemetry file's chunks."""
+
+    def __init__(self, name, chunks, freq=None):
+        self.name = name
+        self.chunks = chunks
+        self.freq = freq
+        self.buffer = None
+        self.done = False
+        self.emitted_until = None
+
+    def _read(self):
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            self.done = True
+            return
+        previous = self.buffer['timestamp'].iloc[-1] if self.buffer is not None and not self.buffer.empty else self.emitted_until
+        if chunk.empty:
+            return
+        if not chunk['timestamp'].is_monotonic_increasing or (previous is not None and chunk['timestamp'].iloc[0] < previous):
+            raise ValueError(f"{self.name} telemetry is not sorted by timestamp")
+        self.buffer = chunk if self.buffer is None or self.buffer.empty else pd.concat([self.buffer, chunk], ignore_index=True)
+
+    def _interval(self, timestamp):
+        return timestamp.floor(self.freq) if self.freq else timestamp
+
+    def fill(self):
+        # Read until the buffer spans more than one interval: the last one may continue in the next chunk
+        while not self.done and (self.buffer is None or self.buffer.empty or
+                                 self._interval(self.buffer['timestamp'].iloc[0]) ==
+                                 self._interval(self.buffer['timestamp'].iloc[-1])):
+            self._read()
+
+    @property
+    def horizon(self):
+        # Rows before this timestamp are complete
+        if self.done:
+            return None
+        return self._interval(self.buffer['timestamp'].iloc[-1])
+
+    def take(self, until):
+        if self.buffer is None or self.buffer.empty:
+            return None
+        if until is None:
+            rows, self.buffer = self.buffer, self.buffer.iloc[:0]
+        else:
+            split = int(np.searchsorted(self.buffer['timestamp'].values, np.datetime64(until, 'ns'), side='left'))
+            rows, self.buffer = self.buffer.iloc[:split], self.buffer.iloc[split:].reset_index(drop=True)
+        if not rows.empty:
+            self.emitted_until = rows['timestamp'].iloc[-1]
+        return rows
+
+def _forward_fill(values, carry):
+    """Fill NaNs along the time axis (axis 1) from the left, seeded with carry (one value per row)."""
+    values = np.concatenate([carry[:, None], values], axis=1)
+    positions = np.where(np.isnan(values), 0, np.arange(values.shape[1]))
+    np.maximum.accumulate(positions, axis=1, out=positions)
+    filled = np.take_along_axis(values, positions, axis=1)[:, 1:]
+    return filled, filled[:, -1].copy()
+
+class BacktestEngine:
+    def __init__(self, pump_ids, basin_ids, dr_algorithm=None, freq=None):
+        self.pump_ids = pd.Index(pump_ids)
+        self.basin_ids = pd.Index(basin_ids)
+        self.dr_algorithm = dr_algorithm if dr_algorithm is not None else DemandResponseAlgorithm.from_config()
+        self.freq = freq
+        self.signature = device_signature(self.pump_ids, self.basin_ids)
+        # Last known reading per device (NaN until first seen), carried between windows
+        self.carry = {
+            'pump_power': np.full(len(self.pump_ids), np.nan),
+            'pump_efficiency': np.full(len(self.pump_ids), np.nan),
+            'pump_running': np.full(len(self.pump_ids), np.nan),
+            'basin_power': np.full(len(self.basin_ids), np.nan),
+            'basin_dissolved_oxygen': np.full(len(self.basin_ids), np.nan),
+            'grid_demand': np.full(1, np.nan),
+            'grid_price': np.full(1, np.nan)
+        }
+        # Timestamp and (baseline, optimized, price) of the latest reading, credited once the next one arrives
+        self.pending = None
+        self.unknown_rows = 0
+        self.totals = {'intervals': 0, 'baseline_kwh': 0.0, 'optimized_kwh': 0.0, 'baseline_cost': 0.0, 'optimized_cost': 0.0}
+
+    def _timestamps(self, frame):
+        timestamps = frame['timestamp']
+        return timestamps.dt.floor(self.freq) if self.freq else timestamps
+
+    def _pivot(self, frame, ids, id_column, fields, times):
+        # Long rows -> (n_devices, n_times) per field; later rows win within an interval
+        shape = (len(ids), len(times))
+        grids = {field: np.full(shape, np.nan) for field in fields}
+        if frame is None or frame.empty:
+            return grids
+        device = ids.get_indexer(frame[id_column].astype(str))
+        known = device >= 0
+        self.unknown_rows += int((~known).sum())
+        column = np.searchsorted(times, self._timestamps(frame).values)
+        for field, source in fields.items():
+            grids[field][device[known], column[known]] = source(frame)[known]
+        return grids
+
+    def process_window(self, pumps, basins, grid):
+        """Align and optimize one window of rows; returns the pump and basin setpoint frames."""
+        frames = [frame for frame in (pumps, basins, grid) if frame is not None and not frame.empty]
+        if not frames:
+            return None, None
+        times = np.unique(np.concatenate([self._timestamps(frame).values for frame in frames]))
+
+        values = self._pivot(pumps, self.pump_ids, 'pump_id', {
+            'pump_power': lambda f: f['power'].to_numpy(np.float64),
+            'pump_efficiency': lambda f: f['efficiency'].to_numpy(np.float64),
+            'pump_running': lambda f: (f['status'].astype(str) == 'running').to_numpy(np.float64)
+        }, times)
+        values.update(self._pivot(basins, self.basin_ids, 'basin_id', {
+            'basin_power': lambda f: f['power'].to_numpy(np.float64),
+            'basin_dissolved_oxygen': lambda f: f['dissolved_oxygen'].to_numpy(np.float64)
+        }, times))
+        grid_values = np.full((2, len(times)), np.nan)
+        if grid is not None and not grid.empty:
+            column = np.searchsorted(times, self._timestamps(grid).values)
+            grid_values[0, column] = grid['demand'].to_numpy(np.float64)
+            grid_values[1, column] = grid['price'].to_numpy(np.float64)
+        values['grid_demand'], values['grid_price'] = grid_values[:1], grid_values[1:]
+        for name in values:
+            values[name], self.carry[name] = _forward_fill(values[name], self.carry[name])
+
+        result = self._optimize(values)
+        self._accumulate(times, values, result)
+        return self._setpoints(times, values, result)
+
+    def _optimize(self, values):
+        dr_algorithm = self.dr_algorithm
+        if dr_algorithm.solver == 'vectorized':
+            # Every interval of the window in one call
+            return dr_algorithm.optimize_arrays(values['pump_power'], values['pump_efficiency'],
+                                                values['basin_power'], values['basin_dissolved_oxygen'])
+        columns = []
+        for t in range(values['pump_power'].shape[1]):
+            pump_power = np.nan_to_num(values['pump_power'][:, t])
+            basin_power = np.nan_to_num(values['basin_power'][:, t])
+            columns.append(dr_algorithm.solve(pump_power, values['pump_efficiency'][:, t], basin_power,
+                                              values['basin_dissolved_oxygen'][:, t], values['grid_price'][0, t],
+                                              self.signature))
+        return {key: np.stack([column[key] for column in columns], axis=-1) for key in columns[0]}
+
+    def _credit(self, baseline, optimized, price, hours):
+        self.totals['baseline_kwh'] += float((baseline * hours).sum())
+        self.totals['optimized_kwh'] += float((optimized * hours).sum())
+        self.totals['baseline_cost'] += float((baseline * hours * price).sum())
+        self.totals['optimized_cost'] += float((optimized * hours * price).sum())
+
+    def _accumulate(self, times, values, result):
+        # Each reading holds until the next timestamp, so the last one of a window is credited by the next window
+        running = np.nan_to_num(values['pump_running'])
+        baseline = np.nansum(values['pump_power'] * running, axis=0) + np.nansum(values['basin_power'], axis=0)
+        optimized = np.nansum(result['pump_power'] * running, axis=0) + np.nansum(result['basin_power'], axis=0)
+        price = np.nan_to_num(values['grid_price'][0])
+        if self.pending is not None:
+            timestamp, *rates = self.pending
+            times = np.concatenate([[timestamp], times])
+            baseline, optimized, price = (np.concatenate([[rate], series])
+                                          for rate, series in zip(rates, (baseline, optimized, price)))
+        hours = np.diff(times).astype('timedelta64[s]').astype(np.float64) / 3600
+        self._credit(baseline[:-1], optimized[:-1], price[:-1], hours)
+        self.totals['intervals'] += len(hours) + (self.pending is None)
+        self.pending = (times[-1], baseline[-1], optimized[-1], price[-1])
+
+    def _close(self):
+        # The final reading holds for one interval when readings are aligned to one, else it has no duration
+        if self.pending is not None and self.freq:
+            _, *rates = self.pending
+            self._credit(*rates, pd.Timedelta(self.freq).total_seconds() / 3600)
+        self.pending = None
+
+    def _setpoints(self, times, values, result):
+        def long_frame(ids, id_column, power, optimized_power, extra):
+            # Time-major rows for devices with a reading so far
+            valid = ~np.isnan(power.T)
+            t, d = np.nonzero(valid)
+            frame = {'timestamp': times[t], id_column: np.asarray(ids, dtype=object)[d],
+                     'power': power.T[valid], 'optimized_power': optimized_power.T[valid]}
+            for name, array in extra.items():
+                frame[name] = array.T[valid]
+            frame = pd.DataFrame(frame)
+            change = frame['optimized_power'] - frame['power']
+            frame['recommendation'] = np.select([change < -1e-9, change > 1e-9], ['reduce', 'increase'], 'hold')
+            return frame
+
+        pumps = long_frame(self.pump_ids, 'pump_id', values['pump_power'], result['pump_power'], {
+            'efficiency': values['pump_efficiency'],
+            'optimized_efficiency': result['pump_efficiency'],
+            'running': values['pump_running'] > 0
+        })
+        basins = long_frame(self.basin_ids, 'basin_id', values['basin_power'], result['basin_power'], {
+            'dissolved_oxygen': values['basin_dissolved_oxygen'],
+            'optimized_dissolved_oxygen': result['basin_dissolved_oxygen']
+        })
+        return pumps, basins
+
+    def run(self, pump_path, basin_path, grid_path, output_dir, output_format='csv',
+            chunk_rows=config.BACKTEST_CHUNK_ROWS):
+        """Stream the three files through the algorithm, appending setpoints to output_dir as it goes."""
+        started = time.monotonic()
+        os.makedirs(output_dir, exist_ok=True)
+        streams = [
+            _Stream('pump', read_chunks(pump_path, PUMP_COLUMNS, chunk_rows), self.freq),
+            _Stream('basin', read_chunks(basin_path, BASIN_COLUMNS, chunk_rows), self.freq),
+            _Stream('grid', read_chunks(grid_path, GRID_COLUMNS, chunk_rows), self.freq)
+        ]
+        writers = [ChunkWriter(os.path.join(output_dir, f"{name}_setpoints.{output_format}"))
+                   for name in ('pump', 'basin')]
+        try:
+            while True:
+                for stream in streams:
+                    stream.fill()
+                horizons = [stream.horizon for stream in streams if stream.horizon is not None]
+                until = min(horizons) if horizons else None
+                window = [stream.take(until) for stream in streams]
+                if all(rows is None or rows.empty for rows in window):
+                    if until is None:
+                        break
+                    continue
+                pumps, basins = self.process_window(*window)
+                for writer, frame in zip(writers, (pumps, basins)):
+                    if frame is not None:
+                        writer.write(frame)
+        finally:
+            for writer in writers:
+                writer.close()
+        self._close()
+
+        if self.unknown_rows:
+            logger.warning(f"Skipped {self.unknown_rows} rows of devices not in the fleet")
+        summary = dict(self.totals)
+        summary['kwh_saved'] = summary['baseline_kwh'] - summary['optimized_kwh']
+        summary['cost_saved'] = summary['baseline_cost'] - summary['optimized_cost']
+        summary['rows_written'] = {writer.path: writer.rows for writer in writers}
+        summary['seconds'] = time.monotonic() - started
+        return summary
+
+def run_backtest(pump_path, basin_path, grid_path, output_dir, fleet_path=None, solver=config.DR_SOLVER,
+                 freq=None, output_format='csv', chunk_rows=config.BACKTEST_CHUNK_ROWS):
+    if fleet_path or config.FLEET_FILE:
+        fleet = load_fleet(fleet_path)
+        pump_ids, basin_ids = fleet.pump_ids, fleet.basin_ids
+    else:
+        pump_ids = read_ids(pump_path, 'pump_id', chunk_rows)
+        basin_ids = read_ids(basin_path, 'basin_id', chunk_rows)
+    dr_algorithm = DemandResponseAlgorithm.from_config(solver)
+    engine = BacktestEngine(pump_ids, basin_ids, dr_algorithm, freq)
+    return engine.run(pump_path, basin_path, grid_path, output_dir, output_format, chunk_rows)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest demand response over recorded telemetry")
+    parser.add_argument('--pumps', required=True, help="pump telemetry (CSV or Parquet)")
+    parser.add_argument('--basins', required=True, help="aeration basin telemetry (CSV or Parquet)")
+    parser.add_argument('--grid', required=True, help="grid demand/price telemetry (CSV or Parquet)")
+    parser.add_argument('--output', required=True, help="directory for the setpoint files")
+    parser.add_argument('--format', choices=('csv', 'parquet'), default='csv')
+    parser.add_argument('--fleet', help="fleet JSON defining the device ids (default: read from the files)")
+    parser.add_argument('--solver', default=config.DR_SOLVER)
+    parser.add_argument('--freq', help="align readings onto this interval, e.g. 5min (default: raw timestamps)")
+    parser.add_argument('--chunk-rows', type=int, default=config.BACKTEST_CHUNK_ROWS)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_args(argv)
+    summary = run_backtest(args.pumps, args.basins, args.grid, args.output, args.fleet, args.solver,
+                           args.freq, args.format, args.chunk_rows)
+    logger.info(f"Backtest finished: {summary}")
+    return summary
+
+if __name__ == "__main__":
+    main()
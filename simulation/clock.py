@@ -0,0 +1,75 @@
+# wastewater_dr_twin/simulation/clock.py
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from metrics import STAGE_SECONDS  # chunks show up as stage 'generate_chunk'
+
+class WallClock:
+    def now(self):
+        return datetime.now()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+class VirtualClock:
+    """Simulated time that advances on sleep().
+
+    With speed=None virtual time runs as fast as the caller processes ticks.
+    With a speed multiplier, sleep() paces the run so virtual time never gets
+    ahead of speed x elapsed wall time.
+    """
+
+    def __init__(self, start_time, speed=None):
+        self.start_time = start_time
+        self.current_time = start_time
+        self.speed = speed
+        self._wall_start = time.monotonic()
+
+    def now(self):
+        return self.current_time
+
+    def advance(self, seconds):
+        # Move virtual time forward and return how long the caller should wait to honour speed
+        self.current_time += timedelta(seconds=seconds)
+        if not self.speed:
+            return 0.0
+        virtual_elapsed = (self.current_time - self.start_time).total_seconds()
+        return max(virtual_elapsed / self.speed - (time.monotonic() - self._wall_start), 0.0)
+
+    def sleep(self, seconds):
+        wait = self.advance(seconds)
+        if wait > 0:
+            time.sleep(wait)
+
+class ChunkedTickSource:
+    """Iterates over the ticks of a horizon, generating device data a chunk at a time.
+
+    Chunks of chunk_ticks intervals come from the DataGenerator's
+    StreamGenerator (DataGenerator.iter_chunks, aligned on start_time), so a
+    month of 1-minute ticks costs a few dozen vectorized draws rather than one
+    DataGenerator call per tick, and chunk k holds the same data whichever
+    process generates it. workers > 1 generates chunks ahead in a process pool.
+    Yields (timestamp, arrays, column) with column indexing the chunk arrays.
+    """
+
+    def __init__(self, generator, start_time, end_time, interval_seconds, chunk_ticks=1440, workers=1):
+        self.generator = generator
+        self.start_time = pd.Timestamp(start_time)
+        self.end_time = pd.Timestamp(end_time)
+        self.interval = pd.Timedelta(seconds=interval_seconds)
+        self.chunk_ticks = chunk_ticks
+        self.workers = workers
+
+    def __iter__(self):
+        freq = f"{int(self.interval.total_seconds())}s"
+        chunks = self.generator.iter_chunks(self.start_time, self.end_time, freq, self.chunk_ticks, workers=self.workers)
+        while True:
+            with STAGE_SECONDS.time(stage='generate_chunk'):
+                arrays = next(chunks, None)
+            if arrays is None:
+                return
+            timestamps = arrays['timestamp']
+            for column in range(len(timestamps)):
+                yield pd.Timestamp(timestamps[column]).to_pydatetime(), arrays, column
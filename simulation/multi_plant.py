@@ -0,0 +1,305 @@
+# wastewater_dr_twin/simulation/multi_plant.py
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import config
+from data_generators.fleet import Fleet
+from data_generators.main_generator import DataGenerator
+from demand_response.algorithm import DemandResponseAlgorithm
+from .clock import VirtualClock, ChunkedTickSource
+
+logger = logging.getLogger(__name__)
+
+class PlantConfig:
+    """One treatment plant of a portfolio.
+
+    fleet is a Fleet, a fleet dict (Fleet.to_dict() layout) or the path of a
+    fleet JSON file. api_key selects the IoT Agent service group the plant's
+    devices publish under (default: API_KEY suffixed with the plant name, since
+    device ids repeat between plants); fiware_service/servicepath are the tenant
+    that group and its entities live in. provision_plants registers both.
+    """
+
+    def __init__(self, name, fleet=None, fiware_service=config.FIWARE_SERVICE,
+                 fiware_servicepath=config.FIWARE_SERVICEPATH, seed=None, api_key=None):
+        self.name = name
+        if isinstance(fleet, Fleet):
+            fleet = fleet.to_dict()
+        # Kept as a dict/path so configs pickle cheaply to worker processes
+        self.fleet = fleet
+        self.fiware_service = fiware_service
+        self.fiware_servicepath = fiware_servicepath
+        self.seed = seed
+        self.api_key = api_key or f"{config.API_KEY}_{name}"
+
+    def load_fleet(self):
+        if self.fleet is None:
+            return Fleet.from_config()
+        if isinstance(self.fleet, dict):
+            return Fleet.from_dict(self.fleet)
+        return Fleet.from_file(self.fleet)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['name'],
+            data.get('fleet', data.get('fleet_file')),
+            data.get('fiware_service', config.FIWARE_SERVICE),
+            data.get('fiware_servicepath', config.FIWARE_SERVICEPATH),
+            data.get('seed'),
+            data.get('api_key')
+        )
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'fleet': self.fleet,
+            'fiware_service': self.fiware_service,
+            'fiware_servicepath': self.fiware_servicepath,
+            'seed': self.seed,
+            'api_key': self.api_key
+        }
+
+def load_plants(path):
+    """Read a JSON list of plant configs (or {'plants': [...]})."""
+    with open(path) as f:
+        data = json.load(f)
+    plants = data['plants'] if isinstance(data, dict) else data
+    configs = [PlantConfig.from_dict(plant) for plant in plants]
+    for field in ('name', 'api_key'):
+        values = [getattr(plant, field) for plant in configs]
+        if len(set(values)) != len(values):
+            raise ValueError(f"Plant {field}s must be unique")
+    return configs
+
+def synthetic_plants(count, num_pumps=config.NUM_PUMPS, num_basins=config.NUM_AERATION_BASINS, seed=config.RANDOM_SEED):
+    # Portfolio of distinct synthetic plants, one FIWARE service path each
+    return [
+        PlantConfig(f"plant{i:03d}", Fleet.synthetic(num_pumps, num_basins, seed=seed + i),
+                    fiware_servicepath=f"/plant{i:03d}", seed=seed + i)
+        for i in range(1, count + 1)
+    ]
+
+def provision_plants(plants, batch_size=None, workers=None):
+    """Provision one IoT Agent service group per plant, plus its devices, under the plant's tenant.
+
+    The MQTT topics only carry the api_key; the IoT Agent maps it back to the
+    service group, so this is what routes a plant's readings to its own
+    fiware_service/servicepath in Orion. Returns True when every plant succeeded.
+    """
+    import provision_devices
+
+    batch_size = batch_size or provision_devices.DEFAULT_BATCH_SIZE
+    workers = workers or provision_devices.DEFAULT_WORKERS
+    ok = True
+    for plant in plants:
+        logger.info(f"Provisioning plant {plant.name} as {plant.fiware_service}{plant.fiware_servicepath}")
+        ok = provision_devices.provision_fleet(plant.load_fleet(), batch_size, workers, plant.api_key,
+                                               plant.fiware_service, plant.fiware_servicepath) and ok
+    return ok
+
+# Per-process state, created once by the pool initializer and reused by every plant the worker runs
+_worker = {}
+
+def _init_worker(broker, port, qos, solver):
+    _worker['dr_algorithm'] = DemandResponseAlgorithm.from_config(solver)
+    _worker['publisher'] = None
+    if broker:
+        import paho.mqtt.client as mqtt
+        from fiware_integration.mqtt_publisher import BatchPublisher
+
+        client = mqtt.Client()
+        _worker['publisher'] = BatchPublisher(client, qos=qos, max_inflight=config.MQTT_MAX_INFLIGHT)
+        client.connect(broker, port)
+        client.loop_start()
+
+def _publish_state(publisher, api_key, state):
+    for device_id, data in zip(state.device_ids, state.device_attributes()):
+        publisher.enqueue(f"/json/{api_key}/{device_id}/attrs", json.dumps(data))
+    publisher.publish_pending()
+
+def run_plant(plant, start_time, end_time, interval_seconds=config.UPDATE_INTERVAL,
+              chunk_ticks=config.SIMULATION_CHUNK_TICKS, speed=None):
+    """Simulate one plant over [start_time, end_time) inside a worker; returns its per-tick totals."""
+    started = time.monotonic()
+    dr_algorithm = _worker.get('dr_algorithm') or DemandResponseAlgorithm.from_config()
+    publisher = _worker.get('publisher')
+    generator = DataGenerator(plant.load_fleet(), seed=plant.seed)
+    state = generator.plant_state()
+    clock = VirtualClock(start_time, speed)
+    ticks = ChunkedTickSource(generator, start_time, end_time, interval_seconds, chunk_ticks)
+
+    timestamps, baseline, optimized, price = [], [], [], []
+    chunk, chunk_result = None, None
+    for timestamp, arrays, column in ticks:
+        if arrays is not chunk:
+            chunk = arrays
+            # The closed-form solver handles a whole chunk of ticks in one call
+            chunk_result = dr_algorithm.optimize_arrays(
+                arrays['pump_power'], arrays['pump_efficiency'],
+                arrays['basin_power'], arrays['basin_dissolved_oxygen']) if dr_algorithm.solver == 'vectorized' else None
+
+        state.load_arrays(arrays, column, timestamp)
+        if chunk_result is None:
+            dr_algorithm.optimize_state(state)
+        else:
+            state.set_optimized({key: value[..., column] for key, value in chunk_result.items()})
+        if publisher is not None:
+            _publish_state(publisher, plant.api_key, state)
+
+        timestamps.append(timestamp)
+        baseline.append(state.pump_power.sum() + state.basin_power.sum())
+        optimized.append(state.optimized_pump_power.sum() + state.optimized_basin_power.sum())
+        price.append(state.grid_price)
+        clock.sleep(interval_seconds)
+
+    undelivered = publisher.flush(config.MQTT_FLUSH_TIMEOUT) if publisher is not None else 0
+    return {
+        'name': plant.name,
+        'fiware_service': plant.fiware_service,
+        'fiware_servicepath': plant.fiware_servicepath,
+        'timestamp': np.array(timestamps, dtype='datetime64[ns]'),
+        'baseline_power': np.array(baseline),
+        'optimized_power': np.array(optimized),
+        'price': np.array(price),
+        'undelivered': undelivered,
+        'pid': os.getpid(),
+        'seconds': time.monotonic() - started
+    }
+
+def dispatch_reduction(flexibility, target):
+    """Split a portfolio-wide reduction target (kW per tick) across plants pro rata to their flexibility.
+
+    flexibility is (n_plants, n_ticks); target broadcasts over ticks. Plants are
+    never asked for more than they can shed.
+    """
+    total = flexibility.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        share = np.where(total > 0, np.minimum(target / total, 1.0), 0.0)
+    return flexibility * share
+
+class PortfolioCoordinator:
+    """Aggregates plant-level totals from the workers for grid-level demand response.
+
+    target_reduction is the reduction the grid operator asks of the whole
+    portfolio, as a fraction of baseline power (None = take all flexibility).
+    """
+
+    def __init__(self, target_reduction=None, interval_seconds=config.UPDATE_INTERVAL):
+        self.target_reduction = target_reduction
+        self.interval_seconds = interval_seconds
+        self.plants = {}
+
+    def add(self, result):
+        self.plants[result['name']] = result
+
+    def aggregate(self):
+        if not self.plants:
+            raise ValueError("No plant results to aggregate")
+        names = sorted(self.plants)
+        results = [self.plants[name] for name in names]
+        timestamps = results[0]['timestamp']
+        if any(len(result['timestamp']) != len(timestamps) for result in results):
+            raise ValueError("Plants were simulated over different horizons")
+
+        baseline = np.vstack([result['baseline_power'] for result in results])
+        optimized = np.vstack([result['optimized_power'] for result in results])
+        price = np.vstack([result['price'] for result in results])
+        flexibility = np.maximum(baseline - optimized, 0.0)
+
+        target = flexibility.sum(axis=0) if self.target_reduction is None else self.target_reduction * baseline.sum(axis=0)
+        dispatch = dispatch_reduction(flexibility, target)
+        hours = self.interval_seconds / 3600
+        return {
+            'plants': names,
+            'timestamp': timestamps,
+            'baseline_power': baseline.sum(axis=0),
+            'flexibility': flexibility.sum(axis=0),
+            'target_reduction': target,
+            'dispatched_reduction': dispatch.sum(axis=0),
+            'shortfall': np.maximum(target - dispatch.sum(axis=0), 0.0),
+            'plant_dispatch': dispatch,
+            'baseline_energy_kwh': float(baseline.sum() * hours),
+            'dispatched_energy_kwh': float(dispatch.sum() * hours),
+            'cost_savings': float((dispatch * price).sum() * hours),
+            'undelivered_messages': sum(result['undelivered'] for result in results)
+        }
+
+def run_portfolio(plants, start_time, end_time, workers=None, broker=None, port=config.MQTT_PORT,
+                  qos=config.MQTT_QOS, solver=config.DR_SOLVER, speed=None, target_reduction=None,
+                  interval_seconds=config.UPDATE_INTERVAL):
+    """Shard plants over a process pool and aggregate their totals.
+
+    Each worker process owns one solver and one MQTT connection (broker=None
+    skips publishing) and builds a generator per plant it is handed, so a
+    large portfolio spreads over every core.
+    """
+    workers = workers or os.cpu_count()
+    coordinator = PortfolioCoordinator(target_reduction, interval_seconds)
+    started = time.monotonic()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(broker, port, qos, solver)) as executor:
+        futures = {
+            executor.submit(run_plant, plant, start_time, end_time, interval_seconds,
+                            config.SIMULATION_CHUNK_TICKS, speed): plant.name
+            for plant in plants
+        }
+        for future in as_completed(futures):
+            result = future.result()
+            coordinator.add(result)
+            logger.info(f"Plant {result['name']} finished in {result['seconds']:.1f} s (worker {result['pid']}), "
+                        f"{len(coordinator.plants)}/{len(plants)} done")
+    portfolio = coordinator.aggregate()
+    portfolio['wall_seconds'] = time.monotonic() - started
+    return portfolio
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-plant portfolio simulation")
+    parser.add_argument('--plants', default=config.PLANTS_FILE, help="JSON file with a list of plant configs")
+    parser.add_argument('--synthetic', type=int, default=0, help="simulate N synthetic plants instead")
+    parser.add_argument('--workers', type=int, default=config.PORTFOLIO_WORKERS,
+                        help="worker processes (default: one per core)")
+    parser.add_argument('--duration', type=float, default=config.SIMULATION_DURATION,
+                        help="simulated duration in minutes")
+    parser.add_argument('--start', help="virtual start time (ISO format, default: now)")
+    parser.add_argument('--speed', type=float, default=config.SIMULATION_SPEED,
+                        help="virtual seconds per wall second (default: as fast as possible)")
+    parser.add_argument('--target', type=float, default=config.PORTFOLIO_TARGET_REDUCTION,
+                        help="portfolio reduction target as a fraction of baseline power")
+    parser.add_argument('--no-mqtt', action='store_true', help="skip publishing device data")
+    parser.add_argument('--provision', action='store_true',
+                        help="provision each plant's service group and devices in the IoT Agent first")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_args(argv)
+    if args.plants:
+        plants = load_plants(args.plants)
+    elif args.synthetic:
+        plants = synthetic_plants(args.synthetic)
+    else:
+        raise SystemExit("Give --plants FILE or --synthetic N")
+    if args.provision and not provision_plants(plants):
+        raise SystemExit("IoT Agent provisioning failed")
+    start_time = datetime.fromisoformat(args.start) if args.start else datetime.now().replace(microsecond=0)
+    end_time = start_time + timedelta(minutes=args.duration)
+
+    portfolio = run_portfolio(plants, start_time, end_time, args.workers,
+                              broker=None if args.no_mqtt else config.MQTT_BROKER,
+                              speed=args.speed, target_reduction=args.target)
+    logger.info(f"Simulated {len(plants)} plants x {len(portfolio['timestamp'])} ticks in "
+                f"{portfolio['wall_seconds']:.1f} s: baseline {portfolio['baseline_energy_kwh']:.0f} kWh, "
+                f"dispatched {portfolio['dispatched_energy_kwh']:.0f} kWh, savings {portfolio['cost_savings']:.2f}, "
+                f"peak shortfall {portfolio['shortfall'].max():.1f} kW")
+    return portfolio
+
+if __name__ == "__main__":
+    main()
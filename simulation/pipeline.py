@@ -0,0 +1,183 @@
+# wastewater_dr_twin/simulation/pipeline.py
+import asyncio
+import logging
+import time
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ('block', 'drop_oldest', 'drop_newest', 'coalesce')
+
+_END = object()  # end-of-stream marker, never dropped by a policy
+
+QUEUE_DEPTH = metrics.gauge('pipeline_queue_depth', "Items waiting in a pipeline queue", ['queue'])
+QUEUE_DROPPED = metrics.counter('pipeline_dropped_total', "Items dropped or coalesced by a queue policy", ['queue'])
+STAGE_SECONDS = metrics.histogram('pipeline_stage_seconds', "Pipeline stage run time", ['stage'])
+STAGE_ERRORS = metrics.counter('pipeline_stage_errors_total', "Pipeline stage failures", ['stage'])
+
+class StageQueue:
+    """Bounded asyncio queue between two pipeline stages.
+
+    Overflow policies:
+      block       - producer waits (backpressure)
+      drop_oldest - discard the oldest queued item to make room
+      drop_newest - discard the incoming item
+      coalesce    - replace everything queued with the incoming item
+    """
+
+    def __init__(self, name, maxsize, policy='block'):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue policy '{policy}', expected one of {POLICIES}")
+        self.name = name
+        self.policy = policy
+        self._queue = asyncio.Queue(maxsize)
+        self.enqueued = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    async def put(self, item):
+        dropped = self.dropped
+        await self._put(item)
+        if self.dropped != dropped:
+            QUEUE_DROPPED.inc(self.dropped - dropped, queue=self.name)
+        QUEUE_DEPTH.set(self.depth, queue=self.name)
+
+    async def _put(self, item):
+        if self.policy == 'block':
+            await self._queue.put(item)
+        elif self.policy == 'coalesce':
+            while not self._queue.empty():
+                self._queue.get_nowait()
+                self.dropped += 1
+            self._queue.put_nowait(item)
+        elif self._queue.full():
+            if self.policy == 'drop_newest':
+                self.dropped += 1
+                return
+            self._queue.get_nowait()
+            self.dropped += 1
+            self._queue.put_nowait(item)
+        else:
+            self._queue.put_nowait(item)
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, self.depth)
+
+    async def close(self):
+        await self._queue.put(_END)
+
+    async def get(self):
+        item = await self._queue.get()
+        QUEUE_DEPTH.set(self.depth, queue=self.name)
+        return item
+
+    def stats(self):
+        return {
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'enqueued': self.enqueued,
+            'dropped': self.dropped,
+            'policy': self.policy
+        }
+
+class Pipeline:
+    """Runs source -> process -> sinks as concurrent stages joined by StageQueues.
+
+    source is an async iterator of ticks. process and every sink are blocking
+    callables executed on worker threads, so a slow sink only fills (and,
+    depending on its policy, drops from) its own queue instead of stalling
+    the processing cadence. sinks maps a name to (callable, policy).
+    """
+
+    def __init__(self, source, process, sinks, queue_size=16, source_policy='block', monitor_interval=None):
+        self.source = source
+        self.process = process
+        self.sinks = sinks
+        self.queue_size = queue_size
+        self.source_policy = source_policy
+        self.monitor_interval = monitor_interval
+        self.queues = {}
+        self.completed = {}
+        self.errors = {}
+        self.busy_seconds = {}
+
+    async def _run_stage(self, name, func, item):
+        started = time.perf_counter()
+        try:
+            return await asyncio.to_thread(func, item)
+        except Exception:
+            self.errors[name] += 1
+            STAGE_ERRORS.inc(stage=name)
+            logger.exception(f"Pipeline stage '{name}' failed")
+            return None
+        finally:
+            elapsed = time.perf_counter() - started
+            self.completed[name] += 1
+            self.busy_seconds[name] += elapsed
+            STAGE_SECONDS.observe(elapsed, stage=name)
+
+    async def _produce(self):
+        queue = self.queues['process']
+        async for item in self.source:
+            await queue.put(item)
+        await queue.close()
+
+    async def _process(self):
+        queue = self.queues['process']
+        sink_queues = [self.queues[name] for name in self.sinks]
+        while True:
+            item = await queue.get()
+            if item is _END:
+                break
+            result = await self._run_stage('process', self.process, item)
+            if result is None:
+                continue
+            for sink_queue in sink_queues:
+                await sink_queue.put(result)
+        for sink_queue in sink_queues:
+            await sink_queue.close()
+
+    async def _consume(self, name, func):
+        queue = self.queues[name]
+        while True:
+            item = await queue.get()
+            if item is _END:
+                break
+            await self._run_stage(name, func, item)
+
+    async def _monitor(self):
+        while True:
+            await asyncio.sleep(self.monitor_interval)
+            logger.info(f"Pipeline stats: {self.stats()}")
+
+    async def run(self):
+        self.queues = {'process': StageQueue('process', self.queue_size, self.source_policy)}
+        for name, (_, policy) in self.sinks.items():
+            self.queues[name] = StageQueue(name, self.queue_size, policy)
+        for name in ['process', *self.sinks]:
+            self.completed[name] = 0
+            self.errors[name] = 0
+            self.busy_seconds[name] = 0.0
+
+        monitor = asyncio.create_task(self._monitor()) if self.monitor_interval else None
+        try:
+            await asyncio.gather(
+                self._produce(),
+                self._process(),
+                *(self._consume(name, func) for name, (func, _) in self.sinks.items())
+            )
+        finally:
+            if monitor is not None:
+                monitor.cancel()
+        return self.stats()
+
+    def stats(self):
+        return {
+            name: dict(queue.stats(), completed=self.completed[name], errors=self.errors[name],
+                       busy_seconds=round(self.busy_seconds[name], 3))
+            for name, queue in self.queues.items()
+        }
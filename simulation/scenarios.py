@@ -0,0 +1,201 @@
+# wastewater_dr_twin/simulation/scenarios.py
+import argparse
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import config
+from data_generators.fleet import load_fleet
+from data_generators.noise import scaled_noise
+from data_generators.pump_data import sample_pump_data
+from data_generators.aeration_data import sample_aeration_data
+from data_generators.grid_data import sample_grid_data
+from demand_response.algorithm import DemandResponseAlgorithm
+from demand_response.process_model import ProcessModel
+
+logger = logging.getLogger(__name__)
+
+# Per-scenario spread of equipment base power and efficiency around the fleet definition
+EQUIPMENT_NOISE = 0.1
+# DemandResponseAlgorithm attributes a strategy may set. Strategies are solved with a process model, so
+# max_power_reduction bounds every device and do_lower_limit holds basins up to the DO band. The solver
+# only ever lowers power, so do_upper_limit never binds; it only sets the band violations are counted against.
+DECISION_PARAMETERS = ('max_power_reduction', 'do_lower_limit')
+STRATEGY_PARAMETERS = DECISION_PARAMETERS + ('do_upper_limit',)
+METRICS = ('kwh_saved', 'cost_saved', 'do_violations', 'baseline_do_violations', 'efficiency_violations')
+PERCENTILES = (5, 25, 50, 75, 95)
+
+class ScenarioSampler:
+    """Draws whole scenarios (equipment, device series, grid demand and price) as arrays.
+
+    Uses the generators' own noise models with a leading scenario axis:
+    device arrays are (n_scenarios, n_devices, n_steps), grid arrays
+    (n_scenarios, n_steps).
+    """
+
+    def __init__(self, fleet, start_time=None, horizon_hours=24, freq='15min',
+                 equipment_noise=EQUIPMENT_NOISE, dtype=np.float32):
+        self.fleet = fleet
+        start_time = pd.Timestamp(start_time) if start_time is not None else pd.Timestamp.now().normalize()
+        self.timestamps = pd.date_range(start_time, periods=int(pd.Timedelta(hours=horizon_hours) / pd.Timedelta(freq)), freq=freq)
+        self.interval_hours = pd.Timedelta(freq) / pd.Timedelta(hours=1)
+        self.equipment_noise = equipment_noise
+        self.dtype = dtype
+
+    def sample(self, n_scenarios, rng):
+        fleet = self.fleet
+        n_steps = len(self.timestamps)
+        # Equipment varies per scenario, then the usual per-interval noise on top
+        pump_base = scaled_noise(rng, fleet.pump_base_power, self.equipment_noise, (n_scenarios, fleet.num_pumps), self.dtype)
+        pump_efficiency = scaled_noise(rng, fleet.pump_efficiency, self.equipment_noise / 2, (n_scenarios, fleet.num_pumps), self.dtype)
+        basin_base = scaled_noise(rng, fleet.basin_base_power, self.equipment_noise, (n_scenarios, fleet.num_basins), self.dtype)
+
+        pump_power, pump_running, pump_efficiency = sample_pump_data(
+            pump_base[..., None], pump_efficiency[..., None], (n_scenarios, fleet.num_pumps, n_steps), rng, self.dtype)
+        basin_power, basin_do = sample_aeration_data(
+            basin_base[..., None], fleet.basin_base_do[None, :, None], (n_scenarios, fleet.num_basins, n_steps), rng, self.dtype)
+        grid_demand, grid_price = sample_grid_data(
+            fleet.grid_base_demand, fleet.grid_base_price, self.timestamps.hour.values,
+            (n_scenarios, n_steps), rng, self.dtype)
+        return {
+            'pump_power': pump_power,
+            'pump_running': pump_running,
+            'pump_efficiency': pump_efficiency,
+            'basin_power': basin_power,
+            'basin_dissolved_oxygen': basin_do,
+            'grid_demand': grid_demand,
+            'grid_price': grid_price
+        }
+
+def strategy_algorithm(strategy):
+    # Always with the process model: without it the DO band does not bound the solve
+    dr_algorithm = DemandResponseAlgorithm.from_config('vectorized', process_model=ProcessModel())
+    for name, value in strategy.items():
+        if name not in STRATEGY_PARAMETERS:
+            raise ValueError(f"Unknown strategy parameter '{name}', expected one of {STRATEGY_PARAMETERS}")
+        setattr(dr_algorithm, name, value)
+    return dr_algorithm
+
+def evaluate_strategy(scenarios, strategy, interval_hours):
+    """Per-scenario outcomes of one strategy, every scenario solved in a single batched call.
+
+    Energy only counts running pumps. DO violations are basin-intervals
+    outside the strategy's DO band after DR (baseline_do_violations: before);
+    efficiency violations are running pump-intervals whose optimized
+    efficiency falls below the algorithm's pump_efficiency_threshold, which
+    is reported on but does not bound the solve.
+    """
+    dr_algorithm = strategy_algorithm(strategy)
+    result = dr_algorithm.optimize_arrays(scenarios['pump_power'], scenarios['pump_efficiency'],
+                                          scenarios['basin_power'], scenarios['basin_dissolved_oxygen'])
+    running = scenarios['pump_running']
+
+    # (n_scenarios, n_steps) power saved, then energy and cost per scenario
+    saved = ((scenarios['pump_power'] - result['pump_power']) * running).sum(axis=1) + \
+        (scenarios['basin_power'] - result['basin_power']).sum(axis=1)
+    baseline_do = scenarios['basin_dissolved_oxygen']
+    new_do = result['basin_dissolved_oxygen']
+    low, high = dr_algorithm.do_lower_limit, dr_algorithm.do_upper_limit
+    return {
+        'kwh_saved': saved.sum(axis=1) * interval_hours,
+        'cost_saved': (saved * scenarios['grid_price']).sum(axis=1) * interval_hours,
+        'do_violations': ((new_do < low) | (new_do > high)).sum(axis=(1, 2)),
+        'baseline_do_violations': ((baseline_do < low) | (baseline_do > high)).sum(axis=(1, 2)),
+        'efficiency_violations': ((result['pump_efficiency'] < dr_algorithm.pump_efficiency_threshold) & running).sum(axis=(1, 2))
+    }
+
+def summarize(values):
+    values = np.asarray(values, dtype=np.float64)
+    summary = {'mean': float(values.mean()), 'std': float(values.std()),
+               'min': float(values.min()), 'max': float(values.max())}
+    for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        summary[f"p{percentile}"] = float(value)
+    return summary
+
+def _evaluate_chunk(fleet, strategies, n_scenarios, seed_sequence, start_time, horizon_hours, freq):
+    # Runs in a worker: sample once, evaluate every strategy on the same scenarios
+    sampler = ScenarioSampler(fleet, start_time, horizon_hours, freq)
+    scenarios = sampler.sample(n_scenarios, np.random.default_rng(seed_sequence))
+    return {name: evaluate_strategy(scenarios, strategy, sampler.interval_hours) for name, strategy in strategies.items()}
+
+def run_scenarios(fleet, strategies, n_scenarios=config.SCENARIO_COUNT, seed=config.RANDOM_SEED,
+                  chunk_size=config.SCENARIO_CHUNK_SIZE, workers=1, start_time=None,
+                  horizon_hours=config.SCENARIO_HORIZON_HOURS, freq=config.SCENARIO_FREQ):
+    """Evaluate named strategies ({name: {parameter: value}}) on n_scenarios shared random scenarios.
+
+    Scenarios are drawn chunk_size at a time from independent seed streams,
+    so results do not depend on the number of workers. Returns per-strategy
+    distributions of every metric in METRICS, the strategy's 'parameters' and
+    its 'decision_parameters': the values, defaults included, of the
+    DECISION_PARAMETERS that set the setpoints.
+    """
+    for strategy in strategies.values():
+        strategy_algorithm(strategy)  # fail fast on bad parameters
+    chunks = [min(chunk_size, n_scenarios - start) for start in range(0, n_scenarios, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    args = [(fleet, strategies, size, chunk_seed, start_time, horizon_hours, freq) for size, chunk_seed in zip(chunks, seeds)]
+
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_evaluate_chunk, *zip(*args)))
+    else:
+        results = [_evaluate_chunk(*chunk_args) for chunk_args in args]
+
+    report = {}
+    for name in strategies:
+        report[name] = {
+            metric: summarize(np.concatenate([result[name][metric] for result in results]))
+            for metric in METRICS
+        }
+        report[name]['parameters'] = dict(strategies[name])
+        dr_algorithm = strategy_algorithm(strategies[name])
+        report[name]['decision_parameters'] = {parameter: getattr(dr_algorithm, parameter)
+                                               for parameter in DECISION_PARAMETERS}
+    return report
+
+def parse_strategy(text):
+    # "name:max_power_reduction=0.2,do_lower_limit=1.8"
+    name, _, params = text.partition(':')
+    strategy = {}
+    for item in filter(None, params.split(',')):
+        key, _, value = item.partition('=')
+        strategy[key.strip()] = float(value)
+    return name, strategy
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo evaluation of demand response strategies")
+    parser.add_argument('--strategy', action='append', type=parse_strategy, default=[],
+                        help="name:param=value,... (repeatable); parameters from " + ', '.join(STRATEGY_PARAMETERS) +
+                             " (only " + ', '.join(DECISION_PARAMETERS) + " change the setpoints)")
+    parser.add_argument('--scenarios', type=int, default=config.SCENARIO_COUNT)
+    parser.add_argument('--chunk-size', type=int, default=config.SCENARIO_CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=1, help="worker processes (0 = one per core)")
+    parser.add_argument('--horizon', type=float, default=config.SCENARIO_HORIZON_HOURS, help="hours per scenario")
+    parser.add_argument('--freq', default=config.SCENARIO_FREQ)
+    parser.add_argument('--seed', type=int, default=config.RANDOM_SEED)
+    parser.add_argument('--fleet', help="fleet JSON file (default: FLEET_FILE or the synthetic config fleet)")
+    parser.add_argument('--output', help="write the report as JSON")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_args(argv)
+    strategies = dict(args.strategy) or {'current': {}}
+    workers = args.workers if args.workers else os.cpu_count()
+    report = run_scenarios(load_fleet(args.fleet), strategies, args.scenarios, args.seed,
+                           args.chunk_size, workers, horizon_hours=args.horizon, freq=args.freq)
+    for name, result in report.items():
+        logger.info(f"{name}: kWh saved p5/p50/p95 = {result['kwh_saved']['p5']:.0f}/{result['kwh_saved']['p50']:.0f}/"
+                    f"{result['kwh_saved']['p95']:.0f}, cost saved p50 = {result['cost_saved']['p50']:.2f}, "
+                    f"DO violations mean = {result['do_violations']['mean']:.1f} (baseline {result['baseline_do_violations']['mean']:.1f})")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+# wastewater_dr_twin/tests/conftest.py
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,69 @@
+# wastewater_dr_twin/tests/test_algorithm.py
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import config
+from demand_response.algorithm import DemandResponseAlgorithm
+from demand_response.process_model import ProcessModel
+
+def plant(seed, num_pumps=5, num_basins=3):
+    rng = np.random.default_rng(seed)
+    return (rng.uniform(20, 80, num_pumps), rng.uniform(0.6, 0.9, num_pumps),
+            rng.uniform(30, 60, num_basins), rng.uniform(1.5, 3.0, num_basins))
+
+def devices(pump_power, pump_efficiency, basin_power, basin_do):
+    pumps = [SimpleNamespace(id=f"pump{i:03d}", power=power, efficiency=efficiency)
+             for i, (power, efficiency) in enumerate(zip(pump_power, pump_efficiency), 1)]
+    basins = [SimpleNamespace(id=f"basin{i:03d}", power=power, dissolved_oxygen=do_level)
+              for i, (power, do_level) in enumerate(zip(basin_power, basin_do), 1)]
+    return pumps, basins
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('process_model', [None, ProcessModel()])
+def test_vectorized_matches_slsqp(seed, process_model):
+    pumps, basins = devices(*plant(seed))
+    slsqp = DemandResponseAlgorithm('slsqp', process_model=process_model)
+    vectorized = DemandResponseAlgorithm('vectorized', process_model=process_model)
+    slsqp_pumps, slsqp_basins = slsqp.optimize(pumps, basins, None)
+    vectorized_pumps, vectorized_basins = vectorized.optimize(pumps, basins, None)
+    for expected, actual in zip(slsqp_pumps + slsqp_basins, vectorized_pumps + vectorized_basins):
+        assert expected.keys() == actual.keys()
+        assert expected['id'] == actual['id'] and expected.get('status') == actual.get('status')
+        for key in ('power', 'efficiency', 'dissolved_oxygen'):
+            if key in expected:
+                assert actual[key] == pytest.approx(expected[key], rel=1e-6), key
+
+def test_slsqp_binds_each_devices_own_bounds():
+    # Distinct powers: every device must land on its own lower bound, not the last device's
+    pump_power = np.array([10.0, 40.0, 90.0])
+    basin_power = np.array([20.0, 70.0])
+    pumps, basins = devices(pump_power, np.full(3, 0.8), basin_power, np.full(2, 2.0))
+    optimized_pumps, optimized_basins = DemandResponseAlgorithm('slsqp').optimize(pumps, basins, None)
+    np.testing.assert_allclose([pump['power'] for pump in optimized_pumps], pump_power * 0.7, rtol=1e-6)
+    np.testing.assert_allclose([basin['power'] for basin in optimized_basins], basin_power * 0.7, rtol=1e-6)
+
+def test_optimize_arrays_matches_per_tick_solve():
+    ticks = [plant(seed) for seed in range(4)]
+    stacked = [np.stack([tick[i] for tick in ticks], axis=-1) for i in range(4)]
+    dr_algorithm = DemandResponseAlgorithm('vectorized')
+    batch = dr_algorithm.optimize_arrays(*stacked)
+    for t, tick in enumerate(ticks):
+        single = dr_algorithm.optimize_arrays(*tick)
+        for key, value in single.items():
+            np.testing.assert_array_equal(batch[key][..., t], value)
+
+def test_unknown_solver_is_rejected():
+    with pytest.raises(ValueError):
+        DemandResponseAlgorithm('simplex')
+
+def test_from_config_follows_the_dr_settings(monkeypatch):
+    monkeypatch.setattr(config, 'DR_CACHE_SIZE', 8)
+    monkeypatch.setattr(config, 'DR_PROCESS_MODEL', True)
+    dr_algorithm = DemandResponseAlgorithm.from_config()
+    assert dr_algorithm.solver == config.DR_SOLVER
+    assert dr_algorithm.cache.maxsize == 8 and isinstance(dr_algorithm.process_model, ProcessModel)
+    monkeypatch.setattr(config, 'DR_PROCESS_MODEL', False)
+    dr_algorithm = DemandResponseAlgorithm.from_config('slsqp')
+    assert dr_algorithm.solver == 'slsqp' and dr_algorithm.process_model is None
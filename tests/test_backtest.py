@@ -0,0 +1,66 @@
+# wastewater_dr_twin/tests/test_backtest.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from demand_response.algorithm import DemandResponseAlgorithm
+from simulation.backtest import BacktestEngine
+
+PUMP_IDS = ['pump001', 'pump002', 'pump003']
+BASIN_IDS = ['basin001', 'basin002']
+
+def write_telemetry(directory, ticks=40, seed=3):
+    rng = np.random.default_rng(seed)
+    # Irregular spacing, and not every device reports at every timestamp
+    times = pd.Timestamp('2024-01-01') + pd.to_timedelta(np.cumsum(rng.integers(1, 10, ticks)), unit='min')
+    pumps = pd.DataFrame([
+        {'timestamp': t, 'pump_id': pump_id, 'power': rng.uniform(20, 80),
+         'status': 'running' if rng.random() > 0.1 else 'stopped', 'efficiency': rng.uniform(0.6, 0.9)}
+        for t in times for pump_id in PUMP_IDS if rng.random() > 0.2
+    ])
+    basins = pd.DataFrame([
+        {'timestamp': t, 'basin_id': basin_id, 'power': rng.uniform(30, 60), 'dissolved_oxygen': rng.uniform(1.5, 3.0)}
+        for t in times for basin_id in BASIN_IDS if rng.random() > 0.2
+    ])
+    grid = pd.DataFrame({'timestamp': times[::2], 'demand': rng.uniform(800, 1200, len(times[::2])),
+                         'price': rng.uniform(0.05, 0.3, len(times[::2]))})
+    paths = [directory / f"{name}.csv" for name in ('pumps', 'basins', 'grid')]
+    for frame, path in zip((pumps, basins, grid), paths):
+        frame.to_csv(path, index=False)
+    return paths
+
+def run(paths, output_dir, chunk_rows, freq=None):
+    engine = BacktestEngine(PUMP_IDS, BASIN_IDS, DemandResponseAlgorithm(solver='vectorized'), freq)
+    summary = engine.run(*paths, output_dir, chunk_rows=chunk_rows)
+    setpoints = [pd.read_csv(output_dir / f"{name}_setpoints.csv") for name in ('pump', 'basin')]
+    for frame in setpoints:
+        # Chunks whose timestamps all fall on midnight are written without a time of day
+        frame['timestamp'] = pd.to_datetime(frame['timestamp'], format='ISO8601')
+    return summary, setpoints
+
+@pytest.mark.parametrize('freq', [None, '15min'])
+def test_results_do_not_depend_on_chunk_rows(tmp_path, freq):
+    paths = write_telemetry(tmp_path)
+    expected, expected_setpoints = run(paths, tmp_path / 'whole', 100000, freq)
+    for chunk_rows in (1, 7, 33):
+        summary, setpoints = run(paths, tmp_path / f"chunks{chunk_rows}", chunk_rows, freq)
+        assert summary['intervals'] == expected['intervals']
+        for key in ('baseline_kwh', 'optimized_kwh', 'baseline_cost', 'optimized_cost'):
+            assert summary[key] == pytest.approx(expected[key], rel=1e-12)
+        for frame, expected_frame in zip(setpoints, expected_setpoints):
+            pd.testing.assert_frame_equal(frame, expected_frame)
+
+def test_readings_hold_until_the_next_timestamp(tmp_path):
+    times = pd.to_datetime(['2024-01-01 00:00', '2024-01-01 01:00', '2024-01-01 03:00'])
+    paths = [tmp_path / f"{name}.csv" for name in ('pumps', 'basins', 'grid')]
+    pd.DataFrame({'timestamp': times, 'pump_id': 'pump001', 'power': [10.0, 20.0, 40.0],
+                  'status': 'running', 'efficiency': 0.8}).to_csv(paths[0], index=False)
+    pd.DataFrame(columns=['timestamp', 'basin_id', 'power', 'dissolved_oxygen']).to_csv(paths[1], index=False)
+    pd.DataFrame({'timestamp': times, 'demand': 1000.0, 'price': 1.0}).to_csv(paths[2], index=False)
+
+    engine = BacktestEngine(['pump001'], [], DemandResponseAlgorithm(solver='vectorized'))
+    summary = engine.run(*paths, tmp_path / 'out', chunk_rows=1)
+    # 10 kW for 1 h, then 20 kW for 2 h; the last reading has no successor yet
+    assert summary['intervals'] == 3
+    assert summary['baseline_kwh'] == pytest.approx(50.0)
+    assert summary['baseline_cost'] == pytest.approx(50.0)
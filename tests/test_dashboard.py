@@ -0,0 +1,146 @@
+# wastewater_dr_twin/tests/test_dashboard.py
+import importlib
+
+import numpy as np
+import pytest
+
+from wastewater_dashboard.history_store import HistoryStore
+from wastewater_dashboard.ring_buffer import RingBuffer
+
+PUMPS = ['pump001', 'pump002']
+BASINS = ['basin001']
+TIMESTAMPS = ['2024-01-01T00:00:00', '2024-01-01T00:01:00', '2024-01-01T00:02:00']
+
+def fresh_stores(dashboard, monkeypatch, history_dir):
+    # The module keeps its stores as globals
+    for name in ('pump_data', 'aeration_data', 'grid_data'):
+        monkeypatch.setattr(dashboard, name, RingBuffer(getattr(dashboard, name).fields, dashboard.HISTORY_CAPACITY))
+    monkeypatch.setattr(dashboard, 'history_stores', {
+        entity: HistoryStore(history_dir, entity, store.fields) for entity, store in dashboard.history_stores.items()
+    })
+
+@pytest.fixture
+def dashboard(tmp_path, monkeypatch):
+    monkeypatch.setenv('HISTORY_DIR', str(tmp_path / 'import'))
+    dashboard = importlib.import_module('wastewater_dashboard.app')
+    fresh_stores(dashboard, monkeypatch, str(tmp_path / 'history'))
+    monkeypatch.setattr(dashboard, 'update_seq', 0)
+    monkeypatch.setattr(dashboard, 'subscriptions', {})
+    return dashboard
+
+def batch():
+    n = len(TIMESTAMPS)
+    return {
+        'timestamps': TIMESTAMPS,
+        'pumps': {'ids': PUMPS, 'power': [[10.0 + i, 20.0 + i] for i in range(n)],
+                  'efficiency': [[0.8, None] for _ in range(n)]},
+        'aeration_basins': {'ids': BASINS, 'dissolved_oxygen': [[2.0 + 0.1 * i] for i in range(n)]},
+        'grid': {'price': [0.1 * (i + 1) for i in range(n)]}
+    }
+
+def test_ingest_applies_the_whole_batch(dashboard):
+    response = dashboard.app.test_client().post('/ingest', json=batch())
+    assert response.status_code == 200
+    assert response.get_json()['snapshots'] == 3
+    assert dashboard.update_seq == 1  # one delta for the batch
+
+    view = dashboard.pump_data.window()
+    assert dashboard.pump_data.device_ids == PUMPS
+    np.testing.assert_array_equal(view['timestamp'], np.array(TIMESTAMPS, dtype='datetime64[ns]'))
+    np.testing.assert_array_equal(view['power'], [[10.0, 20.0], [11.0, 21.0], [12.0, 22.0]])
+    assert np.isnan(view['efficiency'][:, 1]).all()  # null = missed reading
+    np.testing.assert_allclose(dashboard.grid_data.window()['price'][:, 0], [0.1, 0.2, 0.3])
+
+    history = dashboard.history_stores['pumps'].query(np.datetime64(TIMESTAMPS[0]), np.datetime64('2024-01-01T00:03'), 60)
+    assert [entry['id'] for entry in history['series']] == PUMPS
+
+@pytest.mark.parametrize('payload', [
+    {'pumps': {}},
+    dict(batch(), timestamps=TIMESTAMPS[::-1]),
+    dict(batch(), pumps={'ids': PUMPS, 'power': [1.0, 2.0]}),
+])
+def test_ingest_rejects_malformed_batches(dashboard, payload):
+    response = dashboard.app.test_client().post('/ingest', json=payload)
+    assert response.status_code == 400
+    assert len(dashboard.pump_data) == 0
+
+def deltas(client):
+    return [message['args'][0] for message in client.get_received() if message['name'] == 'data_delta']
+
+def test_older_batches_are_rejected(dashboard):
+    client = dashboard.app.test_client()
+    assert client.post('/ingest', json=batch()).status_code == 200
+    older = dict(batch(), timestamps=['2023-12-31T23:58:00', '2023-12-31T23:59:00', '2024-01-01T00:00:00'])
+    response = client.post('/ingest', json=older)
+    assert response.status_code == 400
+    assert 'before the newest' in response.get_json()['error']
+    assert dashboard.pump_data.total_rows == 3 and dashboard.update_seq == 1
+    # Continuing from the newest snapshot is fine
+    newer = dict(batch(), timestamps=['2024-01-01T00:02:00', '2024-01-01T00:03:00', '2024-01-01T00:04:00'])
+    assert client.post('/ingest', json=newer).status_code == 200
+
+def test_ingest_matches_per_snapshot_updates(dashboard, tmp_path, monkeypatch):
+    # 36 hours every 20 minutes: many rollup buckets over three day partitions
+    timestamps = np.datetime64('2024-01-01T18:00') + np.arange(108) * np.timedelta64(20, 'm')
+    rng = np.random.default_rng(5)
+    pump_power = rng.uniform(10, 50, (len(timestamps), len(PUMPS)))
+    do_level = rng.uniform(1.0, 3.0, (len(timestamps), len(BASINS)))
+    price = rng.uniform(0.05, 0.3, len(timestamps))
+    client = dashboard.app.test_client()
+    response = client.post('/ingest', json={
+        'timestamps': [str(timestamp) for timestamp in timestamps],
+        'pumps': {'ids': PUMPS, 'power': pump_power.tolist()},
+        'aeration_basins': {'ids': BASINS, 'dissolved_oxygen': do_level.tolist()},
+        'grid': {'price': price.tolist()}
+    })
+    assert response.status_code == 200
+    bulk = (dashboard.pump_data, dashboard.aeration_data, dashboard.grid_data, dashboard.history_stores)
+
+    fresh_stores(dashboard, monkeypatch, str(tmp_path / 'per_snapshot'))
+    for i, timestamp in enumerate(timestamps):
+        assert client.post('/update_data', json={
+            'timestamp': str(timestamp),
+            'pumps': [{'id': pump_id, 'power': power} for pump_id, power in zip(PUMPS, pump_power[i].tolist())],
+            'aeration_basins': [{'id': BASINS[0], 'dissolved_oxygen': do_level[i, 0]}],
+            'grid': {'price': price[i]}
+        }).status_code == 200
+    single = (dashboard.pump_data, dashboard.aeration_data, dashboard.grid_data, dashboard.history_stores)
+
+    for bulk_buffer, single_buffer in zip(bulk[:3], single[:3]):
+        assert bulk_buffer.total_rows == single_buffer.total_rows and bulk_buffer.device_ids == single_buffer.device_ids
+        for key, value in single_buffer.window().items():
+            np.testing.assert_array_equal(bulk_buffer.window()[key], value, err_msg=key)
+    end = timestamps[-1] + np.timedelta64(1, 'm')
+    for entity in ('pumps', 'aeration_basins', 'grid'):
+        for resolution in (1, 60, 900, 3600, 86400):
+            assert bulk[3][entity].query(timestamps[0], end, resolution) == \
+                single[3][entity].query(timestamps[0], end, resolution)
+
+def test_deltas_only_carry_each_clients_view(dashboard):
+    connect = lambda auth: dashboard.socketio.test_client(dashboard.app, auth=auth)
+    pump_view = connect({'entities': 'pumps', 'devices': 'pump001'})
+    same_view = connect({'entities': ['pumps'], 'devices': ['pump001'], 'window': 60})
+    grid_view = connect({'entities': 'grid'})
+    for client in (pump_view, same_view, grid_view):
+        assert [message['name'] for message in client.get_received()] == ['initial_data']
+    # Same entities and devices share a room, whatever the window
+    rooms = {sid: subscription['room'] for sid, subscription in dashboard.subscriptions.items()}
+    assert len(set(rooms.values())) == 2
+
+    assert dashboard.app.test_client().post('/ingest', json=batch()).status_code == 200
+    [pump_delta] = deltas(pump_view)
+    assert [record['pump_id'] for record in pump_delta['pump_data']] == ['pump001'] * 3
+    assert pump_delta['aeration_data'] == [] and pump_delta['grid_data'] == []
+    assert deltas(same_view) == [pump_delta]
+    [grid_delta] = deltas(grid_view)
+    assert grid_delta['pump_data'] == [] and len(grid_delta['grid_data']) == 3
+    for client in (pump_view, same_view, grid_view):
+        client.disconnect()
+    assert dashboard.subscriptions == {}
+
+def test_unknown_entities_get_a_subscription_error(dashboard):
+    client = dashboard.socketio.test_client(dashboard.app, auth={'entities': 'pumps,valves'})
+    [message] = client.get_received()
+    assert message['name'] == 'subscription_error'
+    assert dashboard.subscriptions == {}
+    client.disconnect()
@@ -0,0 +1,51 @@
+# wastewater_dr_twin/tests/test_downsampling.py
+import numpy as np
+import pytest
+
+from wastewater_dashboard.downsampling import lttb_indices, minmax_indices, select_rows
+
+def series(n=1000, traces=3, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.arange(n, dtype=np.float64), rng.normal(size=(traces, n)).cumsum(axis=1)
+
+def test_lttb_keeps_budget_and_end_points():
+    x, y = series()
+    indices = lttb_indices(x, y, 100)
+    assert indices.shape == (3, 100)
+    assert (indices[:, 0] == 0).all() and (indices[:, -1] == 999).all()
+    assert (np.diff(indices, axis=1) > 0).all()
+
+def test_lttb_returns_everything_under_budget():
+    x, y = series(n=50)
+    assert lttb_indices(x, y, 100).shape == (3, 50)
+
+def test_lttb_skips_missing_values():
+    # Every bucket keeps some readings, so none may select a missing one
+    x, y = series()
+    y[:, 1:-1:2] = np.nan
+    indices = lttb_indices(x, y, 100)
+    assert not np.isnan(np.take_along_axis(y, indices[:, 1:-1], axis=1)).any()
+
+def test_minmax_keeps_bucket_extremes():
+    _, y = series(n=1000, traces=1)
+    indices = minmax_indices(y, 100)
+    assert indices.shape[1] <= 100
+    assert y[0].argmax() in indices[0] and y[0].argmin() in indices[0]
+
+@pytest.mark.parametrize('method', ['lttb', 'minmax'])
+@pytest.mark.parametrize('max_points', [4, 5, 37, 400])
+def test_select_rows_never_exceeds_budget(method, max_points):
+    timestamps = np.datetime64('2024-01-01') + np.arange(1000) * np.timedelta64(1, 's')
+    _, y = series(n=1000, traces=4)
+    view = {'timestamp': timestamps, 'power': y.T, 'optimized_power': y.T * 0.9}
+    rows = select_rows(timestamps, view, ['power', 'optimized_power'], max_points, method)
+    assert len(rows) == 4
+    assert all(len(device_rows) <= max_points for device_rows in rows)
+
+def test_select_rows_rejects_budget_below_two_points_per_field():
+    timestamps = np.datetime64('2024-01-01') + np.arange(100) * np.timedelta64(1, 's')
+    view = {'timestamp': timestamps, 'power': np.zeros((100, 1)), 'optimized_power': np.zeros((100, 1))}
+    with pytest.raises(ValueError):
+        select_rows(timestamps, view, ['power', 'optimized_power'], 3)
+    with pytest.raises(ValueError):
+        select_rows(timestamps, view, ['power'], 10, method='average')
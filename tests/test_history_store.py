@@ -0,0 +1,124 @@
+# wastewater_dr_twin/tests/test_history_store.py
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from wastewater_dashboard.history_store import HistoryStore
+
+DEVICES = ['pump001', 'pump002']
+# Three hours across midnight, so rollups span two day partitions
+TIMESTAMPS = pd.date_range('2024-01-01 22:30', periods=180, freq='1min').values
+
+def readings(seed=0):
+    rng = np.random.default_rng(seed)
+    power = rng.uniform(10, 50, (len(TIMESTAMPS), len(DEVICES)))
+    power[::17, 1] = np.nan  # missed readings
+    return power
+
+def fill(store, power, rows=slice(None)):
+    for timestamp, row in zip(TIMESTAMPS[rows], power[rows]):
+        store.append(timestamp, DEVICES, {'power': row})
+
+def expected(power, resolution):
+    frame = pd.DataFrame(power, index=pd.DatetimeIndex(TIMESTAMPS), columns=DEVICES)
+    grouped = frame.resample(f"{resolution}s", origin='epoch')
+    # The store only returns buckets that received rows
+    occupied = grouped.size() > 0
+    return {'min': grouped.min()[occupied], 'max': grouped.max()[occupied], 'mean': grouped.mean()[occupied]}
+
+def series(result, device_id):
+    return next(entry for entry in result['series'] if entry['id'] == device_id)
+
+@pytest.mark.parametrize('resolution, source', [(3600, 'r3600'), (1800, 'r900'), (120, 'r60'), (45, 'raw')])
+def test_rollup_queries_match_the_raw_series(tmp_path, resolution, source):
+    power = readings()
+    store = HistoryStore(str(tmp_path), 'pumps', ['power'])
+    fill(store, power)
+    result = store.query(TIMESTAMPS[0], TIMESTAMPS[-1] + np.timedelta64(1, 'm'), resolution)
+    assert result['source'] == source
+
+    reference = expected(power, resolution)
+    for device_id in DEVICES:
+        entry = series(result, device_id)
+        assert len(entry['timestamp']) == len(reference['mean'])
+        for stat, frame in reference.items():
+            # None marks buckets where the device only had missed readings
+            values = np.asarray(entry['power'][stat], dtype=np.float64)
+            np.testing.assert_allclose(values, frame[device_id].to_numpy(), rtol=1e-6, err_msg=stat)
+    store.close()
+
+@pytest.mark.parametrize('block', [50, len(TIMESTAMPS)])
+def test_append_many_matches_append(tmp_path, block):
+    power = readings(1)
+    single = HistoryStore(str(tmp_path / 'single'), 'pumps', ['power'])
+    fill(single, power)
+    bulk = HistoryStore(str(tmp_path / 'bulk'), 'pumps', ['power'])
+    for lo in range(0, len(TIMESTAMPS), block):
+        bulk.append_many(TIMESTAMPS[lo:lo + block], DEVICES, {'power': power[lo:lo + block]})
+
+    end = TIMESTAMPS[-1] + np.timedelta64(1, 'm')
+    for resolution in (1, 60, 900, 3600, 86400):
+        assert bulk.query(TIMESTAMPS[0], end, resolution) == single.query(TIMESTAMPS[0], end, resolution)
+    single.close()
+    bulk.close()
+
+def test_reopened_store_recovers_open_buckets(tmp_path):
+    power = readings(2)
+    reference_store = HistoryStore(str(tmp_path / 'reference'), 'pumps', ['power'])
+    fill(reference_store, power)
+
+    store = HistoryStore(str(tmp_path / 'restarted'), 'pumps', ['power'])
+    # Stop in the middle of an hour bucket, then continue from a fresh process
+    fill(store, power, slice(0, 100))
+    store.close()
+    store = HistoryStore(str(tmp_path / 'restarted'), 'pumps', ['power'])
+    assert store.device_ids == DEVICES
+    fill(store, power, slice(100, None))
+
+    end = TIMESTAMPS[-1] + np.timedelta64(1, 'm')
+    for resolution in (60, 900, 3600, 86400):
+        assert store.query(TIMESTAMPS[0], end, resolution) == reference_store.query(TIMESTAMPS[0], end, resolution)
+    store.close()
+    reference_store.close()
+
+def test_ragged_columns_only_expose_complete_rows(tmp_path):
+    store = HistoryStore(str(tmp_path), 'pumps', ['power'])
+    fill(store, readings(), slice(0, 10))
+    store.close()
+    column = os.path.join(str(tmp_path), 'pumps', '2024-01-01', 'raw', 'power.bin')
+    with open(column, 'r+b') as f:
+        f.truncate(os.path.getsize(column) - 12)  # a crash part-way through the last row
+
+    store = HistoryStore(str(tmp_path), 'pumps', ['power'])
+    result = store.query(TIMESTAMPS[0], TIMESTAMPS[10], 1)
+    assert len(series(result, 'pump001')['timestamp']) == 9
+    assert len(series(result, 'pump002')['timestamp']) == 9
+    store.close()
+
+def test_unknown_fields_are_rejected(tmp_path):
+    store = HistoryStore(str(tmp_path), 'pumps', ['power'])
+    with pytest.raises(ValueError):
+        store.query(TIMESTAMPS[0], TIMESTAMPS[-1], 60, fields=['flow'])
+
+@pytest.mark.parametrize('start, end, source', [('2024-01-01T12:00', '2024-01-03T00:00', 'r86400'),
+                                                ('2024-01-01T12:30', '2024-01-02T18:45', 'r3600'),
+                                                ('2024-01-01T11:50:30', '2024-01-01T12:10', 'r60')])
+def test_partial_edge_buckets_come_from_finer_levels(tmp_path, start, end, source):
+    timestamps = pd.date_range('2024-01-01', '2024-01-03', freq='1h', inclusive='left')
+    power = np.random.default_rng(3).uniform(10, 50, (len(timestamps), 1))
+    store = HistoryStore(str(tmp_path), 'pumps', ['power'])
+    for timestamp, row in zip(timestamps.values, power):
+        store.append(timestamp, DEVICES[:1], {'power': row})
+
+    result = store.query(np.datetime64(start), np.datetime64(end), 86400)
+    assert result['source'] == source
+    frame = pd.DataFrame(power, index=timestamps, columns=DEVICES[:1])
+    inside = frame[(frame.index >= start) & (frame.index < end)]
+    entry = series(result, DEVICES[0])
+    assert entry['timestamp'] == inside.resample('1D').size().index.strftime('%Y-%m-%dT%H:%M:%S').tolist()
+    for stat, values in (('min', inside.resample('1D').min()), ('max', inside.resample('1D').max()),
+                         ('mean', inside.resample('1D').mean())):
+        np.testing.assert_allclose(entry['power'][stat], values[DEVICES[0]].to_numpy(), rtol=1e-6, err_msg=stat)
+    store.close()
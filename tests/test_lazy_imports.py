@@ -0,0 +1,27 @@
+# wastewater_dr_twin/tests/test_lazy_imports.py
+import os
+import subprocess
+import sys
+
+import pytest
+
+import data_generators
+import demand_response
+import fiware_integration
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.mark.parametrize('package', [data_generators, demand_response, fiware_integration])
+def test_exports_resolve_on_access(package):
+    assert sorted(package.__all__) == sorted(package._EXPORTS)
+    assert set(package.__all__) <= set(dir(package))
+    for name in package.__all__:
+        value = getattr(package, name)
+        assert vars(package)[name] is value  # cached after the first lookup
+    with pytest.raises(AttributeError):
+        package.missing
+
+def test_edge_runner_imports_stay_light():
+    code = "import sys, edge_runner; print(sorted({'pandas', 'scipy', 'requests'} & set(sys.modules)))"
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == '[]'
@@ -0,0 +1,35 @@
+# wastewater_dr_twin/tests/test_multi_plant.py
+import json
+
+import pytest
+
+import provision_devices
+from benchmarks.fakes import fake_iot_agent
+from data_generators.fleet import Fleet
+from simulation.multi_plant import PlantConfig, provision_plants, synthetic_plants
+
+@pytest.fixture
+def iot_agent(monkeypatch):
+    server = fake_iot_agent(keep_bodies=True).start()
+    monkeypatch.setattr(provision_devices, 'IOT_AGENT_URL', server.url)
+    yield server
+    server.stop()
+
+def test_default_api_key_is_per_plant():
+    assert PlantConfig('north').api_key != PlantConfig('south').api_key
+
+def test_provision_plants_registers_a_service_group_per_tenant(iot_agent):
+    plants = synthetic_plants(2, num_pumps=3, num_basins=2)
+    assert provision_plants(plants, workers=2)
+
+    services = [json.loads(body)['services'][0] for method, path, body in iot_agent.bodies if path == '/iot/services']
+    assert sorted(service['apikey'] for service in services) == sorted(plant.api_key for plant in plants)
+    for plant in plants:
+        tenant = (plant.fiware_service, plant.fiware_servicepath)
+        assert iot_agent.tenant_requests[('POST', '/iot/services') + tenant] == 1
+        assert iot_agent.tenant_requests[('POST', '/iot/devices') + tenant] == 1
+
+    devices = [json.loads(body)['devices'] for method, path, body in iot_agent.bodies
+               if (method, path) == ('POST', '/iot/devices')]
+    fleet = Fleet.synthetic(3, 2)
+    assert [len(batch) for batch in devices] == [len(fleet.pump_ids) + len(fleet.basin_ids) + 1] * 2
@@ -0,0 +1,25 @@
+# wastewater_dr_twin/tests/test_orion_interface.py
+import asyncio
+
+import pytest
+
+from benchmarks.fakes import RecordingHTTPServer
+from fiware_integration.orion_interface import OrionInterface, AsyncOrionInterface
+
+@pytest.fixture
+def failing_orion():
+    server = RecordingHTTPServer({('POST', '/v2/op/query'): (500, {'error': 'InternalServerError'})}).start()
+    yield server
+    server.stop()
+
+def test_batch_query_raises_on_failed_page(failing_orion):
+    orion = OrionInterface(failing_orion.url)
+    with pytest.raises(RuntimeError):
+        orion.batch_query()
+    orion.close()
+
+def test_async_batch_query_raises_on_failed_page(failing_orion):
+    orion = AsyncOrionInterface(failing_orion.url)
+    with pytest.raises(RuntimeError):
+        asyncio.run(orion.batch_query())
+    orion.close()
@@ -0,0 +1,74 @@
+# wastewater_dr_twin/tests/test_process_model.py
+import numpy as np
+import pytest
+
+from demand_response.algorithm import DemandResponseAlgorithm
+from demand_response.process_model import ProcessModel
+
+@pytest.fixture
+def model():
+    return ProcessModel(kla=6.0, saturation=9.0, static_head=0.3, min_pump_flow=0.4)
+
+def test_steady_state_reproduces_the_reference_point(model):
+    basin_power = np.array([30.0, 50.0])
+    basin_do = np.array([1.8, 2.4])
+    np.testing.assert_allclose(model.steady_state_do(basin_power, basin_power, basin_do), basin_do)
+    target = np.array([2.0, 2.0])
+    power = model.power_for_do(target, basin_power, basin_do)
+    np.testing.assert_allclose(model.steady_state_do(power, basin_power, basin_do), target)
+
+def test_simulation_settles_at_the_steady_state(model):
+    basin_power = np.array([30.0, 50.0])
+    basin_do = np.array([1.8, 2.4])
+    power = np.repeat((basin_power * 0.8)[:, None], 200, axis=1)
+    trajectory = model.simulate_do(power, basin_power, basin_do, dt_hours=0.1)
+    np.testing.assert_allclose(trajectory[:, -1], model.steady_state_do(power[:, 0], basin_power, basin_do), rtol=1e-6)
+    # Less air: DO falls monotonically towards the new steady state
+    assert (np.diff(trajectory, axis=1) <= 1e-12).all()
+
+@pytest.mark.parametrize('basin_do', [1.4, 1.6, 2.0, 2.4, 2.8])
+def test_basin_bounds_keep_the_steady_state_in_band(model, basin_do):
+    basin_power = np.array([40.0])
+    lower, upper, infeasible = model.basin_bounds(basin_power, np.array([basin_do]), basin_power * 0.7,
+                                                  basin_power * 1.2, 1.5, 2.5)
+    assert not infeasible.any()
+    assert lower[0] <= upper[0]
+    for power in np.linspace(lower[0], upper[0], 11):
+        do_level = model.steady_state_do(np.array([power]), basin_power, np.array([basin_do]))[0]
+        assert 1.5 <= do_level <= 2.5
+
+def test_unreachable_band_falls_back_to_the_nearest_limit(model):
+    basin_power = np.array([40.0, 40.0])
+    lower, upper, infeasible = model.basin_bounds(basin_power, np.array([0.5, 5.0]), basin_power * 0.7,
+                                                  basin_power * 1.05, 1.5, 2.5)
+    assert infeasible.all()
+    # Starved basin gets all the air allowed, the over-aerated one the least
+    np.testing.assert_allclose(lower, [42.0, 28.0])
+    np.testing.assert_allclose(upper, lower)
+
+def test_pump_flow_inverts_the_operating_point(model):
+    flows = np.linspace(0.0, 1.5, 31)
+    power_ratio = model.pump_operating_point(flows)[3]
+    assert (np.diff(power_ratio) > 0).all()
+    np.testing.assert_allclose(model.pump_flow(power_ratio), flows, atol=1e-3)
+    # The reference point is the best efficiency point at full speed
+    speed, head, efficiency, ratio = model.pump_operating_point(1.0)
+    assert (speed, head, efficiency, ratio) == pytest.approx((1.0, 1.0, 1.0, 1.0))
+
+def test_pump_bounds_keep_the_minimum_flow(model):
+    pump_power = np.array([20.0, 60.0])
+    lower, upper = model.pump_bounds(pump_power, pump_power * 0.1, pump_power)
+    assert (model.pump_flow(lower / pump_power) >= model.min_pump_flow - 1e-3).all()
+    np.testing.assert_array_equal(upper, pump_power)
+
+def test_algorithm_setpoints_respect_the_band(model):
+    rng = np.random.default_rng(4)
+    basin_power = rng.uniform(30, 60, 50)
+    basin_do = rng.uniform(1.2, 3.0, 50)
+    pump_power = rng.uniform(20, 80, 10)
+    dr_algorithm = DemandResponseAlgorithm('vectorized', process_model=model)
+    result = dr_algorithm.solve(pump_power, np.full(10, 0.8), basin_power, basin_do)
+    _, _, infeasible = model.basin_bounds(basin_power, basin_do, basin_power * 0.7, basin_power * 1.2, 1.5, 2.5)
+    do_level = result['basin_dissolved_oxygen'][~infeasible]
+    assert ((do_level >= 1.5) & (do_level <= 2.5)).all()
+    assert (result['pump_flow'] >= model.min_pump_flow - 1e-3).all()
@@ -0,0 +1,74 @@
+# wastewater_dr_twin/tests/test_ring_buffer.py
+import numpy as np
+
+from wastewater_dashboard.ring_buffer import RingBuffer, to_records
+
+START = np.datetime64('2024-01-01T00:00')
+
+def minute(i):
+    return START + np.timedelta64(i, 'm')
+
+def minutes(first, stop):
+    return START + np.arange(first, stop).astype('timedelta64[m]')
+
+def filled(count, capacity=5):
+    buffer = RingBuffer(['power'], capacity, max_devices=1)
+    for i in range(count):
+        buffer.append(minute(i), ['pump001', 'pump002'], {'power': [i, 10 * i]})
+    return buffer
+
+def test_wraparound_keeps_the_latest_capacity_rows():
+    buffer = filled(12)
+    view = buffer.window()
+    assert len(buffer) == 5 and buffer.total_rows == 12
+    np.testing.assert_array_equal(view['timestamp'], minutes(7, 12))
+    np.testing.assert_array_equal(view['power'], [[i, 10 * i] for i in range(7, 12)])
+
+def test_window_after_wraparound_is_a_view_in_order():
+    buffer = filled(8)
+    view = buffer.window()
+    # Mirrored storage: the wrapped window is still one slice, not a copy
+    assert np.shares_memory(view['power'], buffer._columns['power'])
+    assert np.all(np.diff(view['timestamp']) == np.timedelta64(1, 'm'))
+
+def test_since_row_returns_only_new_rows():
+    buffer = filled(3)
+    mark = buffer.total_rows
+    for i in range(3, 6):
+        buffer.append(minute(i), ['pump001'], {'power': [i]})
+    view = buffer.window(since_row=mark)
+    np.testing.assert_array_equal(view['timestamp'], minutes(3, 6))
+    # pump002 did not report in the new rows
+    assert np.isnan(view['power'][:, 1]).all()
+    # A mark older than the live rows falls back to everything still held
+    assert len(buffer.window(since_row=0)['timestamp']) == 5
+
+def test_start_filter_and_expire():
+    buffer = filled(5)
+    np.testing.assert_array_equal(buffer.window(start=minute(2))['timestamp'], minutes(3, 5))
+    buffer.expire(minute(1))
+    np.testing.assert_array_equal(buffer.window()['timestamp'], minutes(2, 5))
+
+def test_append_many_matches_append():
+    one_by_one = filled(9)
+    block = RingBuffer(['power'], 5, max_devices=1)
+    block.append_many([minute(i) for i in range(9)], ['pump001', 'pump002'],
+                      {'power': [[i, 10 * i] for i in range(9)]})
+    assert block.total_rows == one_by_one.total_rows and len(block) == len(one_by_one)
+    for key, value in one_by_one.window().items():
+        np.testing.assert_array_equal(block.window()[key], value)
+
+def test_new_devices_grow_the_columns():
+    buffer = filled(2)
+    buffer.append(minute(2), ['pump003'], {'power': [7.0]})
+    view = buffer.window()
+    assert buffer.device_ids == ['pump001', 'pump002', 'pump003']
+    assert view['power'].shape == (3, 3)
+    assert np.isnan(view['power'][:2, 2]).all() and view['power'][2, 2] == 7.0
+
+def test_to_records_skips_missing_readings():
+    buffer = filled(2)
+    buffer.append(minute(2), ['pump001'], {'power': [5.0]})
+    records = to_records(buffer.window(), buffer.device_ids, 'id')
+    assert [(record['id'], record['power']) for record in records] == [
+        ('pump001', 0.0), ('pump001', 1.0), ('pump001', 5.0), ('pump002', 0.0), ('pump002', 10.0)]
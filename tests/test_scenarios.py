@@ -0,0 +1,42 @@
+# wastewater_dr_twin/tests/test_scenarios.py
+import pytest
+
+from data_generators.fleet import Fleet
+from simulation.scenarios import DECISION_PARAMETERS, METRICS, run_scenarios
+
+FLEET = Fleet.synthetic(6, 3, seed=3)
+START = '2024-01-01'
+
+def run(strategies, **kwargs):
+    kwargs.setdefault('n_scenarios', 12)
+    kwargs.setdefault('chunk_size', 5)
+    return run_scenarios(FLEET, strategies, seed=11, start_time=START, horizon_hours=6, freq='30min', **kwargs)
+
+def test_report_does_not_depend_on_the_worker_count():
+    strategies = {'current': {}, 'deep': {'max_power_reduction': 0.4}}
+    serial = run(strategies, workers=1)
+    assert serial == run(strategies, workers=2)
+    for name, result in serial.items():
+        assert set(METRICS) <= set(result)
+        assert result['parameters'] == strategies[name]
+        assert result['kwh_saved']['p5'] <= result['kwh_saved']['p50'] <= result['kwh_saved']['p95']
+
+def test_decision_parameters_move_the_setpoints():
+    report = run({'current': {}, 'shallow': {'max_power_reduction': 0.1}, 'high_floor': {'do_lower_limit': 2.0},
+                  'low_ceiling': {'do_upper_limit': 2.0}})
+    current = report['current']
+    assert current['decision_parameters'] == {'max_power_reduction': 0.3, 'do_lower_limit': 1.5}
+    assert set(current['decision_parameters']) == set(DECISION_PARAMETERS)
+    assert report['shallow']['kwh_saved']['mean'] < current['kwh_saved']['mean']
+    # The process model holds basins up to the DO floor
+    assert report['high_floor']['kwh_saved']['mean'] < current['kwh_saved']['mean']
+    assert report['high_floor']['do_violations']['mean'] < report['high_floor']['baseline_do_violations']['mean']
+    # The ceiling only changes which intervals count as violations
+    assert report['low_ceiling']['kwh_saved'] == current['kwh_saved']
+    assert report['low_ceiling']['baseline_do_violations'] != current['baseline_do_violations']
+
+def test_unknown_strategy_parameters_fail_fast():
+    with pytest.raises(ValueError):
+        run({'bad': {'max_flow': 1.0}})
+    with pytest.raises(ValueError):
+        run({'bad': {'pump_efficiency_threshold': 0.8}})
@@ -0,0 +1,90 @@
+# wastewater_dr_twin/tests/test_scheduler.py
+import numpy as np
+import pytest
+
+from demand_response.algorithm import DemandResponseAlgorithm
+from demand_response.process_model import ProcessModel
+from demand_response.scheduler import HorizonScheduler
+
+N_STEPS = 48
+
+@pytest.fixture
+def horizon():
+    rng = np.random.default_rng(7)
+    hours = np.arange(N_STEPS) / 2
+    price = 0.1 + 0.08 * np.sin(hours / 24 * 2 * np.pi) + rng.uniform(0, 0.01, N_STEPS)
+    demand = 1000 + 300 * np.sin((hours - 6) / 24 * 2 * np.pi)
+    return {
+        'pump_power': rng.uniform(20, 80, 6),
+        'basin_power': rng.uniform(30, 60, 3),
+        'basin_do': np.array([2.0, 2.1, 1.9]),
+        'price': price,
+        'demand': demand
+    }
+
+def schedule(scheduler, horizon):
+    return scheduler.schedule(horizon['pump_power'], horizon['basin_power'], horizon['basin_do'],
+                              horizon['price'], horizon['demand'], interval_hours=0.5)
+
+@pytest.mark.parametrize('process_model', [None, ProcessModel()])
+def test_schedule_is_feasible(horizon, process_model):
+    dr_algorithm = DemandResponseAlgorithm('vectorized', process_model=process_model)
+    scheduler = HorizonScheduler(dr_algorithm)
+    result = schedule(scheduler, horizon)
+    tolerance = 1e-6
+
+    baseline = np.concatenate([horizon['pump_power'], horizon['basin_power']])
+    setpoints = result['setpoints']
+    assert setpoints.shape == (len(baseline), N_STEPS)
+    assert (setpoints >= baseline[:, None] * (1 - dr_algorithm.max_power_reduction) - tolerance).all()
+    assert (setpoints <= baseline[:, None] * (1 + scheduler.max_power_increase) + tolerance).all()
+    # Every device still delivers its baseline energy over the horizon
+    assert (setpoints.sum(axis=1) >= baseline * N_STEPS - tolerance).all()
+    # DO stays in the band wherever the band is reachable
+    dissolved_oxygen = result['dissolved_oxygen'][~result['do_infeasible']]
+    assert (dissolved_oxygen >= dr_algorithm.do_lower_limit - tolerance).all()
+    assert (dissolved_oxygen <= dr_algorithm.do_upper_limit + tolerance).all()
+    assert result['cost'] <= result['baseline_cost'] + tolerance
+
+def test_peak_intervals_are_capped(horizon):
+    scheduler = HorizonScheduler(DemandResponseAlgorithm('vectorized'), peak_quantile=0.75, peak_reduction=0.15)
+    result = schedule(scheduler, horizon)
+    peak = result['peak_intervals']
+    assert peak.sum() == N_STEPS / 4
+    assert (horizon['demand'][peak] >= horizon['demand'][~peak].max()).all()
+
+    baseline_load = horizon['pump_power'].sum() + horizon['basin_power'].sum()
+    assert (result['setpoints'][:, peak].sum(axis=0) <= 0.85 * baseline_load + 1e-6).all()
+    # Load moves out of the peak into cheaper intervals rather than disappearing
+    assert result['setpoints'][:, ~peak].sum() > baseline_load * (~peak).sum()
+
+def test_cost_follows_the_price_curve(horizon):
+    result = schedule(HorizonScheduler(DemandResponseAlgorithm('vectorized'), peak_reduction=0.0), horizon)
+    load = result['setpoints'].sum(axis=0)
+    cheap = horizon['price'] < np.median(horizon['price'])
+    assert load[cheap].mean() > load[~cheap].mean()
+
+def test_peaks_are_picked_by_rank():
+    scheduler = HorizonScheduler(peak_quantile=0.75)
+    # Two thirds of the horizon tie at the top; only a quarter is flagged
+    peak = scheduler.peak_intervals([1000.0] * 32 + [900.0] * 16)
+    assert peak.sum() == 12 and peak[:12].all()
+    assert not scheduler.peak_intervals([1000.0] * 8).any()
+    assert not scheduler.peak_intervals([1000.0]).any()
+
+@pytest.mark.parametrize('demand', [[1000.0] * 4, [1000.0] * 32 + [900.0] * 16, [1000.0]])
+def test_flat_and_short_horizons_are_feasible(demand):
+    n_steps = len(demand)
+    result = HorizonScheduler(peak_quantile=0.75, peak_reduction=0.15).schedule(
+        [100.0], [200.0], [2.0], [0.1] * n_steps, demand)
+    assert (result['setpoints'].sum(axis=1) >= np.array([100.0, 200.0]) * n_steps - 1e-6).all()
+
+def test_cap_gives_way_to_the_energy_constraints():
+    # Halving the load in half of the horizon cannot be made up by +20% elsewhere
+    scheduler = HorizonScheduler(peak_quantile=0.5, peak_reduction=0.5)
+    demand = [1.0] * 4 + [2.0] * 4
+    result = scheduler.schedule([100.0, 50.0], [200.0], [2.0], np.linspace(0.1, 0.2, 8), demand)
+    setpoints = result['setpoints']
+    assert (setpoints.sum(axis=1) >= np.array([100.0, 50.0, 200.0]) * 8 - 1e-6).all()
+    load = setpoints.sum(axis=0)
+    assert load[4:].max() < 350.0 < load[:4].min()
@@ -0,0 +1,56 @@
+# wastewater_dr_twin/tests/test_solver_cache.py
+import numpy as np
+import pytest
+
+from demand_response.algorithm import DemandResponseAlgorithm
+from demand_response.process_model import ProcessModel
+from demand_response.solver_cache import SolutionCache
+
+PUMP_POWER = np.array([30.0, 45.0, 60.0])
+PUMP_EFFICIENCY = np.array([0.7, 0.8, 0.85])
+BASIN_POWER = np.array([40.0, 50.0])
+BASIN_DO = np.array([2.0, 2.2])
+
+def test_lru_eviction():
+    cache = SolutionCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None and cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.evictions == 1
+    with pytest.raises(ValueError):
+        SolutionCache(maxsize=0)
+
+def test_key_quantizes_and_separates_device_sets():
+    cache = SolutionCache(power_quantum=1.0, price_quantum=0.01)
+    key = cache.key(PUMP_POWER, BASIN_POWER, 0.12, 'plant-a')
+    assert cache.key(PUMP_POWER + 0.2, BASIN_POWER - 0.2, 0.121, 'plant-a') == key
+    assert cache.key(PUMP_POWER + 2, BASIN_POWER, 0.12, 'plant-a') != key
+    assert cache.key(PUMP_POWER, BASIN_POWER, 0.12, 'plant-b') != key
+    assert cache.key(PUMP_POWER, BASIN_POWER, 0.12, 'plant-a', BASIN_DO) != cache.key(
+        PUMP_POWER, BASIN_POWER, 0.12, 'plant-a', BASIN_DO + 0.5)
+
+@pytest.mark.parametrize('solver', ['slsqp', 'vectorized'])
+@pytest.mark.parametrize('process_model', [None, ProcessModel()])
+def test_cached_solve_matches_fresh_solve(solver, process_model):
+    cached = DemandResponseAlgorithm(solver, cache_size=16, process_model=process_model)
+    fresh = DemandResponseAlgorithm(solver, process_model=process_model)
+    for _ in range(2):
+        result = cached.solve(PUMP_POWER, PUMP_EFFICIENCY, BASIN_POWER, BASIN_DO, 0.1, 'plant')
+    assert cached.cache.hits == 1
+    expected = fresh.solve(PUMP_POWER, PUMP_EFFICIENCY, BASIN_POWER, BASIN_DO, 0.1, 'plant')
+    for key, value in expected.items():
+        np.testing.assert_allclose(result[key], value, rtol=1e-9, err_msg=key)
+
+def test_warm_start_reuses_the_problem_and_matches_a_cold_start():
+    warm = DemandResponseAlgorithm('slsqp', warm_start=True)
+    cold = DemandResponseAlgorithm('slsqp', warm_start=False)
+    rng = np.random.default_rng(0)
+    for _ in range(4):
+        pump_power = PUMP_POWER * rng.uniform(0.9, 1.1, len(PUMP_POWER))
+        warm_result = warm.solve(pump_power, PUMP_EFFICIENCY, BASIN_POWER, BASIN_DO, signature='plant')
+        cold_result = cold.solve(pump_power, PUMP_EFFICIENCY, BASIN_POWER, BASIN_DO, signature='plant')
+        np.testing.assert_allclose(warm_result['pump_power'], cold_result['pump_power'], rtol=1e-6)
+    assert warm.problem_builds == 1 and warm.warm_starts == 3
+    assert cold.warm_starts == 0
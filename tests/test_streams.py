@@ -0,0 +1,63 @@
+# wastewater_dr_twin/tests/test_streams.py
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from data_generators.fleet import Fleet
+from data_generators.main_generator import DataGenerator
+from data_generators.streams import StreamGenerator
+from simulation.clock import ChunkedTickSource
+
+ORIGIN = '2024-01-01'
+
+@pytest.fixture
+def fleet():
+    return Fleet.synthetic(6, 3, seed=11)
+
+def assert_chunks_identical(chunk, expected):
+    assert chunk.keys() == expected.keys()
+    for key, value in chunk.items():
+        if isinstance(value, np.ndarray):
+            assert value.dtype == expected[key].dtype
+            assert value.tobytes() == expected[key].tobytes(), key
+        else:
+            assert value == expected[key]
+
+def test_chunk_is_identical_across_workers(fleet):
+    stream = StreamGenerator(fleet, seed=5, origin=ORIGIN, chunk_size=30)
+    serial = list(stream.chunks(0, 5))
+    parallel = list(stream.chunks(0, 5, workers=2))
+    assert [chunk['chunk'] for chunk in parallel] == list(range(6))
+    for chunk, expected in zip(parallel, serial):
+        assert_chunks_identical(chunk, expected)
+    # A fresh generator (as in another process) computing chunk 4 alone, out of order
+    assert_chunks_identical(StreamGenerator(fleet, seed=5, origin=ORIGIN, chunk_size=30).chunk(4), serial[4])
+
+def test_chunk_does_not_depend_on_the_requested_range(fleet):
+    stream = StreamGenerator(fleet, seed=5, origin=ORIGIN, chunk_size=30)
+    whole = stream.chunk(2)
+    start = whole['timestamp'][10]
+    trimmed = next(stream.iter_range(start, whole['timestamp'][-1]))
+    for key in ('pump_power', 'basin_power', 'grid_price'):
+        assert trimmed[key].tobytes() == whole[key][..., 10:29].tobytes()
+
+def test_adding_devices_keeps_existing_streams(fleet):
+    larger = Fleet.synthetic(8, 3, seed=11)
+    larger.pump_base_power[:6] = fleet.pump_base_power
+    larger.pump_efficiency[:6] = fleet.pump_efficiency
+    chunk = StreamGenerator(fleet, seed=5, origin=ORIGIN).chunk(1)
+    extended = StreamGenerator(larger, seed=5, origin=ORIGIN).chunk(1)
+    assert extended['pump_power'][:6].tobytes() == chunk['pump_power'].tobytes()
+
+def test_chunked_tick_source_covers_the_horizon(fleet):
+    start = datetime(2024, 1, 1, 6)
+    end = start + timedelta(minutes=95)
+    generator = DataGenerator(fleet, seed=5)
+    ticks = list(ChunkedTickSource(generator, start, end, 60, chunk_ticks=20))
+    assert [timestamp for timestamp, _, _ in ticks] == [start + timedelta(minutes=i) for i in range(95)]
+
+    parallel = list(ChunkedTickSource(DataGenerator(fleet, seed=5), start, end, 60, chunk_ticks=20, workers=2))
+    for (_, arrays, column), (_, expected, expected_column) in zip(parallel, ticks):
+        assert column == expected_column
+        assert arrays['pump_power'][:, column].tobytes() == expected['pump_power'][:, column].tobytes()
@@ -0,0 +1,122 @@
+# wastewater_dr_twin/tests/test_telemetry_consumer.py
+import json
+import threading
+import time
+
+import pytest
+
+from benchmarks.fakes import FakeMQTTBroker
+from data_generators.fleet import Fleet
+from data_generators.plant_state import PlantState
+from fiware_integration.telemetry_consumer import TelemetryConsumer
+
+API_KEY = 'test_key'
+
+class Runs:
+    """on_trigger callback recording every run."""
+
+    def __init__(self):
+        self.calls = []
+        self._condition = threading.Condition()
+
+    def __call__(self, state, reasons):
+        with self._condition:
+            self.calls.append((state, reasons))
+            self._condition.notify_all()
+
+    def wait(self, count, timeout=5.0):
+        with self._condition:
+            return self._condition.wait_for(lambda: len(self.calls) >= count, timeout)
+
+@pytest.fixture
+def runs():
+    return Runs()
+
+@pytest.fixture
+def consumer(runs):
+    broker = FakeMQTTBroker().start()
+    consumer = TelemetryConsumer(PlantState.from_fleet(Fleet.synthetic(4, 2, seed=1)), broker.host, broker.port,
+                                 API_KEY, runs, report_fraction=0.8, price_change=0.05, debounce=0.2)
+    consumer.start()
+    yield consumer
+    consumer.stop()
+    broker.stop()
+
+def send(consumer, device_id, data):
+    consumer.ingest(f"/json/{API_KEY}/{device_id}/attrs", json.dumps(data))
+
+def report(consumer, device_ids, power):
+    # A full reading from each device
+    for device_id in device_ids:
+        if device_id.startswith('pump'):
+            send(consumer, device_id, {'power': power, 'efficiency': 0.8, 'status': 'running'})
+        else:
+            send(consumer, device_id, {'power': power, 'dissolved_oxygen': 2.0})
+
+def test_fleet_report_triggers_one_run(consumer, runs):
+    pumps = consumer.state.device_ids[:4]
+    basins = consumer.state.device_ids[4:6]
+    for i, device_id in enumerate(pumps):
+        send(consumer, device_id, {'power': 10.0 + i, 'efficiency': 0.8, 'status': 'running'})
+    send(consumer, basins[0], {'power': {'type': 'Number', 'value': 42.0}, 'dissolved_oxygen': 2.1})
+    # 5 of 6 devices meets report_fraction, but basins[1] has never reported
+    assert not runs.wait(1, timeout=0.3)
+
+    send(consumer, basins[1], {'power': 30.0})
+    assert not runs.wait(1, timeout=0.3)  # still no dissolved oxygen reading
+    send(consumer, basins[1], {'dissolved_oxygen': 1.9})
+    assert runs.wait(1)
+    state, reasons = runs.calls[0]
+    assert reasons == ['fleet']
+    assert state.pump_power.tolist() == [10.0, 11.0, 12.0, 13.0]
+    assert state.basin_power.tolist() == [42.0, 30.0]
+    assert state is not consumer.state
+
+    # Once the table is complete, report_fraction of the fleet is enough
+    report(consumer, pumps + basins[:1], 25.0)
+    assert runs.wait(2)
+    assert runs.calls[1][1] == ['fleet']
+
+def test_price_before_the_devices_report_does_not_trigger(consumer, runs):
+    send(consumer, 'grid001', {'demand': 900.0, 'price': 0.2})
+    report(consumer, consumer.state.device_ids[:5], 20.0)
+    assert not runs.wait(1, timeout=0.4)
+    assert consumer.stats()['unseen'] == 1
+
+    report(consumer, consumer.state.device_ids[5:6], 20.0)
+    assert runs.wait(1)
+    state, reasons = runs.calls[0]
+    assert reasons == ['fleet']
+    assert (state.pump_power == 20.0).all() and (state.basin_dissolved_oxygen == 2.0).all()
+    assert state.grid_price == 0.2
+
+def test_burst_is_debounced_into_a_single_run(consumer, runs):
+    report(consumer, consumer.state.device_ids[:6], 20.0)
+    send(consumer, 'grid001', {'demand': 900.0, 'price': 0.2})
+    report(consumer, consumer.state.device_ids[:6], 21.0)
+    assert runs.wait(1)
+    time.sleep(0.4)
+    assert len(runs.calls) == 1
+    assert runs.calls[0][1] == ['fleet', 'price']
+    assert consumer.stats()['reported'] == 0
+
+def test_price_moves_below_the_threshold_do_not_trigger(consumer, runs):
+    report(consumer, consumer.state.device_ids[:6], 20.0)
+    assert runs.wait(1)
+    send(consumer, 'grid001', {'price': 0.20})
+    assert runs.wait(2)
+    assert runs.calls[1][1] == ['price']
+    send(consumer, 'grid001', {'price': 0.22})
+    assert not runs.wait(3, timeout=0.4)
+    send(consumer, 'grid001', {'price': 0.30})
+    assert runs.wait(3)
+    assert runs.calls[2][1] == ['price']
+
+def test_echoes_and_bad_messages_are_counted_not_applied(consumer, runs):
+    send(consumer, consumer.state.device_ids[0], {'power': 5.0, 'optimized_power': 4.0})
+    send(consumer, 'pump999', {'power': 5.0})
+    consumer.ingest(f"/json/{API_KEY}/{consumer.state.device_ids[1]}/attrs", b'not json')
+    send(consumer, consumer.state.device_ids[2], {'power': 'high'})
+    stats = consumer.stats()
+    assert (stats['echo'], stats['unknown'], stats['invalid'], stats['ingested']) == (1, 1, 2, 0)
+    assert consumer.state.pump_power[0] != 5.0
@@ -0,0 +1 @@
+# wastewater_dr_twin/wastewater_dashboard/__init__.py
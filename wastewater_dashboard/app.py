@@ -1,15 +1,24 @@
 import logging
-from flask import Flask, render_template, request, send_from_directory
+from flask import Flask, Response, render_template, request, send_from_directory
 from flask.json import jsonify
 from json import JSONEncoder
-from flask_socketio import SocketIO
+from flask_socketio import SocketIO, join_room, leave_room
+import hashlib
 import json
-import pandas as pd
+import math
+import threading
 import numpy as np
 from datetime import datetime, timedelta
 import traceback
 import os
 
+# Imports are relative to the repository root: python -m wastewater_dashboard.app
+import config
+from wastewater_dashboard.ring_buffer import RingBuffer, to_records
+from wastewater_dashboard.history_store import HistoryStore
+from wastewater_dashboard.downsampling import select_rows
+import metrics
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your_secret_key'
 socketio = SocketIO(app)
@@ -18,10 +27,43 @@ socketio = SocketIO(app)
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-# Simulated data storage
-pump_data = pd.DataFrame(columns=['timestamp', 'pump_id', 'power', 'optimized_power', 'efficiency', 'optimized_efficiency'])
-aeration_data = pd.DataFrame(columns=['timestamp', 'basin_id', 'power', 'optimized_power', 'dissolved_oxygen', 'optimized_dissolved_oxygen'])
-grid_data = pd.DataFrame(columns=['timestamp', 'demand', 'price'])
+# Simulated data storage: one preallocated ring buffer per entity type
+HISTORY_WINDOW = timedelta(hours=24)
+HISTORY_CAPACITY = 4096  # rows (updates) kept per entity type
+GRID_ID = 'grid'
+
+pump_data = RingBuffer(['power', 'optimized_power', 'efficiency', 'optimized_efficiency'], HISTORY_CAPACITY)
+aeration_data = RingBuffer(['power', 'optimized_power', 'dissolved_oxygen', 'optimized_dissolved_oxygen'], HISTORY_CAPACITY)
+grid_data = RingBuffer(['demand', 'price'], HISTORY_CAPACITY, max_devices=1)
+
+# Persistent history on disk, with rollups for long range queries
+HISTORY_DIR = os.environ.get('HISTORY_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'history'))
+HISTORY_MAX_BUCKETS = 500  # default number of buckets returned by /history
+history_stores = {
+    'pumps': HistoryStore(HISTORY_DIR, 'pumps', pump_data.fields),
+    'aeration_basins': HistoryStore(HISTORY_DIR, 'aeration_basins', aeration_data.fields),
+    'grid': HistoryStore(HISTORY_DIR, 'grid', grid_data.fields)
+}
+
+# Sequence number of the last applied update. Clients get the full snapshot with
+# its seq on connect, then one 'data_delta' per update carrying seq + 1.
+update_seq = 0
+store_lock = threading.Lock()
+
+UPDATE_SECONDS = metrics.histogram('dashboard_update_seconds', "Time to apply one update_data payload")
+UPDATE_BYTES = metrics.counter('dashboard_update_bytes_total', "update_data request body bytes received")
+UPDATES = metrics.counter('dashboard_updates_total', "update_data payloads applied", ['transport'])
+UPDATE_ERRORS = metrics.counter('dashboard_update_errors_total', "update_data payloads rejected")
+EMIT_BYTES = metrics.counter('dashboard_emit_bytes_total', "Serialized bytes of deltas pushed to clients")
+VIEWS = metrics.gauge('dashboard_views', "Distinct subscribed views a delta was serialized for")
+BUFFER_ROWS = metrics.gauge('dashboard_buffer_rows', "Rows held in each in-memory ring buffer", ['store'])
+INGEST_SECONDS = metrics.histogram('dashboard_ingest_seconds', "Time to apply one /ingest batch")
+INGEST_SNAPSHOTS = metrics.histogram('dashboard_ingest_snapshots', "Snapshots per /ingest batch",
+                                     buckets=(1, 10, 50, 100, 500, 1000, 5000))
+metrics.configure(config.METRICS_ENABLED)
+
+# Content types /ingest accepts besides JSON; msgpack is optional
+MSGPACK_TYPES = ('application/msgpack', 'application/x-msgpack')
 
 class CustomJSONEncoder(JSONEncoder):
     def default(self, obj):
@@ -40,22 +82,165 @@ def index():
         logger.error(f"Error in index route: {str(e)}")
         return f"An error occurred: {str(e)}", 500
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype=metrics.CONTENT_TYPE)
+
 @app.route('/static/<path:path>')
 def send_static(path):
     return send_from_directory('static', path)
 
+# Socket.IO subscriptions: every client watches a view (entity types + devices) plus its own
+# time window and downsampling options. Clients with the same view share a room, so each
+# delta is serialized once per distinct view instead of once for everybody.
+ENTITY_STORES = {'pumps': 'pump_data', 'aeration_basins': 'aeration_data', 'grid': 'grid_data'}
+subscriptions = {}  # sid -> subscription
+subscription_lock = threading.Lock()
+
 @socketio.on('connect')
-def handle_connect():
+def handle_connect(auth=None):
     logger.info('Client connected')
-    send_initial_data()
+    subscribe_client(request.sid, auth)
 
-def send_initial_data():
-    logger.info("Sending initial data")
-    socketio.emit('initial_data', {
-        'pump_data': json.loads(pump_data.to_json(orient='records', date_format='iso')),
-        'aeration_data': json.loads(aeration_data.to_json(orient='records', date_format='iso')),
-        'grid_data': json.loads(grid_data.to_json(orient='records', date_format='iso'))
+@socketio.on('subscribe')
+def handle_subscribe(options=None):
+    # {'entities': [...], 'devices': [...], 'window': seconds, 'max_points': N, 'method': ...}
+    logger.info('Client changed subscription')
+    subscribe_client(request.sid, options)
+
+@socketio.on('resync')
+def handle_resync(options=None):
+    # Client detected a gap in delta sequence numbers, or wants its traces re-downsampled
+    logger.info('Client requested resync')
+    with subscription_lock:
+        subscription = dict(subscriptions.get(request.sid) or subscription_options(None))
+    if isinstance(options, dict) and options.get('max_points'):
+        try:
+            subscription.update(downsampling_options(options))
+        except (ValueError, TypeError) as e:
+            socketio.emit('subscription_error', {'error': str(e)}, to=request.sid)
+            return
+    send_initial_data(request.sid, subscription)
+
+@socketio.on('disconnect')
+def handle_disconnect(*args):
+    with subscription_lock:
+        subscriptions.pop(request.sid, None)
+
+def subscription_options(options):
+    """Normalize client options; entities and devices may be lists or comma-separated strings."""
+    options = options if isinstance(options, dict) else {}
+    entities = options.get('entities') or list(ENTITY_STORES)
+    entities = entities.split(',') if isinstance(entities, str) else list(entities)
+    unknown = set(entities) - set(ENTITY_STORES)
+    if unknown:
+        raise ValueError(f"Unknown entities: {sorted(unknown)}")
+    devices = options.get('devices')
+    devices = devices.split(',') if isinstance(devices, str) else devices
+    subscription = downsampling_options(options)
+    subscription.update({
+        'stores': tuple(store for entity, store in ENTITY_STORES.items() if entity in entities),
+        'devices': frozenset(devices) if devices else None,
+        'window': float(options['window']) if options.get('window') else None
     })
+    # Delta content depends only on stores and devices, not on the window or downsampling
+    key = ','.join(subscription['stores']) + '|' + (','.join(sorted(devices)) if devices else '*')
+    subscription['room'] = 'view:' + hashlib.sha1(key.encode()).hexdigest()[:16]
+    return subscription
+
+def subscribe_client(sid, options):
+    try:
+        subscription = subscription_options(options)
+    except (ValueError, TypeError) as e:
+        socketio.emit('subscription_error', {'error': str(e)}, to=sid)
+        return
+    with subscription_lock:
+        previous = subscriptions.get(sid)
+        subscriptions[sid] = subscription
+    if previous is not None and previous['room'] != subscription['room']:
+        leave_room(previous['room'], sid=sid)
+    join_room(subscription['room'], sid=sid)
+    send_initial_data(sid, subscription)
+
+def downsampling_options(options):
+    # Clients send their pixel budget as {'max_points': N, 'method': 'lttb' | 'minmax'}
+    options = options if isinstance(options, dict) else {}
+    max_points = int(options['max_points']) if options.get('max_points') else None
+    if max_points is not None and max_points < MIN_POINTS:
+        raise ValueError(f"max_points must be at least {MIN_POINTS}")
+    return {
+        'max_points': max_points,
+        'method': options.get('method', 'lttb')
+    }
+
+# Fields drawn per chart; downsampling keeps at most max_points points for each of them
+CHART_FIELDS = {
+    'pump_data': ['power', 'optimized_power'],
+    'aeration_data': ['dissolved_oxygen', 'optimized_dissolved_oxygen'],
+    'grid_data': ['demand', 'price']
+}
+# Smallest budget that still leaves every charted field its two end points
+MIN_POINTS = 2 * max(len(fields) for fields in CHART_FIELDS.values())
+
+def serialize_store(name, store, id_field=None, since_row=None, max_points=None, method='lttb', devices=None, window=None):
+    view = store.window(since_row=since_row)
+    if window and len(view['timestamp']):
+        # Only the last `window` seconds up to the newest row
+        view = store.window(start=view['timestamp'][-1] - np.timedelta64(int(window * 1e9), 'ns'), since_row=since_row)
+    device_ids = store.device_ids
+    if devices is not None:
+        columns = [i for i, device_id in enumerate(device_ids) if device_id in devices]
+        view = {field: values if field == 'timestamp' else values[:, columns] for field, values in view.items()}
+        device_ids = [device_ids[i] for i in columns]
+    rows = select_rows(view['timestamp'], view, CHART_FIELDS[name], max_points, method) if max_points else None
+    return to_records(view, device_ids, id_field, rows)
+
+def serialize_rows(since_rows=None, max_points=None, method='lttb', stores=None, devices=None, window=None):
+    # Stores outside the view come back empty, so clients always get all three keys
+    since_rows = since_rows or {}
+    stores = stores or tuple(ENTITY_STORES.values())
+    payload = {}
+    for name, store, id_field in (('pump_data', pump_data, 'pump_id'), ('aeration_data', aeration_data, 'basin_id'),
+                                  ('grid_data', grid_data, None)):
+        # The device filter applies to pumps and basins; the grid is a single series
+        payload[name] = serialize_store(name, store, id_field, since_rows.get(name), max_points, method,
+                                        devices if id_field else None, window) if name in stores else []
+    return payload
+
+def send_initial_data(to, subscription):
+    logger.info("Sending initial data")
+    with store_lock:
+        payload = serialize_rows(max_points=subscription['max_points'], method=subscription['method'],
+                                 stores=subscription['stores'], devices=subscription['devices'],
+                                 window=subscription['window'])
+        payload['seq'] = update_seq
+    payload['history_capacity'] = HISTORY_CAPACITY
+    socketio.emit('initial_data', payload, to=to)
+
+def serialize_deltas(since_rows):
+    """One delta per distinct subscribed view, as (room, payload); call with store_lock held."""
+    with subscription_lock:
+        views = {}
+        for subscription in subscriptions.values():
+            views.setdefault(subscription['room'], subscription)
+    ticks = grid_data.total_rows - since_rows['grid_data']
+    deltas = []
+    for room, subscription in views.items():
+        delta = serialize_rows(since_rows, stores=subscription['stores'], devices=subscription['devices'])
+        delta['seq'] = update_seq
+        delta['ticks'] = ticks
+        deltas.append((room, delta))
+    VIEWS.set(len(views))
+    return deltas
+
+def send_delta(payload, to=None):
+    if metrics.REGISTRY.enabled:
+        EMIT_BYTES.inc(len(json.dumps(payload, cls=CustomJSONEncoder)))
+    socketio.emit('data_delta', payload, to=to)
+
+def send_deltas(deltas):
+    for room, delta in deltas:
+        send_delta(delta, to=room)
 
 @app.route('/update_data', methods=['POST'])
 def update_data():
@@ -66,79 +251,214 @@ def update_data():
             logger.error("No JSON data received")
             return jsonify({"error": "No JSON data received"}), 400
         
-        logger.info(f"Received data: {json.dumps(data, indent=2)}")
+        # Only the size: pretty-printing every payload cost more than applying it
+        logger.debug(f"Received {request.content_length} bytes")
+        UPDATE_BYTES.inc(request.content_length or 0)
         handle_update_data(data)
+        UPDATES.inc(transport='http')
         return jsonify({"message": "Data updated successfully"}), 200
     except Exception as e:
+        UPDATE_ERRORS.inc()
         error_message = f"An error occurred: {str(e)}\n{traceback.format_exc()}"
         logger.error(error_message)
         return jsonify({"error": error_message}), 500
 
+def decode_column(value, shape, dtype=np.float64):
+    # Nested lists (JSON, null = missing) or, from msgpack, raw little-endian bytes in row-major order
+    if isinstance(value, (bytes, bytearray)):
+        array = np.frombuffer(value, dtype=np.dtype(dtype).newbyteorder('<')).astype(dtype)
+    else:
+        array = np.array(value, dtype=dtype)
+    return array.reshape(shape)
+
+def decode_timestamps(value):
+    # ISO strings, epoch nanoseconds, or int64 nanosecond bytes
+    if isinstance(value, (bytes, bytearray)):
+        return np.frombuffer(value, dtype='<i8').astype('datetime64[ns]')
+    if value and isinstance(value[0], str):
+        return np.array(value, dtype='datetime64[ns]')
+    return np.array(value, dtype=np.int64).astype('datetime64[ns]')
+
+def decode_batch(data):
+    """Columnar /ingest payload -> (timestamps, {entity: (device_ids, {field: (rows, devices) array})})."""
+    if not isinstance(data, dict) or 'timestamps' not in data:
+        raise ValueError("Missing 'timestamps'")
+    timestamps = decode_timestamps(data['timestamps'])
+    if len(timestamps) > 1 and np.any(np.diff(timestamps) < np.timedelta64(0)):
+        raise ValueError("timestamps must be in ascending order")
+    n = len(timestamps)
+    entities = {}
+    for entity, store in (('pumps', pump_data), ('aeration_basins', aeration_data)):
+        block = data.get(entity) or {}
+        ids = list(block.get('ids', []))
+        entities[entity] = (ids, {field: decode_column(block[field], (n, len(ids)))
+                                  for field in store.fields if field in block})
+    grid = data.get('grid') or {}
+    entities['grid'] = ([GRID_ID], {field: decode_column(grid[field], (n, 1))
+                                    for field in grid_data.fields if field in grid})
+    return timestamps, entities
+
+@app.route('/ingest', methods=['POST'])
+def ingest():
+    """Bulk ingestion: many timestamped snapshots per request, one column per field.
+
+    {"timestamps": [...],
+     "pumps": {"ids": [...], "power": [[one value per id] per timestamp], ...},
+     "aeration_basins": {"ids": [...], ...},
+     "grid": {"demand": [...], "price": [...]}}
+
+    Sent as JSON or, when msgpack is installed, as application/msgpack, where
+    any column may also be raw little-endian float64 bytes (timestamps: int64
+    nanoseconds). Clients get one delta for the whole batch. A batch that
+    starts before the newest stored snapshot is rejected with 400.
+    """
+    try:
+        body = request.get_data()
+        UPDATE_BYTES.inc(len(body))
+        if request.mimetype in MSGPACK_TYPES:
+            try:
+                import msgpack
+            except ImportError:
+                return jsonify({"error": "msgpack is not installed on the dashboard"}), 415
+            data = msgpack.unpackb(body, raw=False)
+        else:
+            data = json.loads(body)
+        timestamps, entities = decode_batch(data)
+    except (ValueError, TypeError, KeyError) as e:
+        UPDATE_ERRORS.inc()
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        handle_ingest(timestamps, entities)
+    except ValueError as e:
+        UPDATE_ERRORS.inc()
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        UPDATE_ERRORS.inc()
+        logger.error(f"Error in ingest: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({"error": str(e)}), 500
+    UPDATES.inc(len(timestamps), transport='ingest')
+    INGEST_SNAPSHOTS.observe(len(timestamps))
+    logger.debug(f"Ingested {len(timestamps)} snapshots ({len(body)} bytes)")
+    return jsonify({"message": "Data ingested successfully", "snapshots": len(timestamps)}), 200
+
+@INGEST_SECONDS.timed()
+def handle_ingest(timestamps, entities):
+    global update_seq
+    if len(timestamps) == 0:
+        return
+
+    with store_lock:
+        # Stores and history are append-only in time; an older batch would land behind newer rows
+        newest = grid_data.window()['timestamp'][-1:]
+        if len(newest) and timestamps[0] < newest[0]:
+            raise ValueError(f"Batch starts at {timestamps[0]}, before the newest stored snapshot {newest[0]}")
+        since_rows = {
+            'pump_data': pump_data.total_rows,
+            'aeration_data': aeration_data.total_rows,
+            'grid_data': grid_data.total_rows
+        }
+        for name, store, entity in (('pump_data', pump_data, 'pumps'), ('aeration_data', aeration_data, 'aeration_basins'),
+                                    ('grid_data', grid_data, 'grid')):
+            ids, values = entities[entity]
+            store.append_many(timestamps, ids, values)
+            history_stores[entity].append_many(timestamps, ids, values)
+            store.expire(timestamps[-1] - np.timedelta64(HISTORY_WINDOW))
+            BUFFER_ROWS.set(len(store), store=name)
+
+        update_seq += 1
+        deltas = serialize_deltas(since_rows)
+
+    send_deltas(deltas)
+
+def append_entities(store, timestamp, entities, history=None):
+    ids = [entity['id'] for entity in entities]
+    values = {
+        field: np.array([entity.get(field) for entity in entities], dtype=np.float64)
+        for field in store.fields
+    }
+    store.append(timestamp, ids, values)
+    if history is not None:
+        history.append(timestamp, ids, values)
+
+@UPDATE_SECONDS.timed()
 def handle_update_data(data):
-    global pump_data, aeration_data, grid_data
+    global update_seq
 
     logger.info("Processing update_data")
-    timestamp = datetime.now()
+    # Simulated runs send their virtual timestamp
+    timestamp = datetime.fromisoformat(data['timestamp']) if data.get('timestamp') else datetime.now()
 
     try:
         # Validate the incoming data structure
         if 'pumps' not in data or 'aeration_basins' not in data or 'grid' not in data:
             raise ValueError("Invalid data structure. Missing 'pumps', 'aeration_basins', or 'grid'.")
 
-        # Update pump data
-        for pump in data['pumps']:
-            new_pump_data = pd.DataFrame({
-                'timestamp': [timestamp],
-                'pump_id': [pump['id']],
-                'power': [pump['power']],
-                'optimized_power': [pump['optimized_power']],
-                'efficiency': [pump['efficiency']],
-                'optimized_efficiency': [pump['optimized_efficiency']]
-            })
-            pump_data = pd.concat([pump_data, new_pump_data], ignore_index=True)
-
-        # Update aeration data
-        for basin in data['aeration_basins']:
-            new_aeration_data = pd.DataFrame({
-                'timestamp': [timestamp],
-                'basin_id': [basin['id']],
-                'power': [basin['power']],
-                'optimized_power': [basin['optimized_power']],
-                'dissolved_oxygen': [basin['dissolved_oxygen']],
-                'optimized_dissolved_oxygen': [basin['optimized_dissolved_oxygen']]
-            })
-            aeration_data = pd.concat([aeration_data, new_aeration_data], ignore_index=True)
-
-        # Update grid data
-        new_grid_data = pd.DataFrame({
-            'timestamp': [timestamp],
-            'demand': [data['grid']['demand']],
-            'price': [data['grid']['price']]
-        })
-        grid_data = pd.concat([grid_data, new_grid_data], ignore_index=True)
-
-        # Keep only the last 24 hours of data
-        cutoff_time = timestamp - timedelta(hours=24)
-        pump_data = pump_data[pump_data['timestamp'] > cutoff_time]
-        aeration_data = aeration_data[aeration_data['timestamp'] > cutoff_time]
-        grid_data = grid_data[grid_data['timestamp'] > cutoff_time]
-
-        # Convert timestamp column to datetime
-        pump_data['timestamp'] = pd.to_datetime(pump_data['timestamp'])
-        aeration_data['timestamp'] = pd.to_datetime(aeration_data['timestamp'])
-        grid_data['timestamp'] = pd.to_datetime(grid_data['timestamp'])
+        with store_lock:
+            since_rows = {
+                'pump_data': pump_data.total_rows,
+                'aeration_data': aeration_data.total_rows,
+                'grid_data': grid_data.total_rows
+            }
+            append_entities(pump_data, timestamp, data['pumps'], history_stores['pumps'])
+            append_entities(aeration_data, timestamp, data['aeration_basins'], history_stores['aeration_basins'])
+            append_entities(grid_data, timestamp, [dict(data['grid'], id=GRID_ID)], history_stores['grid'])
+
+            # Keep only the last 24 hours of data
+            cutoff_time = timestamp - HISTORY_WINDOW
+            for name, store in (('pump_data', pump_data), ('aeration_data', aeration_data), ('grid_data', grid_data)):
+                store.expire(cutoff_time)
+                BUFFER_ROWS.set(len(store), store=name)
+
+            update_seq += 1
+            deltas = serialize_deltas(since_rows)
 
         logger.info("Data processing completed successfully")
-        # Send updated data to clients
-        send_initial_data()
+        # Send only the appended rows, once per subscribed view
+        send_deltas(deltas)
     except Exception as e:
         logger.error(f"Error in handle_update_data: {str(e)}\n{traceback.format_exc()}")
         raise
 
+@app.route('/history', methods=['GET'])
+def history():
+    # e.g. /history?entity=pumps&start=2024-09-01T00:00&end=2024-12-01T00:00&resolution=3600&devices=pump001&fields=power
+    try:
+        entity = request.args.get('entity', 'pumps')
+        if entity not in history_stores:
+            return jsonify({"error": f"Unknown entity '{entity}'"}), 400
+        end = datetime.fromisoformat(request.args['end']) if 'end' in request.args else datetime.now()
+        start = datetime.fromisoformat(request.args['start']) if 'start' in request.args else end - HISTORY_WINDOW
+        if start >= end:
+            return jsonify({"error": "start must be before end"}), 400
+        # Default: whole minutes, so the query can be served from the rollups
+        resolution = float(request.args.get('resolution', 0)) or 60 * math.ceil((end - start).total_seconds() / HISTORY_MAX_BUCKETS / 60)
+        devices = request.args['devices'].split(',') if request.args.get('devices') else None
+        fields = request.args['fields'].split(',') if request.args.get('fields') else None
+        with store_lock:
+            result = history_stores[entity].query(start, end, resolution, devices, fields)
+        return jsonify(result), 200
+    except (ValueError, KeyError) as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/series', methods=['GET'])
+def series():
+    # Current window, downsampled server side: /series?max_points=800&method=lttb&entities=pumps&devices=pump001&window=3600
+    try:
+        options = subscription_options(request.args.to_dict())
+        with store_lock:
+            payload = serialize_rows(max_points=options['max_points'], method=options['method'], stores=options['stores'],
+                                     devices=options['devices'], window=options['window'])
+            payload['seq'] = update_seq
+        return jsonify(payload), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
 @socketio.on('update_data')
 def socket_update_data(data):
     logger.info("Received update data via WebSocket")
     handle_update_data(data)
+    UPDATES.inc(transport='websocket')
 
 if __name__ == '__main__':
     logger.info("Starting the server...")
@@ -0,0 +1,103 @@
+# wastewater_dr_twin/wastewater_dashboard/downsampling.py
+
+import numpy as np
+
+METHODS = ('lttb', 'minmax')
+
+def _bucket_edges(n, n_buckets, first=0, last=None):
+    last = n if last is None else last
+    return np.linspace(first, last, n_buckets + 1).astype(np.intp)
+
+def lttb_indices(x, y, n_out):
+    """Largest-triangle-three-buckets over every row of y at once.
+
+    x has shape (n,), y has shape (traces, n). Returns an int array of shape
+    (traces, min(n, n_out)) with the selected point indices per trace. The
+    bucket loop is inherently sequential, but each step is vectorized across
+    all traces and all points of the bucket.
+    """
+    y = np.atleast_2d(y)
+    traces, n = y.shape
+    if n_out >= n:
+        return np.broadcast_to(np.arange(n), (traces, n)).copy()
+    if n_out < 3:
+        return np.broadcast_to(np.array([0, n - 1])[:max(n_out, 0)], (traces, max(n_out, 0))).copy()
+
+    x = np.asarray(x, dtype=np.float64)
+    # Missing values must never win a bucket, but must not poison the bucket averages either
+    missing = np.isnan(y)
+    present = np.maximum((~missing).sum(axis=1, keepdims=True), 1)
+    filled = np.where(missing, np.nansum(y, axis=1, keepdims=True) / present, y)
+
+    edges = _bucket_edges(n, n_out - 2, 1, n - 1)
+    sums_x = np.add.reduceat(x, edges[:-1])
+    sums_y = np.add.reduceat(filled, edges[:-1], axis=1)
+    counts = np.diff(edges)
+    avg_x = np.r_[sums_x / counts, x[-1]]
+    avg_y = np.c_[sums_y / counts, filled[:, -1]]
+
+    selected = np.empty((traces, n_out), dtype=np.intp)
+    selected[:, 0] = 0
+    selected[:, -1] = n - 1
+    rows = np.arange(traces)
+    prev_x = np.full(traces, x[0])
+    prev_y = filled[:, 0]
+    for bucket in range(n_out - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        bx = x[lo:hi]
+        by = filled[:, lo:hi]
+        area = np.abs((prev_x[:, None] - avg_x[bucket + 1]) * (by - prev_y[:, None])
+                      - (prev_x[:, None] - bx[None, :]) * (avg_y[:, bucket + 1, None] - prev_y[:, None]))
+        area[missing[:, lo:hi]] = -1
+        best = lo + np.argmax(area, axis=1)
+        selected[:, bucket + 1] = best
+        prev_x = x[best]
+        prev_y = filled[rows, best]
+    return selected
+
+def minmax_indices(y, n_out):
+    """Keep the minimum and maximum of each of n_out // 2 buckets, per trace (fully vectorized)."""
+    y = np.atleast_2d(y)
+    traces, n = y.shape
+    n_buckets = n_out // 2
+    if n_buckets < 1 or n <= n_out:
+        return np.broadcast_to(np.arange(n), (traces, n)).copy()
+
+    # Equal-width buckets via padding, so every bucket is one row of a reshape
+    width = -(-n // n_buckets)
+    n_buckets = -(-n // width)
+    padded = np.full((traces, n_buckets * width), np.nan)
+    padded[:, :n] = y
+    padded = padded.reshape(traces, n_buckets, width)
+    missing = np.isnan(padded)
+    offsets = np.arange(n_buckets) * width
+    low = offsets + np.argmin(np.where(missing, np.inf, padded), axis=2)
+    high = offsets + np.argmax(np.where(missing, -np.inf, padded), axis=2)
+    # All-missing buckets (and the padding) collapse onto the bucket start, clipped to the series
+    indices = np.minimum(np.sort(np.concatenate([low, high], axis=1), axis=1), n - 1)
+    return indices
+
+def select_rows(timestamps, view, fields, max_points, method='lttb'):
+    """Row indices to keep per device so each charted field gets at most max_points points.
+
+    Every field in `fields` gets an equal share of the budget; the union of
+    their selections is used for the device so records stay aligned across
+    fields. Returns one index array per device column. Raises ValueError when
+    the budget leaves a field fewer than two points.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown downsampling method '{method}', expected one of {METHODS}")
+    n = len(timestamps)
+    devices = view[fields[0]].shape[1] if fields else 0
+    if max_points is None or n <= max_points:
+        return [None] * devices
+
+    x = (timestamps - timestamps[0]).astype('timedelta64[ns]').astype(np.float64) if n else timestamps
+    share = max_points // len(fields)
+    if share < 2:
+        raise ValueError(f"max_points must be at least {2 * len(fields)} for {len(fields)} fields")
+    per_field = []
+    for field in fields:
+        y = view[field].T  # (devices, rows)
+        per_field.append(lttb_indices(x, y, share) if method == 'lttb' else minmax_indices(y, share))
+    return [np.unique(np.concatenate([indices[device] for indices in per_field])) for device in range(devices)]
@@ -0,0 +1,392 @@
+# wastewater_dr_twin/wastewater_dashboard/history_store.py
+
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+# Rollup bucket sizes kept on disk, in seconds
+ROLLUP_LEVELS = (60, 900, 3600, 86400)
+STATS = ('count', 'min', 'max', 'sum')
+NS_PER_SECOND = 1_000_000_000
+NS_PER_DAY = 86400 * NS_PER_SECOND
+
+def _to_ns(timestamp):
+    return int(np.datetime64(timestamp, 'ns').astype(np.int64))
+
+def _day(timestamp_ns):
+    return np.datetime64(int(timestamp_ns), 'ns').astype('datetime64[D]').item()
+
+def aggregate(timestamps, devices, columns, bucket_ns):
+    """Group rows by (device, bucket) and combine their count/min/max/sum columns.
+
+    columns maps field -> {'count', 'min', 'max', 'sum'} arrays aligned with
+    timestamps/devices; raw rows use count=1 (0 for NaN) and min=max=sum=value.
+    Returns bucket start times, devices and the combined columns.
+    """
+    if len(timestamps) == 0:
+        empty = {field: {stat: np.empty(0) for stat in STATS} for field in columns}
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32), empty
+    buckets = timestamps // bucket_ns * bucket_ns
+    order = np.lexsort((buckets, devices))
+    buckets = buckets[order]
+    devices = devices[order]
+    starts = np.flatnonzero(np.r_[True, (buckets[1:] != buckets[:-1]) | (devices[1:] != devices[:-1])])
+
+    combined = {}
+    for field, stats in columns.items():
+        combined[field] = {
+            'count': np.add.reduceat(stats['count'][order], starts),
+            'min': np.fmin.reduceat(stats['min'][order], starts),
+            'max': np.fmax.reduceat(stats['max'][order], starts),
+            'sum': np.add.reduceat(np.nan_to_num(stats['sum'][order]), starts)
+        }
+    return buckets[starts], devices[starts], combined
+
+class _ColumnFiles:
+    """Append-only column files of one partition; reads are memory-mapped."""
+
+    def __init__(self, path, dtypes):
+        self.path = path
+        self.dtypes = dtypes
+        self._handles = {}
+
+    def _file(self, name):
+        return os.path.join(self.path, f"{name}.bin")
+
+    def append(self, arrays):
+        if not self._handles:
+            os.makedirs(self.path, exist_ok=True)
+            # Unbuffered, so memory-mapped readers see every completed write
+            self._handles = {name: open(self._file(name), 'ab', buffering=0) for name in self.dtypes}
+        for name, dtype in self.dtypes.items():
+            self._handles[name].write(np.ascontiguousarray(arrays[name], dtype=dtype).tobytes())
+
+    def close(self):
+        for handle in self._handles.values():
+            handle.close()
+        self._handles = {}
+
+    def read(self):
+        sizes = {}
+        for name, dtype in self.dtypes.items():
+            file = self._file(name)
+            sizes[name] = os.path.getsize(file) // np.dtype(dtype).itemsize if os.path.exists(file) else 0
+        # A crash between column writes leaves ragged files; only complete rows are visible
+        rows = min(sizes.values()) if sizes else 0
+        if rows == 0:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in self.dtypes.items()}
+        return {name: np.memmap(self._file(name), dtype=dtype, mode='r', shape=(rows,))
+                for name, dtype in self.dtypes.items()}
+
+class HistoryStore:
+    """Persistent, append-only columnar history for one entity type.
+
+    Rows are partitioned per day (<root>/<entity>/<YYYY-MM-DD>/raw/<column>.bin).
+    Next to the raw rows every partition holds min/max/count/sum rollups per
+    device for each of ROLLUP_LEVELS, written when a bucket closes, so range
+    queries over months read the coarsest level that fits the requested
+    resolution instead of the raw series.
+    """
+
+    def __init__(self, root, entity, fields, rollup_levels=ROLLUP_LEVELS):
+        self.path = os.path.join(root, entity)
+        self.fields = list(fields)
+        self.rollup_levels = tuple(sorted(rollup_levels))
+        os.makedirs(self.path, exist_ok=True)
+
+        self.raw_dtypes = {'timestamp': np.int64, 'device': np.int32}
+        self.raw_dtypes.update({field: np.float64 for field in self.fields})
+        self.rollup_dtypes = {'timestamp': np.int64, 'device': np.int32}
+        self.rollup_dtypes.update({f"{field}.{stat}": np.float64 for field in self.fields for stat in STATS})
+
+        self._devices_file = os.path.join(self.path, 'devices.json')
+        self.device_ids = []
+        if os.path.exists(self._devices_file):
+            with open(self._devices_file) as f:
+                self.device_ids = json.load(f)
+        self.device_index = {device_id: i for i, device_id in enumerate(self.device_ids)}
+
+        # Writers of the partitions currently being appended to, keyed by (day, level)
+        self._writers = {}
+        # Open (not yet written) rollup buckets: level -> running per-device accumulators
+        self._open = {}
+        self._recover_open_buckets()
+
+    def _partition(self, day, level=None):
+        return _ColumnFiles(os.path.join(self.path, day.isoformat(), 'raw' if level is None else f"r{level}"),
+                            self.raw_dtypes if level is None else self.rollup_dtypes)
+
+    def _writer(self, day, level=None):
+        key = (day, level)
+        if key not in self._writers:
+            # Appends only move forward in time, so writers of older partitions for this level are done
+            for old_key in [k for k in self._writers if k[1] == level]:
+                self._writers.pop(old_key).close()
+            self._writers[key] = self._partition(day, level)
+        return self._writers[key]
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
+
+    def _days(self):
+        days = []
+        for name in os.listdir(self.path):
+            try:
+                days.append(datetime.strptime(name, '%Y-%m-%d').date())
+            except ValueError:
+                continue
+        return sorted(days)
+
+    def _device_indices(self, device_ids):
+        added = False
+        for device_id in device_ids:
+            if device_id not in self.device_index:
+                self.device_index[device_id] = len(self.device_ids)
+                self.device_ids.append(device_id)
+                added = True
+        if added:
+            with open(self._devices_file, 'w') as f:
+                json.dump(self.device_ids, f)
+        return np.fromiter((self.device_index[device_id] for device_id in device_ids), dtype=np.int32,
+                           count=len(device_ids))
+
+    @staticmethod
+    def _raw_stats(rows, fields):
+        stats = {}
+        for field in fields:
+            values = np.asarray(rows[field], dtype=np.float64)
+            stats[field] = {'count': (~np.isnan(values)).astype(np.float64), 'min': values, 'max': values, 'sum': values}
+        return stats
+
+    def _new_bucket(self, bucket):
+        size = max(len(self.device_ids), 1)
+        accumulator = {'bucket': bucket, 'seen': np.zeros(size, dtype=bool)}
+        for field in self.fields:
+            accumulator[field] = {
+                'count': np.zeros(size), 'min': np.full(size, np.nan), 'max': np.full(size, np.nan), 'sum': np.zeros(size)
+            }
+        return accumulator
+
+    def _grow(self, accumulator):
+        size = len(accumulator['seen'])
+        if len(self.device_ids) <= size:
+            return
+        extra = max(len(self.device_ids), 2 * size) - size
+        accumulator['seen'] = np.r_[accumulator['seen'], np.zeros(extra, dtype=bool)]
+        for field in self.fields:
+            stats = accumulator[field]
+            for stat, fill in (('count', 0.0), ('min', np.nan), ('max', np.nan), ('sum', 0.0)):
+                stats[stat] = np.r_[stats[stat], np.full(extra, fill)]
+
+    def _accumulate(self, accumulator, devices, stats):
+        self._grow(accumulator)
+        accumulator['seen'][devices] = True
+        for field in self.fields:
+            target, source = accumulator[field], stats[field]
+            target['count'][devices] += source['count']
+            target['min'][devices] = np.fmin(target['min'][devices], source['min'])
+            target['max'][devices] = np.fmax(target['max'][devices], source['max'])
+            target['sum'][devices] += np.nan_to_num(source['sum'])
+
+    def _open_rows(self, level):
+        accumulator = self._open[level]
+        devices = np.flatnonzero(accumulator['seen']).astype(np.int32)
+        rows = {'timestamp': np.full(len(devices), accumulator['bucket'], dtype=np.int64), 'device': devices}
+        for field in self.fields:
+            for stat in STATS:
+                rows[f"{field}.{stat}"] = accumulator[field][stat][devices]
+        return rows
+
+    def _recover_open_buckets(self):
+        # Rebuild the buckets that were still open when the process stopped from the last raw partition
+        days = self._days()
+        if not days:
+            return
+        raw = self._partition(days[-1]).read()
+        if len(raw['timestamp']) == 0:
+            return
+        timestamps = np.asarray(raw['timestamp'])
+        last = int(timestamps[-1])
+        for level in self.rollup_levels:
+            bucket_ns = level * NS_PER_SECOND
+            bucket = last // bucket_ns * bucket_ns
+            mask = timestamps >= bucket
+            _, devices, stats = aggregate(timestamps[mask], np.asarray(raw['device'])[mask],
+                                          self._raw_stats({f: np.asarray(raw[f])[mask] for f in self.fields}, self.fields),
+                                          bucket_ns)
+            self._open[level] = self._new_bucket(bucket)
+            self._accumulate(self._open[level], devices, stats)
+
+    def _close_bucket(self, level):
+        rows = self._open_rows(level)
+        self._writer(_day(self._open.pop(level)['bucket']), level).append(rows)
+
+    def append(self, timestamp, device_ids, values):
+        """Append one snapshot; same arguments as RingBuffer.append."""
+        timestamp_ns = _to_ns(timestamp)
+        n = len(device_ids)
+        devices = self._device_indices(device_ids)
+        rows = {'timestamp': np.full(n, timestamp_ns, dtype=np.int64), 'device': devices}
+        for field in self.fields:
+            rows[field] = np.broadcast_to(np.asarray(values.get(field, np.nan), dtype=np.float64), (n,))
+        self._writer(_day(timestamp_ns)).append(rows)
+
+        stats = self._raw_stats(rows, self.fields)
+        for level in self.rollup_levels:
+            bucket_ns = level * NS_PER_SECOND
+            bucket = timestamp_ns // bucket_ns * bucket_ns
+            if level in self._open and self._open[level]['bucket'] != bucket:
+                self._close_bucket(level)
+            if level not in self._open:
+                self._open[level] = self._new_bucket(bucket)
+            self._accumulate(self._open[level], devices, stats)
+
+    def _write_rows(self, rows, level=None):
+        # rows sorted by timestamp; one write per day partition
+        days = rows['timestamp'] // NS_PER_DAY
+        bounds = np.r_[0, np.flatnonzero(np.diff(days)) + 1, len(days)]
+        for lo, hi in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+            self._writer(_day(rows['timestamp'][lo]), level).append({name: array[lo:hi] for name, array in rows.items()})
+
+    def append_many(self, timestamps, device_ids, values):
+        """Append one snapshot per timestamp (ascending); values map each field to a (rows, devices) array.
+
+        Same result as calling append() per row, but raw rows are written per
+        day partition and rollup buckets are aggregated in bulk: buckets that
+        open and close inside the block are written directly, only the last one
+        stays open.
+        """
+        timestamps_ns = np.asarray(timestamps, dtype='datetime64[ns]').astype(np.int64)
+        n_rows, n = len(timestamps_ns), len(device_ids)
+        if n_rows == 0 or n == 0:
+            return
+        devices = self._device_indices(device_ids)
+        rows = {'timestamp': np.repeat(timestamps_ns, n), 'device': np.tile(devices, n_rows)}
+        for field in self.fields:
+            rows[field] = np.broadcast_to(np.asarray(values.get(field, np.nan), dtype=np.float64), (n_rows, n)).ravel()
+        self._write_rows(rows)
+
+        stats = self._raw_stats(rows, self.fields)
+        for level in self.rollup_levels:
+            buckets, bucket_devices, combined = aggregate(rows['timestamp'], rows['device'], stats, level * NS_PER_SECOND)
+            first, last = buckets.min(), buckets.max()
+            if level in self._open and self._open[level]['bucket'] != first:
+                self._close_bucket(level)
+            if level not in self._open:
+                self._open[level] = self._new_bucket(first)
+            self._accumulate_rows(level, buckets == first, bucket_devices, combined)
+            if last == first:
+                continue
+
+            self._close_bucket(level)
+            middle = np.flatnonzero((buckets != first) & (buckets != last))
+            middle = middle[np.argsort(buckets[middle], kind='stable')]
+            closed = {'timestamp': buckets[middle], 'device': bucket_devices[middle]}
+            for field in self.fields:
+                for stat in STATS:
+                    closed[f"{field}.{stat}"] = combined[field][stat][middle]
+            if len(middle):
+                self._write_rows(closed, level)
+            self._open[level] = self._new_bucket(last)
+            self._accumulate_rows(level, buckets == last, bucket_devices, combined)
+
+    def _accumulate_rows(self, level, mask, devices, combined):
+        self._accumulate(self._open[level], devices[mask],
+                         {field: {stat: combined[field][stat][mask] for stat in STATS} for field in self.fields})
+
+    def _spans(self, start_ns, end_ns, levels):
+        """Split [start, end) into (start, end, level) pieces to read, level None for raw rows.
+
+        Rollup rows cover whole buckets, so the coarsest level only serves the
+        buckets that lie inside the range; the partial buckets at either edge
+        come from the next finer level, down to the raw rows.
+        """
+        if start_ns >= end_ns:
+            return []
+        if not levels:
+            return [(start_ns, end_ns, None)]
+        level_ns = levels[-1] * NS_PER_SECOND
+        inner_start, inner_end = -(-start_ns // level_ns) * level_ns, end_ns // level_ns * level_ns
+        if inner_start >= inner_end:
+            return self._spans(start_ns, end_ns, levels[:-1])
+        return (self._spans(start_ns, inner_start, levels[:-1]) + [(inner_start, inner_end, levels[-1])] +
+                self._spans(inner_end, end_ns, levels[:-1]))
+
+    def query(self, start, end, resolution, device_ids=None, fields=None):
+        """min/max/mean per device and bucket of `resolution` seconds over [start, end).
+
+        Buckets are aligned to the epoch; when start or end falls inside one,
+        that bucket only aggregates the rows within the range. 'source' names
+        the coarsest level read.
+        """
+        fields = list(fields or self.fields)
+        unknown = set(fields) - set(self.fields)
+        if unknown:
+            raise ValueError(f"Unknown fields: {sorted(unknown)}")
+        start_ns, end_ns = _to_ns(start), _to_ns(end)
+        resolution_ns = max(int(resolution * NS_PER_SECOND), 1)
+        usable = [level for level in self.rollup_levels if level * NS_PER_SECOND <= resolution_ns
+                  and resolution_ns % (level * NS_PER_SECOND) == 0]
+        spans = self._spans(start_ns, end_ns, usable)
+        level = max((span[2] for span in spans if span[2] is not None), default=None)
+
+        timestamps, devices = [], []
+        stats = {field: {stat: [] for stat in STATS} for field in fields}
+
+        def collect(rows, raw, span_start, span_end):
+            mask = (rows['timestamp'] >= span_start) & (rows['timestamp'] < span_end)
+            if device_ids is not None:
+                wanted = [self.device_index[d] for d in device_ids if d in self.device_index]
+                mask &= np.isin(rows['device'], wanted)
+            timestamps.append(np.asarray(rows['timestamp'])[mask])
+            devices.append(np.asarray(rows['device'])[mask])
+            selected = self._raw_stats({field: np.asarray(rows[field])[mask] for field in fields}, fields) if raw else {
+                field: {stat: np.asarray(rows[f"{field}.{stat}"])[mask] for stat in STATS} for field in fields}
+            for field in fields:
+                for stat in STATS:
+                    stats[field][stat].append(selected[field][stat])
+
+        days = self._days()
+        for span_start, span_end, span_level in spans:
+            for day in days:
+                if _day(span_start) <= day <= _day(span_end):
+                    collect(self._partition(day, span_level).read(), span_level is None, span_start, span_end)
+            if span_level is not None and span_level in self._open:
+                # The still-open bucket is not in the rollup files yet
+                collect(self._open_rows(span_level), False, span_start, span_end)
+
+        if not timestamps:
+            timestamps, devices = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int32)]
+            stats = {field: {stat: [np.empty(0)] for stat in STATS} for field in fields}
+        buckets, bucket_devices, combined = aggregate(
+            np.concatenate(timestamps), np.concatenate(devices),
+            {field: {stat: np.concatenate(stats[field][stat]) for stat in STATS} for field in fields},
+            resolution_ns)
+        return self._format(buckets, bucket_devices, combined, fields, resolution, level)
+
+    def _format(self, buckets, devices, stats, fields, resolution, level):
+        series = []
+        for device in np.unique(devices).tolist():
+            mask = devices == device
+            entry = {
+                'id': self.device_ids[device],
+                'timestamp': np.datetime_as_string(buckets[mask].astype('datetime64[ns]'), unit='s').tolist()
+            }
+            for field in fields:
+                count = stats[field]['count'][mask]
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    mean = stats[field]['sum'][mask] / count
+                entry[field] = {
+                    name: np.where(count > 0, values, np.nan).round(6).tolist()
+                    for name, values in (('min', stats[field]['min'][mask]), ('max', stats[field]['max'][mask]),
+                                         ('mean', mean))
+                }
+                # JSON has no NaN
+                for name, values in entry[field].items():
+                    entry[field][name] = [None if v != v else v for v in values]
+            series.append(entry)
+        return {'resolution': resolution, 'source': f"r{level}" if level else 'raw', 'series': series}
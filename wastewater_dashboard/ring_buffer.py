@@ -0,0 +1,140 @@
+# wastewater_dr_twin/wastewater_dashboard/ring_buffer.py
+
+import numpy as np
+
+class RingBuffer:
+    """Fixed-capacity columnar time series for one entity type.
+
+    Each append writes one row: a timestamp plus one value per device for every
+    field, with devices mapped to columns by id. Rows are stored twice (at i and
+    i + capacity) so any window of up to `capacity` rows is a contiguous slice,
+    which lets readers take zero-copy views. Append and expiry never touch the
+    stored history.
+    """
+
+    def __init__(self, fields, capacity, max_devices=8):
+        self.fields = list(fields)
+        self.capacity = capacity
+        self.device_ids = []
+        self.device_index = {}
+        self._timestamps = np.empty(2 * capacity, dtype='datetime64[ns]')
+        self._columns = {field: np.full((2 * capacity, max_devices), np.nan) for field in self.fields}
+        # Monotonic row counters: live rows are [_start, _end)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    @property
+    def total_rows(self):
+        # Rows ever appended; pass to window(since_row=...) to read only what came after
+        return self._end
+
+    def _device_columns(self, device_ids):
+        for device_id in device_ids:
+            if device_id not in self.device_index:
+                self.device_index[device_id] = len(self.device_ids)
+                self.device_ids.append(device_id)
+
+        width = next(iter(self._columns.values())).shape[1] if self._columns else 0
+        if len(self.device_ids) > width:
+            # Grow geometrically so new devices cost amortized O(1)
+            new_width = max(len(self.device_ids), 2 * width)
+            for field, column in self._columns.items():
+                grown = np.full((2 * self.capacity, new_width), np.nan)
+                grown[:, :width] = column
+                self._columns[field] = grown
+
+        return np.fromiter((self.device_index[device_id] for device_id in device_ids),
+                           dtype=np.intp, count=len(device_ids))
+
+    def append(self, timestamp, device_ids, values):
+        """Append one row. `values` maps each field to a sequence aligned with device_ids."""
+        columns = self._device_columns(device_ids)
+        if len(self) == self.capacity:
+            self._start += 1
+        row = self._end % self.capacity
+        mirror = row + self.capacity
+
+        self._timestamps[row] = self._timestamps[mirror] = np.datetime64(timestamp, 'ns')
+        for field, column in self._columns.items():
+            field_values = np.asarray(values.get(field, np.nan), dtype=np.float64)
+            column[row] = np.nan
+            column[row, columns] = field_values
+            column[mirror] = column[row]
+        self._end += 1
+
+    def append_many(self, timestamps, device_ids, values):
+        """Append one row per timestamp. `values` maps each field to a (rows, devices) array."""
+        columns = self._device_columns(device_ids)
+        timestamps = np.asarray(timestamps, dtype='datetime64[ns]')
+        n = len(timestamps)
+        values = {
+            field: np.broadcast_to(np.asarray(values.get(field, np.nan), dtype=np.float64), (n, len(device_ids)))
+            for field in self.fields
+        }
+        if n > self.capacity:
+            # Older rows of the block would be overwritten within this call anyway
+            timestamps = timestamps[-self.capacity:]
+            values = {field: block[-self.capacity:] for field, block in values.items()}
+            self._end += n - self.capacity
+            n = self.capacity
+
+        rows = (self._end + np.arange(n)) % self.capacity
+        self._timestamps[rows] = self._timestamps[rows + self.capacity] = timestamps
+        for field, column in self._columns.items():
+            block = np.full((n, column.shape[1]), np.nan)
+            block[:, columns] = values[field]
+            column[rows] = column[rows + self.capacity] = block
+        self._end += n
+        self._start = max(self._start, self._end - self.capacity)
+
+    def expire(self, cutoff):
+        """Drop rows with timestamps at or before cutoff."""
+        timestamps = self.window()['timestamp']
+        self._start += int(np.searchsorted(timestamps, np.datetime64(cutoff, 'ns'), side='right'))
+
+    def window(self, start=None, since_row=None):
+        """Zero-copy views of the live rows.
+
+        start limits the window to timestamps after `start`; since_row limits it
+        to rows appended after the given total_rows value.
+        """
+        first = self._start if since_row is None else max(self._start, since_row)
+        lo = first % self.capacity
+        hi = lo + (self._end - first)
+        view = {'timestamp': self._timestamps[lo:hi]}
+        if start is not None:
+            lo += int(np.searchsorted(view['timestamp'], np.datetime64(start, 'ns'), side='right'))
+            view['timestamp'] = self._timestamps[lo:hi]
+        width = len(self.device_ids)
+        for field, column in self._columns.items():
+            view[field] = column[lo:hi, :width]
+        return view
+
+def to_records(view, device_ids, id_field=None, rows=None):
+    """Flatten a window() view into the row-per-device JSON records used by the dashboard.
+
+    rows optionally gives, per device column, the row indices to keep (None keeps all).
+    """
+    timestamps = np.datetime_as_string(view['timestamp'], unit='ms').tolist()
+    fields = [field for field in view if field != 'timestamp']
+    records = []
+    for column, device_id in enumerate(device_ids):
+        series = {field: view[field][:, column] for field in fields}
+        # Skip rows where the device did not report at all
+        present = ~np.all([np.isnan(values) for values in series.values()], axis=0) if fields else []
+        if rows is not None and rows[column] is not None:
+            keep = np.zeros(len(present), dtype=bool)
+            keep[rows[column]] = True
+            present = present & keep
+        lists = {field: np.where(np.isnan(values), None, values).tolist() for field, values in series.items()}
+        for i in np.flatnonzero(present).tolist():
+            record = {'timestamp': timestamps[i]}
+            if id_field is not None:
+                record[id_field] = device_id
+            for field in fields:
+                record[field] = lists[field][i]
+            records.append(record)
+    return records